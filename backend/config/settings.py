@@ -14,6 +14,7 @@ from pathlib import Path
 import os
 import dj_database_url
 from datetime import timedelta # Importamos esto para configurar la duración del token
+from decimal import Decimal
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -65,6 +66,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware', 
     'django.middleware.security.SecurityMiddleware',
+    # 429 a los endpoints públicos que exceden su límite, antes de tocar la BD
+    'core_bancario.middleware.LimiteTasaMiddleware',
     # WhiteNoise para servir archivos estáticos en producción
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -104,7 +107,8 @@ else:
 REST_FRAMEWORK = {
     # Definimos que la autenticación por defecto sea vía JWT (Tokens)
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWT de Simple JWT, con el usuario, su cliente y sus cuentas en caché (ver core_bancario/identidad.py)
+        'core_bancario.identidad.JWTIdentidadAuthentication',
     ),
     # Por defecto, bloqueamos todo. Solo usuarios autenticados pueden ver datos.
     'DEFAULT_PERMISSION_CLASSES': (
@@ -215,3 +219,180 @@ MI_CODIGO_BANCO = os.environ.get("MI_CODIGO_BANCO", "0001")
 MI_CODIGO_AGENCIA = os.environ.get("MI_CODIGO_AGENCIA", "0001")
 MI_BIN_TARJETA = os.environ.get("MI_BIN_TARJETA", "0001")
 INTERBANK_API_KEY = os.environ.get("INTERBANK_API_KEY") # Para la comunicación segura entre bancos
+
+# --- IDEMPOTENCIA DE PAGOS ---
+# Tiempo que se conserva la respuesta original de cada numero_transaccion para repetirla en reintentos.
+IDEMPOTENCIA_TTL = timedelta(hours=int(os.environ.get("IDEMPOTENCIA_TTL_HORAS", "24")))
+
+# --- CACHÉ DE COMERCIOS (RUTA ADQUIRIENTE) ---
+# Capacidad máxima (LRU) y vida de cada perfil en segundos (respaldo si la caché compartida se vacía).
+COMERCIOS_CACHE_CAPACIDAD = int(os.environ.get("COMERCIOS_CACHE_CAPACIDAD", "10000"))
+COMERCIOS_CACHE_TTL = int(os.environ.get("COMERCIOS_CACHE_TTL", "60"))
+# Cada cuántos segundos un worker compara su copia con la versión compartida (ver cache_comercios.py)
+COMERCIOS_CACHE_REVISION_S = int(os.environ.get("COMERCIOS_CACHE_REVISION_S", "2"))
+
+# --- ENRUTAMIENTO DE BANCOS ---
+# Segundos de vida de la tabla BIN/alias compilada; acota la desactualización entre workers.
+ENRUTAMIENTO_TTL = int(os.environ.get("ENRUTAMIENTO_TTL", "30"))
+
+# --- CORTACIRCUITOS POR BANCO ALIADO ---
+# Se abre si, en las últimas VENTANA llamadas (con al menos MINIMO_LLAMADAS), la tasa de errores
+# o de llamadas más lentas que LATENCIA_LENTA_MS supera su umbral. Abierto, los pagos se rechazan sin llamar.
+CIRCUITO_BANCOS = {
+    'VENTANA': 20,
+    'MINIMO_LLAMADAS': 10,
+    'TASA_ERROR': 0.5,
+    'LATENCIA_LENTA_MS': 5000,
+    'TASA_LENTAS': 0.5,
+    'SEGUNDOS_ABIERTO': 30,
+    'PRUEBAS_SEMIABIERTO': 3,
+}
+
+# --- PASARELA ASÍNCRONA (ASGI) ---
+# Hilos (y por tanto conexiones a la BD) que usan las vistas de pago asíncronas para el ORM.
+PASARELA_HILOS_BD = int(os.environ.get("PASARELA_HILOS_BD", "16"))
+
+# --- CARGA MASIVA DE PAGOS (DATÁFONOS) ---
+# Máximo de pagos por petición y tamaño de cada bloque On-Us autorizado en una sola transacción.
+PAGOS_LOTE_MAXIMO = int(os.environ.get("PAGOS_LOTE_MAXIMO", "5000"))
+PAGOS_LOTE_BLOQUE = int(os.environ.get("PAGOS_LOTE_BLOQUE", "500"))
+
+# --- COLA DE SALIDA HACIA BANCOS ALIADOS (OUTBOX) ---
+# EN_LINEA: la vista intenta el envío al instante y, si el banco no responde, lo deja en la cola (202).
+# DIFERIDO: toda autorización externa se responde 202 y la envían los workers de `procesar_outbox`.
+OUTBOX = {
+    'MODO': os.environ.get("OUTBOX_MODO", "EN_LINEA"),
+    'MAX_INTENTOS': 8,
+    'BACKOFF_BASE_S': 2,
+    'BACKOFF_MAX_S': 300,
+    'RESERVA_S': 60, # Debe superar timeout_conexion + timeout_lectura de cualquier banco
+    'MENSAJES_POR_CICLO': 50, # Por banco, antes de ceder el hilo a otro banco
+}
+
+# --- HISTORIAL DE MOVIMIENTOS ---
+# Tamaño por defecto y máximo de una página de /api/transacciones/ (paginación por cursor).
+HISTORIAL_PAGINA = int(os.environ.get("HISTORIAL_PAGINA", "50"))
+HISTORIAL_PAGINA_MAXIMA = int(os.environ.get("HISTORIAL_PAGINA_MAXIMA", "200"))
+
+# --- ESTADO DE CUENTA (EXPORTACIÓN EN STREAMING) ---
+# Filas leídas por viaje a la BD y escritas por trozo de la respuesta.
+ESTADO_CUENTA_BLOQUE = int(os.environ.get("ESTADO_CUENTA_BLOQUE", "2000"))
+
+# --- CIERRE DE CICLO DE TARJETAS DE CRÉDITO ---
+# Pago mínimo = máx(PAGO_MINIMO_FIJO, PAGO_MINIMO_PORCENTAJE % de la deuda), sin pasar de la deuda.
+CICLO_TARJETAS = {
+    'PAGO_MINIMO_PORCENTAJE': Decimal(os.environ.get("PAGO_MINIMO_PORCENTAJE", "5")),
+    'PAGO_MINIMO_FIJO': Decimal(os.environ.get("PAGO_MINIMO_FIJO", "10.00")),
+    'TARJETAS_POR_RANGO': 20000, # Tarjetas (rango de ids) que cierra cada tarea del pool de procesos
+}
+
+# --- CACHÉ COMPARTIDA (DASHBOARD DEL CLIENTE) ---
+# Las invalidaciones deben verlas todos los workers: Redis si hay REDIS_URL (varias instancias),
+# archivos locales si no (workers de una misma máquina). En desarrollo, memoria del proceso.
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ["REDIS_URL"],
+        }
+    }
+elif DEBUG:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get("DJANGO_CACHE_DIR", "/tmp/wholabank_cache"),
+        }
+    }
+
+# Vida máxima de un dashboard en caché (las invalidaciones lo renuevan antes).
+DASHBOARD_CACHE_TTL = int(os.environ.get("DASHBOARD_CACHE_TTL", "300"))
+
+# --- PANEL DE ADMINISTRACIÓN ---
+# Clientes por página en la lista del panel.
+ADMIN_CLIENTES_PAGINA = int(os.environ.get("ADMIN_CLIENTES_PAGINA", "50"))
+ADMIN_CLIENTES_PAGINA_MAXIMA = int(os.environ.get("ADMIN_CLIENTES_PAGINA_MAXIMA", "200"))
+
+# --- VOLUMEN DE TRANSACCIONES (ver core_bancario/volumen.py) ---
+VOLUMEN = {
+    # Segundos que se espera a un id sin confirmar antes de darlo por ROLLBACK
+    'HUECO_MAX_S': int(os.environ.get("VOLUMEN_HUECO_MAX_S", "3600")),
+    'TRANSACCIONES_POR_LOTE': 5000,
+    # Rango máximo de una consulta a admin-panel/volumen/, en horas, por granularidad
+    'HORAS_MAXIMAS': {'MINUTO': 24, 'HORA': 24 * 93},
+}
+
+# --- CARGA MASIVA DE CLIENTES (ver core_bancario/importacion.py) ---
+IMPORTACION = {
+    'FILAS_POR_BLOQUE': int(os.environ.get("IMPORTACION_FILAS_POR_BLOQUE", "1000")),
+    # Procesos que cifran contraseñas en paralelo (PBKDF2 es lo más costoso del alta)
+    'PROCESOS': int(os.environ.get("IMPORTACION_PROCESOS", str(os.cpu_count() or 1))),
+}
+
+# --- NUMERACIÓN DE CUENTAS Y TARJETAS (ver core_bancario/numeracion.py) ---
+NUMERACION = {
+    # Valores de secuencia que cada proceso reserva por viaje a la BD (solo PostgreSQL)
+    'BLOQUE': int(os.environ.get("NUMERACION_BLOQUE", "100")),
+    # Permutación afín para que los números consecutivos no se vean consecutivos.
+    # MULTIPLICADOR debe ser coprimo con 10 (no par ni múltiplo de 5). Cambiarlos con
+    # cuentas ya emitidas puede producir números repetidos: fijarlos antes de la primera alta.
+    'MEZCLAR': os.environ.get("NUMERACION_MEZCLAR", "True") == "True",
+    'MULTIPLICADOR': int(os.environ.get("NUMERACION_MULTIPLICADOR", "7919")),
+    'DESPLAZAMIENTO': int(os.environ.get("NUMERACION_DESPLAZAMIENTO", "104729")),
+}
+
+# --- IDENTIDAD JWT EN CACHÉ (ver core_bancario/identidad.py) ---
+IDENTIDAD = {
+    # Usuarios resueltos por worker y su vida máxima: acota cuánto tarda un worker
+    # distinto al que hizo el cambio en ver una desactivación o un cambio de permisos.
+    'CAPACIDAD': int(os.environ.get("IDENTIDAD_CACHE_CAPACIDAD", "10000")),
+    'TTL_S': int(os.environ.get("IDENTIDAD_CACHE_TTL", "15")),
+}
+
+# --- PARÁMETROS DE NEGOCIO (ver core_bancario/parametros.py) ---
+PARAMETROS = {
+    # Cada cuántos segundos un worker compara su copia con la versión compartida (una lectura de la caché)
+    'REVISION_S': int(os.environ.get("PARAMETROS_REVISION_S", "2")),
+    # Recarga desde la BD aunque la versión no cambie (caché compartida vaciada, o de memoria en desarrollo)
+    'TTL_S': int(os.environ.get("PARAMETROS_TTL_S", "60")),
+}
+
+# --- CONTROLES DE VELOCIDAD EN AUTORIZACIONES (ver core_bancario/velocidad.py) ---
+VELOCIDAD = {
+    'ACTIVA': os.environ.get("VELOCIDAD_ACTIVA", "True") == "True",
+    # SQLite local compartido por los workers de la máquina. Vacío: en memoria de cada proceso (desarrollo).
+    'ARCHIVO': os.environ.get("VELOCIDAD_ARCHIVO", "" if DEBUG else "/tmp/wholabank_velocidad.sqlite3"),
+    'CUBETAS': 12, # Por ventana: la ventana deslizante avanza de a 1/12 de su duración
+    'PURGA_CADA': 1000, # Escrituras entre borrados de cubetas vencidas
+    # LIMITE es el valor por defecto del parámetro VELOCIDAD_<NOMBRE> (editable en el admin, 0 = sin límite)
+    'REGLAS': [
+        {'NOMBRE': 'TARJETA_TRANSACCIONES_MINUTO', 'ENTIDAD': 'TARJETA', 'MEDIDA': 'CANTIDAD', 'VENTANA_S': 60, 'LIMITE': 10},
+        {'NOMBRE': 'TARJETA_MONTO_DIA', 'ENTIDAD': 'TARJETA', 'MEDIDA': 'MONTO', 'VENTANA_S': 86400, 'LIMITE': Decimal('10000.00')},
+        {'NOMBRE': 'TARJETA_COMERCIOS_HORA', 'ENTIDAD': 'TARJETA', 'MEDIDA': 'COMERCIOS', 'VENTANA_S': 3600, 'LIMITE': 10},
+        {'NOMBRE': 'TARJETA_CVV_FALLIDOS_HORA', 'ENTIDAD': 'TARJETA', 'MEDIDA': 'CVV_FALLIDOS', 'VENTANA_S': 3600, 'LIMITE': 3},
+        {'NOMBRE': 'COMERCIO_TRANSACCIONES_MINUTO', 'ENTIDAD': 'COMERCIO', 'MEDIDA': 'CANTIDAD', 'VENTANA_S': 60, 'LIMITE': 600},
+        {'NOMBRE': 'COMERCIO_MONTO_DIA', 'ENTIDAD': 'COMERCIO', 'MEDIDA': 'MONTO', 'VENTANA_S': 86400, 'LIMITE': Decimal('5000000.00')},
+    ],
+}
+
+# --- LÍMITES DE TASA EN ENDPOINTS PÚBLICOS (ver core_bancario/limite_tasa.py) ---
+# Por ruta y dimensión: (fichas por segundo, ráfaga). Sin archivo, cada proceso tiene sus propias cubetas.
+LIMITE_TASA = {
+    'ACTIVO': os.environ.get("LIMITE_TASA_ACTIVO", "True") == "True",
+    # SQLite local compartido por los workers de la máquina (otro archivo que VELOCIDAD['ARCHIVO']).
+    'ARCHIVO': os.environ.get("LIMITE_TASA_ARCHIVO", "" if DEBUG else "/tmp/wholabank_limites.sqlite3"),
+    'PURGA_CADA': 1000, # Escrituras entre borrados de cubetas inactivas
+    # REMOTE_ADDR de los proxies cuyo X-Forwarded-For se cree
+    'PROXIES_CONFIABLES': [ip for ip in os.environ.get("LIMITE_TASA_PROXIES", "127.0.0.1").split(",") if ip],
+    'RUTAS': {
+        '/api/procesar_pago_comercio/': {'COMERCIO': (20, 60), 'IP': (50, 100)},
+        '/api/procesar_pago_comercio/lote/': {'IP': (1, 5)},
+        '/api/autorizar_pago/': {'BANCO': (200, 400), 'IP': (200, 400)},
+        '/api/registro/': {'IP': (0.1, 5)},
+    },
+}
@@ -0,0 +1,82 @@
+# backend/core_bancario/abonos.py
+
+"""
+Abonos a cuentas de comercio sin contención sobre la fila de la Cuenta.
+
+La ruta de pago solo inserta filas en AbonoPendiente (append-only): dos pagos
+simultáneos al mismo comercio no esperan el uno por el otro. El saldo real de
+una cuenta es Cuenta.saldo + la suma de sus abonos pendientes; consolidar
+mueve esa suma al saldo y borra las filas, bajo el bloqueo de la Cuenta.
+
+La consolidación ocurre:
+- al leer el saldo del propio cliente (DashboardView),
+- periódicamente con `manage.py consolidar_abonos`.
+
+Registrar un abono invalida el dashboard en caché del dueño de la cuenta;
+consolidar no, porque no cambia su saldo real (ver cache_dashboard.py).
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Max, Sum
+
+from . import cache_dashboard
+from .models import AbonoPendiente, Cuenta
+
+
+def registrar_abono(cuenta_id, monto):
+    """ Crédito de la ruta de pago: un INSERT, sin bloquear la Cuenta. """
+    AbonoPendiente.objects.create(cuenta_id=cuenta_id, monto=monto)
+    cache_dashboard.invalidar(cuentas=[cuenta_id])
+
+
+def registrar_abonos(montos_por_cuenta):
+    """ {cuenta_id: monto} -> un solo INSERT masivo (lotes de pagos). """
+    AbonoPendiente.objects.bulk_create(
+        [AbonoPendiente(cuenta_id=cuenta_id, monto=monto) for cuenta_id, monto in montos_por_cuenta.items()]
+    )
+    cache_dashboard.invalidar(cuentas=montos_por_cuenta)
+
+
+def consolidar_cuenta(cuenta_id, hasta_id=None):
+    """
+    Suma al saldo los abonos pendientes de una cuenta (hasta `hasta_id` si se indica)
+    y los borra. El bloqueo de la Cuenta serializa solo a los consolidadores entre sí,
+    así que la suma se recalcula después de tomarlo. Devuelve el monto consolidado.
+    """
+    with transaction.atomic():
+        list(Cuenta.objects.select_for_update().filter(pk=cuenta_id).values_list('pk', flat=True)) # Bloqueo
+        pendientes = AbonoPendiente.objects.filter(cuenta_id=cuenta_id)
+        if hasta_id is None:
+            hasta_id = pendientes.aggregate(ultimo=Max('pk'))['ultimo']
+            if hasta_id is None:
+                return Decimal('0')
+        pendientes = pendientes.filter(pk__lte=hasta_id)
+        total = pendientes.aggregate(total=Sum('monto'))['total']
+        if total is None:
+            return Decimal('0')
+        Cuenta.objects.filter(pk=cuenta_id).update(saldo=F('saldo') + total)
+        pendientes.delete()
+    return total
+
+
+def consolidar_cuentas(cuenta_ids):
+    """ Consolida solo las cuentas indicadas que tengan abonos pendientes (lectura del saldo). """
+    con_pendientes = (
+        AbonoPendiente.objects.filter(cuenta_id__in=cuenta_ids)
+        .values('cuenta_id').annotate(ultimo=Max('pk'))
+    )
+    for fila in con_pendientes:
+        consolidar_cuenta(fila['cuenta_id'], fila['ultimo'])
+
+
+def consolidar_pendientes():
+    """ Consolida todas las cuentas con abonos pendientes. Devuelve (cuentas, monto). """
+    cuentas, monto = 0, Decimal('0')
+    grupos = AbonoPendiente.objects.values('cuenta_id').annotate(ultimo=Max('pk')).order_by('cuenta_id')
+    for fila in grupos:
+        monto += consolidar_cuenta(fila['cuenta_id'], fila['ultimo'])
+        cuentas += 1
+    return cuentas, monto
+
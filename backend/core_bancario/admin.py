@@ -1,13 +1,19 @@
 # backend/core_bancario/admin.py
+from django import forms
 from django.contrib import admin
 from django.http import HttpResponseRedirect
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.html import format_html
-from .models import Cliente, Cuenta, Tarjeta, Directorio, Comercio, Transaccion, AdminDashboardProxy
+from .abonos import consolidar_cuentas
+from .cache_comercios import desactivar_comercios
+from .models import Cliente, Cuenta, Tarjeta, Directorio, Comercio, Transaccion, AdminDashboardProxy, ClaveIdempotencia, MensajeSaliente, Partida, EstadoCuentaTarjeta, VolumenTransacciones, ConfiguracionGlobal
+from .parametros import PARAMETROS
 
 # Registramos el modelo Cliente con personalización
 @admin.register(Cliente)
 class ClienteAdmin(admin.ModelAdmin):
+    """ Un cliente con historial en el libro mayor no se puede borrar: sus partidas protegen cuentas y tarjetas. """
     list_display = ('get_identidad', 'user', 'tipo_persona', 'is_comercio_afiliado', 'created_at')
     search_fields = ('cedula', 'rif', 'user__username', 'user__first_name')
     list_filter = ('tipo_persona',)
@@ -32,6 +38,12 @@ class CuentaAdmin(admin.ModelAdmin):
     search_fields = ('numero_cuenta', 'cliente__cedula')
     # list_filter: Filtro lateral (útil si quisieras filtrar por rangos de fecha, etc)
     list_filter = ('created_at',)
+    actions = ['consolidar_abonos']
+
+    @admin.action(description='Consolidar abonos pendientes en el saldo')
+    def consolidar_abonos(self, request, queryset):
+        consolidar_cuentas(queryset.values_list('pk', flat=True))
+        self.message_user(request, "Abonos pendientes consolidados.")
 
 # Registramos el modelo Tarjeta
 @admin.register(Tarjeta)
@@ -43,17 +55,105 @@ class TarjetaAdmin(admin.ModelAdmin):
 
 @admin.register(Directorio)
 class DirectorioAdmin(admin.ModelAdmin):
-    list_display = ('nombre', 'codigo', 'tipo', 'api_url')
+    list_display = ('nombre', 'codigo', 'tipo', 'alias', 'bins', 'api_url')
     list_filter = ('tipo',)
+    fieldsets = (
+        (None, {'fields': ('codigo', 'nombre', 'rif', 'tipo', 'api_url')}),
+        ('Enrutamiento', {'fields': ('alias', 'bins', 'nombre_externo')}),
+        ('Conector saliente', {'fields': (
+            'url_autorizacion', 'tipo_autenticacion', 'token_api',
+            'pool_conexiones', 'timeout_conexion', 'timeout_lectura',
+        )}),
+    )
 
 @admin.register(Comercio)
 class ComercioAdmin(admin.ModelAdmin):
     list_display = ('nombre', 'codigo_identificador', 'cuenta', 'activo')
+    list_filter = ('activo',)
+    actions = ['desactivar']
+
+    @admin.action(description='Desactivar comercios seleccionados')
+    def desactivar(self, request, queryset):
+        # Pasa por el servicio de caché: la pasarela lo ve de inmediato en este worker y en segundos en los demás
+        total = desactivar_comercios(queryset.values_list('pk', flat=True))
+        self.message_user(request, f"{total} comercio(s) desactivado(s).")
+
+class PartidaInline(admin.TabularInline):
+    """ Partidas del asiento (solo lectura: el libro mayor es append-only). """
+    model = Partida
+    fields = ('cuenta', 'tarjeta', 'externa', 'monto')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 @admin.register(Transaccion)
 class TransaccionAdmin(admin.ModelAdmin):
     list_display = ('tipo', 'monto', 'estado', 'fecha', 'codigo_respuesta')
     list_filter = ('estado', 'tipo')
+    inlines = [PartidaInline]
+
+@admin.register(ClaveIdempotencia)
+class ClaveIdempotenciaAdmin(admin.ModelAdmin):
+    list_display = ('alcance', 'clave', 'estado', 'codigo_http', 'created_at', 'expira')
+    list_filter = ('estado',)
+    search_fields = ('clave',)
+
+@admin.register(MensajeSaliente)
+class MensajeSalienteAdmin(admin.ModelAdmin):
+    list_display = ('id', 'banco', 'estado', 'intentos', 'disponible_desde', 'codigo_http', 'created_at', 'resuelto_en')
+    list_filter = ('estado', 'banco')
+    search_fields = ('clave',)
+    readonly_fields = ('transaccion',)
+    actions = ['reintentar_ahora']
+
+    @admin.action(description='Reintentar ahora (ignorar backoff)')
+    def reintentar_ahora(self, request, queryset):
+        total = queryset.filter(estado='PENDIENTE').update(disponible_desde=timezone.now(), en_linea=False)
+        self.message_user(request, f"{total} mensaje(s) disponibles para el próximo ciclo de la cola.")
+
+@admin.register(EstadoCuentaTarjeta)
+class EstadoCuentaTarjetaAdmin(admin.ModelAdmin):
+    list_display = ('tarjeta', 'fecha_corte', 'fecha_vencimiento', 'saldo_total', 'pago_minimo', 'cargos', 'abonos')
+    list_filter = ('fecha_corte',)
+    search_fields = ('tarjeta__numero',)
+    list_select_related = ('tarjeta',)
+    readonly_fields = [campo.name for campo in EstadoCuentaTarjeta._meta.fields]
+
+@admin.register(VolumenTransacciones)
+class VolumenTransaccionesAdmin(admin.ModelAdmin):
+    list_display = ('inicio', 'granularidad', 'tipo', 'estado', 'banco_emisor_id', 'codigo_respuesta', 'cantidad', 'monto_total')
+    list_filter = ('granularidad', 'tipo', 'estado', 'banco_emisor_id')
+    date_hierarchy = 'inicio'
+    readonly_fields = [campo.name for campo in VolumenTransacciones._meta.fields]
+
+class ConfiguracionGlobalForm(forms.ModelForm):
+    clave = forms.ChoiceField(choices=[(clave, clave) for clave in PARAMETROS])
+
+    class Meta:
+        model = ConfiguracionGlobal
+        fields = ('clave', 'valor')
+
+@admin.register(ConfiguracionGlobal)
+class ConfiguracionGlobalAdmin(admin.ModelAdmin):
+    """ Los cambios llegan a todos los workers en segundos (ver parametros.py). """
+    form = ConfiguracionGlobalForm
+    list_display = ('clave', 'valor', 'tipo', 'descripcion')
+
+    def get_readonly_fields(self, request, obj=None):
+        return ('clave',) if obj else ()
+
+    @admin.display(description='Tipo')
+    def tipo(self, obj):
+        parametro = PARAMETROS.get(obj.clave)
+        return parametro.tipo.nombre if parametro else '-'
+
+    @admin.display(description='Descripción')
+    def descripcion(self, obj):
+        parametro = PARAMETROS.get(obj.clave)
+        return parametro.descripcion if parametro else 'Clave desconocida (se ignora)'
 
 # --- REGISTRO DEL PROXY PARA EL BOTÓN DEL DASHBOARD ---
 @admin.register(AdminDashboardProxy)
@@ -0,0 +1,56 @@
+# backend/core_bancario/almacen_local.py
+
+"""
+Base SQLite local para contadores efímeros de la ruta de pago (velocidad.py,
+limite_tasa.py).
+
+Con archivo, lo comparten los workers de gunicorn de la misma máquina (WAL,
+sin fsync: un corte de luz solo pierde contadores). Sin archivo, la base vive
+en la memoria de cada proceso (desarrollo). Cada proceso usa una conexión,
+bajo un lock: cada operación dura microsegundos y entre procesos coordina
+SQLite. Nada de esto pasa por la BD de Django.
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class AlmacenLocal:
+    """ Conexión SQLite por proceso (se reabre tras un fork) con el esquema `esquema`. """
+
+    def __init__(self, archivo, esquema):
+        self.ruta = archivo or ':memory:'
+        self.esquema = esquema
+        self._conexion_pid = (None, None)
+        self._lock = threading.Lock()
+
+    def _conexion(self):
+        """ Llamar con el lock tomado. """
+        conexion, pid = self._conexion_pid
+        if pid != os.getpid(): # Proceso bifurcado: la conexión heredada es del padre
+            conexion = sqlite3.connect(self.ruta, timeout=5, isolation_level=None, check_same_thread=False)
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("PRAGMA synchronous=OFF") # Contadores efímeros: no valen un fsync por pago
+            conexion.executescript(self.esquema)
+            self._conexion_pid = (conexion, os.getpid())
+        return conexion
+
+    @contextmanager
+    def leer(self):
+        with self._lock:
+            yield self._conexion()
+
+    @contextmanager
+    def escribir(self):
+        """ Transacción con el bloqueo de escritura tomado desde el inicio (BEGIN IMMEDIATE). """
+        with self._lock:
+            conexion = self._conexion()
+            conexion.execute("BEGIN IMMEDIATE")
+            try:
+                yield conexion
+            except BaseException:
+                conexion.execute("ROLLBACK")
+                raise
+            conexion.execute("COMMIT")
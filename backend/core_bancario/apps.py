@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class CoreBancarioConfig(AppConfig):
     name = 'core_bancario'
+
+    def ready(self):
+        # Registra los receptores de señales (invalidación de cachés en memoria)
+        from . import signals  # noqa: F401
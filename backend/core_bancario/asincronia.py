@@ -0,0 +1,67 @@
+# backend/core_bancario/asincronia.py
+
+"""
+Puente entre las vistas asíncronas de la pasarela y el ORM síncrono.
+
+Bajo ASGI las vistas de pago no bloquean el event loop: la llamada al banco
+aliado usa httpx de forma no bloqueante y todo el trabajo con el ORM se
+ejecuta en un pool de hilos acotado (PASARELA_HILOS_BD), que es también el
+límite de conexiones a la base de datos abiertas por la pasarela en cada worker.
+
+Las respuestas en streaming que leen del ORM (estado de cuenta) se recorren
+con iterar_en_hilo(): bajo ASGI, StreamingHttpResponse con un generador
+síncrono lo consumiría entero en memoria antes de enviar el primer byte.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections, connections
+
+_pool_bd = ThreadPoolExecutor(max_workers=settings.PASARELA_HILOS_BD, thread_name_prefix='pasarela-bd')
+
+
+def _con_conexion_vigente(func, *args, **kwargs):
+    # Los hilos del pool no pasan por request_started/finished: descartamos aquí
+    # las conexiones caducadas (CONN_MAX_AGE) o rotas antes de usarlas.
+    close_old_connections()
+    return func(*args, **kwargs)
+
+
+async def en_hilo_bd(func, *args, **kwargs):
+    """ Ejecuta una función síncrona (ORM) en el pool acotado y espera su resultado. """
+    return await sync_to_async(_con_conexion_vigente, thread_sensitive=False, executor=_pool_bd)(
+        func, *args, **kwargs
+    )
+
+
+async def iterar_en_hilo(generador):
+    """
+    Iterador asíncrono sobre un generador síncrono que usa el ORM. Cada bloque se
+    pide con sync_to_async en un hilo propio del recorrido: el cursor del servidor
+    queda en la conexión de ese hilo, que se cierra al terminar (o si el cliente
+    se desconecta).
+    """
+    hilo = ThreadPoolExecutor(max_workers=1, thread_name_prefix='streaming-bd')
+
+    def en_hilo(func, *args):
+        return sync_to_async(func, thread_sensitive=False, executor=hilo)(*args)
+
+    def siguiente():
+        return next(generador, None)
+
+    try:
+        await en_hilo(close_old_connections)
+        while (bloque := await en_hilo(siguiente)) is not None:
+            yield bloque
+    finally:
+        await en_hilo(generador.close)
+        await en_hilo(connections.close_all)
+        hilo.shutdown(wait=False)
+
+
+def es_asgi(request):
+    """ True si la petición (de Django o de DRF) llegó por el servidor ASGI (hay un event loop de larga vida). """
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
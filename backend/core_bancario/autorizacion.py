@@ -0,0 +1,255 @@
+# backend/core_bancario/autorizacion.py
+
+"""
+Motor de autorización de pagos con tarjeta.
+
+Los saldos nunca se leen, comparan y guardan desde Python: el débito de la
+tarjeta es un UPDATE condicional (``saldo_disponible >= monto``). Si afecta 0
+filas, la tarjeta no tiene fondos (o fue bloqueada entre la lectura y el débito).
+
+El crédito al comercio es un INSERT en AbonoPendiente (ver abonos.py): la
+única fila bloqueada por una autorización es la de la Tarjeta, así los pagos
+a un comercio muy concurrido no hacen cola sobre su Cuenta.
+
+Los lotes On-Us (carga masiva desde datáfonos) bloquean primero todas las
+tarjetas del bloque con SELECT ... FOR UPDATE, deciden cada pago en orden
+contra el saldo bloqueado y aplican un solo UPDATE agrupado sobre Tarjeta,
+un abono por cuenta destino y INSERT masivos de Transaccion y de sus partidas.
+
+Tras el débito, con la tarjeta bloqueada, cada pago (unitario o de un lote)
+consulta los controles de velocidad por tarjeta y por comercio (velocidad.py),
+y cada CVV inválido cuenta para el bloqueo por CVV fallidos.
+
+Cada autorización asienta también sus partidas en el libro mayor (libro.py).
+Los rechazos de negocio quedan en la bitácora como Transaccion RECHAZADO con
+su código de error, fuera de la transacción revertida (ver volumen.py).
+"""
+
+from collections import defaultdict, namedtuple
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Value, When
+from rest_framework import status
+
+from . import cache_dashboard, velocidad
+from .abonos import registrar_abono, registrar_abonos
+from .libro import asentar, asentar_lote, pierna_cuenta, pierna_externa, pierna_tarjeta
+from .models import Tarjeta, Transaccion
+
+
+class AutorizacionRechazada(Exception):
+    """ Rechazo de negocio. La vista lo traduce con error_response(). """
+
+    def __init__(self, codigo, mensaje, http_status=status.HTTP_404_NOT_FOUND):
+        super().__init__(mensaje)
+        self.codigo = codigo
+        self.mensaje = mensaje
+        self.http_status = http_status
+
+
+def obtener_tarjeta(numero_tarjeta):
+    """ Lee solo las columnas necesarias para autorizar (una consulta, sin instanciar el modelo). """
+    try:
+        return Tarjeta.objects.values('id', 'cuenta_id', 'cvv', 'estado').get(numero=numero_tarjeta)
+    except Tarjeta.DoesNotExist:
+        raise AutorizacionRechazada("IERROR_1005", "Tarjeta no encontrada.")
+
+
+def validar_tarjeta(tarjeta, cvc):
+    if not tarjeta['estado']:
+        raise AutorizacionRechazada("IERROR_1003", "Tarjeta inoperativa.")
+    if tarjeta['cvv'] != cvc:
+        raise AutorizacionRechazada("IERROR_1005", "CVV inválido.")
+
+
+def rechazo_velocidad(tarjeta_id, comercio, monto):
+    """ AutorizacionRechazada si el pago excede un control de velocidad; None si pasa. """
+    regla = velocidad.verificar(tarjeta_id, comercio, monto)
+    if regla is None:
+        return None
+    return AutorizacionRechazada(
+        "IERROR_1009", f"Transacción rechazada por control de riesgo ({regla}).", status.HTTP_403_FORBIDDEN
+    )
+
+
+def debitar_tarjeta(tarjeta_id, monto):
+    """ Débito condicional. Devuelve False si no se actualizó ninguna fila (fondos insuficientes). """
+    filas = Tarjeta.objects.filter(
+        pk=tarjeta_id, estado=True, saldo_disponible__gte=monto
+    ).update(saldo_disponible=F('saldo_disponible') - monto)
+    return filas == 1
+
+
+def transaccion_rechazada(rechazo, monto, cuenta_origen_id, cuenta_destino_id, datos_transaccion):
+    """ Transaccion RECHAZADO (sin guardar) con el código y mensaje del rechazo. """
+    return Transaccion(
+        monto=monto, cuenta_origen_id=cuenta_origen_id, cuenta_destino_id=cuenta_destino_id,
+        estado='RECHAZADO', codigo_respuesta=rechazo.codigo, **dict(datos_transaccion, mensaje_error=rechazo.mensaje)
+    )
+
+
+def acreditar_cuenta(cuenta_id, monto):
+    """ Crédito sin leer ni bloquear la Cuenta: se consolida después en Cuenta.saldo. """
+    registrar_abono(cuenta_id, monto)
+
+
+def autorizar_debito_tarjeta(numero_tarjeta, cvc, monto, mensaje_fondos, comercio, cuenta_destino_id=None,
+                             contrapartida_externa=None, **datos_transaccion):
+    """
+    Autoriza un cargo a una tarjeta propia y abona el monto a una cuenta de nuestro
+    banco (pago On-Us) o a una contrapartida externa del libro (ej. el banco
+    adquiriente), dentro de la misma transacción.
+
+    `comercio` identifica al comercio en los controles de velocidad.
+
+    Lanza AutorizacionRechazada si la tarjeta no existe, está inactiva, el CVV no
+    coincide, no hay saldo disponible o excede un control de velocidad, tras
+    registrar la Transaccion RECHAZADO.
+    """
+    if cuenta_destino_id is None and not contrapartida_externa:
+        raise ValueError("Se requiere una cuenta destino o una contrapartida externa.")
+    tarjeta = None
+    try:
+        tarjeta = obtener_tarjeta(numero_tarjeta)
+        try:
+            validar_tarjeta(tarjeta, cvc)
+        except AutorizacionRechazada as rechazo:
+            if rechazo.codigo == "IERROR_1005":
+                velocidad.registrar_cvv_fallido(tarjeta['id'])
+            raise
+
+        with transaction.atomic():
+            # 1. Tarjeta (único bloqueo): 0 filas = fondos insuficientes, no hay nada que revertir.
+            if not debitar_tarjeta(tarjeta['id'], monto):
+                raise AutorizacionRechazada("IERROR_1004", mensaje_fondos)
+
+            # Velocidad con la fila de la tarjeta bloqueada: los pagos simultáneos de una
+            # misma tarjeta se verifican de a uno. Si excede, el rechazo revierte el débito.
+            rechazo = rechazo_velocidad(tarjeta['id'], comercio, monto)
+            if rechazo is not None:
+                raise rechazo
+            cache_dashboard.invalidar(cuentas=[tarjeta['cuenta_id']])
+
+            # 2. Cuenta destino: abono pendiente (INSERT, sin bloqueo)
+            if cuenta_destino_id is not None:
+                acreditar_cuenta(cuenta_destino_id, monto)
+
+            registro = Transaccion.objects.create(
+                monto=monto, cuenta_origen_id=tarjeta['cuenta_id'], cuenta_destino_id=cuenta_destino_id,
+                estado='APROBADO', codigo_respuesta='201', **datos_transaccion
+            )
+
+            # 3. Libro mayor: la tarjeta baja y sube la cuenta destino (o la contrapartida externa)
+            contrapartida = (
+                pierna_cuenta(cuenta_destino_id, monto) if cuenta_destino_id is not None
+                else pierna_externa(contrapartida_externa, monto)
+            )
+            asentar(registro.pk, pierna_tarjeta(tarjeta['id'], -monto), contrapartida)
+            tarjeta_id = tarjeta['id']
+            transaction.on_commit(lambda: velocidad.registrar_aprobada(tarjeta_id, comercio, monto))
+            return registro
+    except AutorizacionRechazada as rechazo:
+        # Fuera del atomic revertido: el rechazo queda en la bitácora
+        transaccion_rechazada(
+            rechazo, monto, tarjeta['cuenta_id'] if tarjeta else None, cuenta_destino_id, datos_transaccion
+        ).save()
+        raise
+
+
+# --- LOTES ON-US ---
+
+PagoLote = namedtuple('PagoLote', ['numero_tarjeta', 'cvc', 'monto', 'cuenta_destino_id', 'comercio', 'datos_transaccion'])
+
+
+def _monto_por_fila(montos):
+    """ {pk: monto} -> expresión CASE para aplicar montos distintos en un solo UPDATE. """
+    return Case(
+        *[When(pk=pk, then=Value(monto)) for pk, monto in montos.items()],
+        output_field=DecimalField(max_digits=15, decimal_places=2),
+    )
+
+
+def autorizar_lote_on_us(pagos, mensaje_fondos):
+    """
+    Autoriza una lista de PagoLote de tarjetas propias hacia cuentas propias.
+    Devuelve una lista paralela con la Transaccion creada o la AutorizacionRechazada de cada pago.
+    Se procesa en bloques de PAGOS_LOTE_BLOQUE para acotar el tiempo que se retienen los bloqueos.
+    """
+    tamano = settings.PAGOS_LOTE_BLOQUE
+    resultados = []
+    for inicio in range(0, len(pagos), tamano):
+        resultados.extend(_autorizar_bloque(pagos[inicio:inicio + tamano], mensaje_fondos))
+    return resultados
+
+
+def _autorizar_bloque(pagos, mensaje_fondos):
+    with transaction.atomic():
+        # 1. Tarjetas, bloqueadas en orden de pk para no interbloquearse con otros lotes.
+        tarjetas = {
+            tarjeta['numero']: tarjeta
+            for tarjeta in Tarjeta.objects.select_for_update().filter(
+                numero__in={pago.numero_tarjeta for pago in pagos}
+            ).order_by('pk').values('id', 'numero', 'cuenta_id', 'cvv', 'estado', 'saldo_disponible')
+        }
+
+        debitos = defaultdict(Decimal)
+        creditos = defaultdict(Decimal)
+        transacciones = []
+        rechazadas = []
+        tarjetas_aprobadas = []
+        resultados = []
+        cuentas_tarjeta = set()
+        for pago in pagos:
+            tarjeta = tarjetas.get(pago.numero_tarjeta)
+            try:
+                if tarjeta is None:
+                    raise AutorizacionRechazada("IERROR_1005", "Tarjeta no encontrada.")
+                try:
+                    validar_tarjeta(tarjeta, pago.cvc)
+                except AutorizacionRechazada as rechazo:
+                    if rechazo.codigo == "IERROR_1005":
+                        velocidad.registrar_cvv_fallido(tarjeta['id']) # Cuenta ya para los pagos siguientes del lote
+                    raise
+                # Saldo bloqueado menos lo ya aprobado a esta tarjeta en el mismo bloque.
+                if tarjeta['saldo_disponible'] - debitos.get(tarjeta['id'], 0) < pago.monto:
+                    raise AutorizacionRechazada("IERROR_1004", mensaje_fondos)
+                rechazo = rechazo_velocidad(tarjeta['id'], pago.comercio, pago.monto)
+                if rechazo is not None:
+                    raise rechazo
+            except AutorizacionRechazada as rechazo:
+                resultados.append(rechazo)
+                rechazadas.append(transaccion_rechazada(
+                    rechazo, pago.monto, tarjeta['cuenta_id'] if tarjeta else None, pago.cuenta_destino_id, pago.datos_transaccion
+                ))
+                continue
+
+            # Se registra ya (no al confirmar) para que lo vean los pagos siguientes del bloque;
+            # si el bloque se revirtiera, los contadores quedarían por encima: del lado seguro.
+            velocidad.registrar_aprobada(tarjeta['id'], pago.comercio, pago.monto)
+            debitos[tarjeta['id']] += pago.monto
+            creditos[pago.cuenta_destino_id] += pago.monto
+            registro = Transaccion(
+                monto=pago.monto, cuenta_origen_id=tarjeta['cuenta_id'], cuenta_destino_id=pago.cuenta_destino_id,
+                estado='APROBADO', codigo_respuesta='201', **pago.datos_transaccion
+            )
+            transacciones.append(registro)
+            tarjetas_aprobadas.append(tarjeta['id'])
+            resultados.append(registro)
+            cuentas_tarjeta.add(tarjeta['cuenta_id'])
+
+        if debitos:
+            Tarjeta.objects.filter(pk__in=debitos).update(
+                saldo_disponible=F('saldo_disponible') - _monto_por_fila(debitos)
+            )
+            cache_dashboard.invalidar(cuentas=cuentas_tarjeta)
+        # 2. Cuentas destino: un abono pendiente por cuenta
+        if creditos:
+            registrar_abonos(creditos)
+        Transaccion.objects.bulk_create(transacciones + rechazadas)
+        asentar_lote([
+            (registro.pk, [pierna_tarjeta(tarjeta_id, -registro.monto), pierna_cuenta(registro.cuenta_destino_id, registro.monto)])
+            for registro, tarjeta_id in zip(transacciones, tarjetas_aprobadas)
+        ])
+    return resultados
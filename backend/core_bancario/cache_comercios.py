@@ -0,0 +1,128 @@
+# backend/core_bancario/cache_comercios.py
+
+"""
+Caché en memoria (por proceso) de perfiles de comercio para la ruta adquiriente.
+
+Los comercios cambian muy poco pero se leen en cada pase de tarjeta, así que se
+guarda un perfil plano (sin instancias del ORM) con desalojo LRU y capacidad
+acotada.
+
+Las escrituras sobre Comercio (signals.py y desactivar_comercios) marcan una
+nueva versión en la caché compartida al confirmarse la transacción, como
+parametros.py, y descartan el perfil en este proceso. Los demás workers
+comparan su versión con la compartida a lo sumo cada COMERCIOS_CACHE_REVISION_S
+segundos (una lectura de la caché, sin BD) y, si cambió, vacían su copia. El
+TTL sigue acotando la desactualización si la caché compartida es local a cada
+proceso o se vacía.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Comercio
+
+CLAVE_VERSION = 'comercios:version'
+
+PerfilComercio = namedtuple(
+    'PerfilComercio', ['id', 'codigo_identificador', 'nombre', 'activo', 'cuenta_id', 'numero_cuenta']
+)
+
+
+class CacheComercios:
+    """ LRU con capacidad máxima y expiración por entrada. Segura entre hilos. """
+
+    def __init__(self, capacidad, ttl_segundos, revision_segundos):
+        self.capacidad = capacidad
+        self.ttl = ttl_segundos
+        self.revision = revision_segundos
+        self._entradas = OrderedDict() # codigo -> (perfil, expira_en)
+        self._version = None
+        self._revisar_en = 0 # monotonic: próxima comparación con la versión compartida
+        self._lock = threading.Lock()
+
+    def obtener(self, codigo):
+        """ Devuelve el PerfilComercio. Lanza Comercio.DoesNotExist si no existe. """
+        ahora = time.monotonic()
+        if ahora >= self._revisar_en:
+            self._revisar(ahora)
+        with self._lock:
+            entrada = self._entradas.get(codigo)
+            if entrada is not None and entrada[1] > ahora:
+                self._entradas.move_to_end(codigo)
+                return entrada[0]
+            version = self._version
+
+        # Fallo de caché: una sola consulta (JOIN con la cuenta), fuera del lock.
+        fila = Comercio.objects.values_list(
+            'id', 'codigo_identificador', 'nombre', 'activo', 'cuenta_id', 'cuenta__numero_cuenta'
+        ).get(codigo_identificador=codigo)
+        perfil = PerfilComercio(*fila)
+
+        with self._lock:
+            if self._version != version:
+                return perfil # Cambió algún comercio durante la consulta: la fila leída puede ser vieja
+            self._entradas[codigo] = (perfil, ahora + self.ttl)
+            self._entradas.move_to_end(codigo)
+            while len(self._entradas) > self.capacidad:
+                self._entradas.popitem(last=False)
+        return perfil
+
+    def _revisar(self, ahora):
+        version = cache.get(CLAVE_VERSION)
+        with self._lock:
+            if version != self._version:
+                self._entradas.clear()
+                self._version = version
+            self._revisar_en = ahora + self.revision
+
+    def invalidar(self, comercio_id):
+        """ Descarta el perfil de un comercio por id (cubre cambios de codigo_identificador). """
+        with self._lock:
+            for codigo in [c for c, (perfil, _) in self._entradas.items() if perfil.id == comercio_id]:
+                del self._entradas[codigo]
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+
+_cache = CacheComercios(
+    settings.COMERCIOS_CACHE_CAPACIDAD, settings.COMERCIOS_CACHE_TTL, settings.COMERCIOS_CACHE_REVISION_S
+)
+
+
+def obtener_comercio(codigo):
+    return _cache.obtener(codigo)
+
+
+def _marcar(comercio_ids):
+    cache.set(CLAVE_VERSION, uuid.uuid4().hex, timeout=None)
+    for comercio_id in comercio_ids: # Este proceso lo ve de inmediato; los demás en la próxima revisión
+        _cache.invalidar(comercio_id)
+
+
+def invalidar_comercios(comercio_ids):
+    """ Nueva versión de los comercios, al confirmarse la transacción en curso. """
+    comercio_ids = list(comercio_ids)
+    transaction.on_commit(lambda: _marcar(comercio_ids))
+
+
+def invalidar_comercio(comercio_id):
+    invalidar_comercios([comercio_id])
+
+
+def desactivar_comercios(comercio_ids):
+    """
+    Desactiva comercios en bloque (acción del admin). Un UPDATE masivo no dispara
+    señales, por eso la invalidación de la caché se hace aquí explícitamente.
+    """
+    comercio_ids = list(comercio_ids)
+    actualizados = Comercio.objects.filter(pk__in=comercio_ids, activo=True).update(activo=False)
+    invalidar_comercios(comercio_ids)
+    return actualizados
@@ -0,0 +1,86 @@
+# backend/core_bancario/cache_dashboard.py
+
+"""
+Caché del dashboard del cliente (respuesta JSON ya renderizada + ETag).
+
+La entrada de cada usuario guarda, junto al contenido, la versión vigente de
+su cliente y de cada una de sus cuentas al momento de construirla. Quien
+cambia saldos o tarjetas no necesita saber de qué usuario son: solo marca una
+nueva versión de la cuenta (o del cliente) al confirmarse la transacción:
+
+- Débitos a tarjetas y abonos a cuentas (autorizacion.py, abonos.py).
+- Altas y cambios de User, Cliente, Cuenta y Tarjeta (signals.py).
+- Reconstrucción de saldos desde el libro (libro.py).
+
+Leer el dashboard desde la caché cuesta dos lecturas de la caché (entrada y
+versiones) y ninguna consulta a la BD. Si alguna versión cambió, la entrada
+se descarta y se reconstruye. Las versiones se leen antes que los datos: un
+cambio concurrente deja la entrada con una versión vieja, nunca al revés.
+"""
+
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+PREFIJO = 'dashboard'
+
+
+def _clave_entrada(user_id):
+    return f"{PREFIJO}:{user_id}"
+
+
+def clave_cliente(cliente_id):
+    return f"{PREFIJO}:v:cliente:{cliente_id}"
+
+
+def clave_cuenta(cuenta_id):
+    return f"{PREFIJO}:v:cuenta:{cuenta_id}"
+
+
+def _marcar(claves):
+    version = uuid.uuid4().hex
+    cache.set_many({clave: version for clave in claves}, timeout=None)
+
+
+def invalidar(cuentas=(), clientes=()):
+    """ Nueva versión para las cuentas / clientes indicados, al confirmarse la transacción en curso. """
+    claves = [clave_cuenta(pk) for pk in set(cuentas)] + [clave_cliente(pk) for pk in set(clientes)]
+    if claves:
+        transaction.on_commit(lambda: _marcar(claves))
+
+
+def descartar(user_id):
+    """ Borra la entrada de un usuario (cambios en User: nombre, permisos). """
+    transaction.on_commit(lambda: cache.delete(_clave_entrada(user_id)))
+
+
+def leer_versiones(claves):
+    """ {clave: versión}; None si la cuenta o el cliente no han cambiado desde que existe la caché. """
+    actuales = cache.get_many(claves)
+    return {clave: actuales.get(clave) for clave in claves}
+
+
+def obtener(user_id):
+    """ Devuelve (contenido, etag) si la entrada del usuario sigue vigente, o None. """
+    entrada = cache.get(_clave_entrada(user_id))
+    if entrada is None:
+        return None
+    if leer_versiones(list(entrada['versiones'])) != entrada['versiones']:
+        return None
+    return entrada['contenido'], entrada['etag']
+
+
+def calcular_etag(contenido):
+    return f'"{hashlib.sha1(contenido).hexdigest()}"'
+
+
+def guardar(user_id, versiones, contenido, etag):
+    """ versiones: lo devuelto por leer_versiones() ANTES de leer los datos. """
+    cache.set(
+        _clave_entrada(user_id),
+        {'versiones': versiones, 'contenido': contenido, 'etag': etag},
+        timeout=settings.DASHBOARD_CACHE_TTL,
+    )
@@ -0,0 +1,149 @@
+# backend/core_bancario/ciclos_tarjeta.py
+
+"""
+Cierre de ciclo de facturación de las tarjetas de crédito.
+
+El día de corte D se cierran las tarjetas con dia_corte = D.day (y, si D es
+el último día del mes, también las de dia_corte mayor: una tarjeta con corte
+el 31 cierra el 28 o 29 de febrero). El ciclo va del día siguiente al corte
+anterior hasta D, ambos inclusive.
+
+Los montos salen del libro mayor: las partidas de la tarjeta (sin el asiento
+de APERTURA, que es la línea de crédito) dan cargos, abonos y deuda al corte.
+Cada tarea cierra un rango de ids de tarjetas con una consulta agregada y un
+INSERT masivo, sin consultas por tarjeta; los rangos se reparten en un pool
+de procesos. Volver a correr un corte no duplica estados de cuenta
+(restricción estado_tarjeta_unico_por_corte).
+"""
+
+import calendar
+import multiprocessing
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import DecimalField, F, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from . import parametros
+from .historial import inicio_del_dia
+from .models import EstadoCuentaTarjeta, Tarjeta
+
+CERO = Decimal('0.00')
+
+
+# --- CALENDARIO ---
+
+def fecha_en_mes(anio, mes, dia):
+    """ El día `dia` del mes, o su último día si el mes es más corto. """
+    return date(anio, mes, min(dia, calendar.monthrange(anio, mes)[1]))
+
+
+def _mes_desplazado(fecha, meses):
+    indice = fecha.year * 12 + fecha.month - 1 + meses
+    return indice // 12, indice % 12 + 1
+
+
+def dias_de_corte(fecha):
+    """ Valores de dia_corte que cierran en `fecha`. """
+    ultimo = calendar.monthrange(fecha.year, fecha.month)[1]
+    return list(range(fecha.day, 32)) if fecha.day == ultimo else [fecha.day]
+
+
+def inicio_de_ciclo(fecha_corte, dia_corte):
+    """ Día siguiente al corte del mes anterior. """
+    return fecha_en_mes(*_mes_desplazado(fecha_corte, -1), dia_corte) + timedelta(days=1)
+
+
+def vencimiento(fecha_corte, dia_corte, dia_pago):
+    """ Próximo dia_pago después del corte: el mismo mes si cae después, si no el siguiente. """
+    if dia_pago > dia_corte:
+        return fecha_en_mes(fecha_corte.year, fecha_corte.month, dia_pago)
+    return fecha_en_mes(*_mes_desplazado(fecha_corte, 1), dia_pago)
+
+
+def pago_minimo(saldo_total):
+    if saldo_total <= 0:
+        return CERO
+    porcentaje = (saldo_total * parametros.obtener('PAGO_MINIMO_PORCENTAJE') / 100).quantize(CERO)
+    return min(saldo_total, max(parametros.obtener('PAGO_MINIMO_FIJO'), porcentaje))
+
+
+# --- CIERRE ---
+
+def _suma(filtro, expresion=F('partidas__monto')):
+    return Coalesce(Sum(expresion, filter=filtro), Value(CERO), output_field=DecimalField(max_digits=15, decimal_places=2))
+
+
+def cerrar_rango(fecha_corte, dia_corte, id_desde, id_hasta):
+    """
+    Cierra el ciclo de las tarjetas con ese dia_corte e id en [id_desde, id_hasta].
+    Una consulta agregada + un INSERT masivo. Devuelve cuántos estados de cuenta se crearon.
+    """
+    inicio = inicio_de_ciclo(fecha_corte, dia_corte)
+    desde, hasta = inicio_del_dia(inicio), inicio_del_dia(fecha_corte + timedelta(days=1))
+
+    movimiento = ~Q(partidas__transaccion__tipo='APERTURA')
+    antes_del_ciclo = movimiento & Q(partidas__transaccion__fecha__lt=desde)
+    hasta_el_corte = movimiento & Q(partidas__transaccion__fecha__lt=hasta)
+    en_el_ciclo = movimiento & Q(partidas__transaccion__fecha__gte=desde, partidas__transaccion__fecha__lt=hasta)
+
+    tarjetas = (
+        Tarjeta.objects.filter(pk__gte=id_desde, pk__lte=id_hasta, dia_corte=dia_corte)
+        .exclude(estados_cuenta__fecha_corte=fecha_corte)
+        .annotate(
+            # Las partidas suman al saldo disponible: la deuda es su negativo
+            disponible_anterior=_suma(antes_del_ciclo),
+            disponible_corte=_suma(hasta_el_corte),
+            cargos=_suma(en_el_ciclo & Q(partidas__monto__lt=0), -F('partidas__monto')),
+            abonos=_suma(en_el_ciclo & Q(partidas__monto__gt=0)),
+        )
+        .values_list('pk', 'dia_pago', 'limite_credito', 'disponible_anterior', 'disponible_corte', 'cargos', 'abonos')
+    )
+
+    estados = []
+    for pk, dia_pago, limite_credito, disponible_anterior, disponible_corte, cargos, abonos in tarjetas:
+        saldo_total = (-disponible_corte).quantize(CERO)
+        estados.append(EstadoCuentaTarjeta(
+            tarjeta_id=pk, fecha_inicio=inicio, fecha_corte=fecha_corte,
+            fecha_vencimiento=vencimiento(fecha_corte, dia_corte, dia_pago),
+            saldo_anterior=(-disponible_anterior).quantize(CERO), cargos=cargos, abonos=abonos,
+            saldo_total=saldo_total, pago_minimo=pago_minimo(saldo_total), limite_credito=limite_credito,
+        ))
+    EstadoCuentaTarjeta.objects.bulk_create(estados, ignore_conflicts=True)
+    return len(estados)
+
+
+def rangos_de_corte(fecha_corte, tamano_rango=None):
+    """ Tareas (fecha_corte, dia_corte, id_desde, id_hasta) que cubren las tarjetas que cierran ese día. """
+    tamano_rango = tamano_rango or settings.CICLO_TARJETAS['TARJETAS_POR_RANGO']
+    grupos = (
+        Tarjeta.objects.filter(dia_corte__in=dias_de_corte(fecha_corte))
+        .values('dia_corte').annotate(primero=Min('pk'), ultimo=Max('pk')).order_by('dia_corte')
+    )
+    return [
+        (fecha_corte, grupo['dia_corte'], inicio, min(inicio + tamano_rango - 1, grupo['ultimo']))
+        for grupo in grupos
+        for inicio in range(grupo['primero'], grupo['ultimo'] + 1, tamano_rango)
+    ]
+
+
+def _cerrar_tarea(tarea):
+    return cerrar_rango(*tarea)
+
+
+def cerrar_ciclo(fecha_corte, procesos=1, tamano_rango=None):
+    """
+    Cierra el ciclo de todas las tarjetas con corte en `fecha_corte`.
+    Con procesos > 1 los rangos se reparten en un pool de procesos (fork), cada
+    uno con su propia conexión a la BD. Devuelve (tareas, estados_creados).
+    """
+    tareas = rangos_de_corte(fecha_corte, tamano_rango)
+    if procesos <= 1 or len(tareas) <= 1:
+        return len(tareas), sum(_cerrar_tarea(tarea) for tarea in tareas)
+
+    connections.close_all() # Antes de bifurcar: cada proceso abre su propia conexión
+    with multiprocessing.get_context('fork').Pool(processes=min(procesos, len(tareas))) as pool:
+        creados = sum(pool.imap_unordered(_cerrar_tarea, tareas))
+    return len(tareas), creados
@@ -0,0 +1,350 @@
+# backend/core_bancario/conectores.py
+
+"""
+Capa de conectores hacia los bancos aliados (rol adquiriente).
+
+Cada banco del Directorio tiene un único conector de larga vida por proceso:
+una requests.Session con su propio pool keep-alive (sin handshake TLS por
+pase de tarjeta), timeouts de conexión/lectura y cabeceras de autenticación
+propios, un tope de conexiones concurrentes y estadísticas de latencia.
+
+Además, cada banco tiene un cortacircuitos (CERRADO / ABIERTO / SEMIABIERTO):
+si la tasa de errores o de llamadas lentas supera el umbral, los pagos hacia
+ese banco se rechazan de inmediato en lugar de bloquear un worker hasta el
+timeout. Pasado CIRCUITO_BANCOS['SEGUNDOS_ABIERTO'] se dejan pasar unas pocas
+llamadas de prueba antes de cerrarlo de nuevo.
+
+La configuración sale del Directorio (ver enrutamiento.py); si cambia, el
+conector se reemplaza y la sesión anterior se cierra, junto con sus clientes
+httpx (cada uno en su event loop, al terminar sus peticiones en curso).
+
+Para las vistas asíncronas (ASGI) el conector ofrece autorizar_async(), con un
+httpx.AsyncClient por event loop que respeta los mismos límites y timeouts.
+"""
+
+import asyncio
+import threading
+import time
+import weakref
+from collections import deque, namedtuple
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+ConfigConector = namedtuple(
+    'ConfigConector',
+    ['url', 'tipo_autenticacion', 'token', 'pool_conexiones', 'timeout_conexion', 'timeout_lectura']
+)
+
+
+class ConectorSaturado(requests.exceptions.RequestException):
+    """ Todas las conexiones permitidas hacia el banco están ocupadas. """
+
+
+class BancoSinRespuesta(requests.exceptions.RequestException):
+    """ Error de transporte en la ruta asíncrona (httpx), con la misma jerarquía que requests. """
+
+
+class CircuitoAbierto(Exception):
+    """ El cortacircuitos del banco está abierto: la llamada no se intenta. """
+
+
+class CircuitoBanco:
+    """ Cortacircuitos por banco basado en una ventana de las últimas llamadas. """
+
+    CERRADO, ABIERTO, SEMIABIERTO = 'CERRADO', 'ABIERTO', 'SEMIABIERTO'
+
+    def __init__(self, ventana, minimo_llamadas, tasa_error, latencia_lenta_ms, tasa_lentas,
+                 segundos_abierto, pruebas_semiabierto):
+        self.minimo_llamadas = minimo_llamadas
+        self.tasa_error = tasa_error
+        self.latencia_lenta_ms = latencia_lenta_ms
+        self.tasa_lentas = tasa_lentas
+        self.segundos_abierto = segundos_abierto
+        self.pruebas_semiabierto = pruebas_semiabierto
+
+        self.estado = self.CERRADO
+        self.aperturas = 0
+        self._resultados = deque(maxlen=ventana) # (fallo, lenta)
+        self._abierto_hasta = 0.0
+        self._pruebas_en_curso = 0
+        self._pruebas_exitosas = 0
+        self._lock = threading.Lock()
+
+    def permitir(self):
+        """ ¿Se puede intentar una llamada ahora? """
+        with self._lock:
+            if self.estado == self.ABIERTO:
+                if time.monotonic() < self._abierto_hasta:
+                    return False
+                self.estado = self.SEMIABIERTO
+                self._pruebas_en_curso = self._pruebas_exitosas = 0
+            if self.estado == self.SEMIABIERTO:
+                if self._pruebas_en_curso >= self.pruebas_semiabierto:
+                    return False
+                self._pruebas_en_curso += 1
+            return True
+
+    def registrar(self, duracion_ms, fallo):
+        lenta = duracion_ms >= self.latencia_lenta_ms
+        with self._lock:
+            if self.estado == self.SEMIABIERTO:
+                self._pruebas_en_curso = max(0, self._pruebas_en_curso - 1)
+                if fallo or lenta:
+                    self._abrir()
+                else:
+                    self._pruebas_exitosas += 1
+                    if self._pruebas_exitosas >= self.pruebas_semiabierto:
+                        self.estado = self.CERRADO
+                        self._resultados.clear()
+                return
+
+            self._resultados.append((fallo, lenta))
+            total = len(self._resultados)
+            if total < self.minimo_llamadas:
+                return
+            fallos = sum(1 for f, _ in self._resultados if f)
+            lentas = sum(1 for _, l in self._resultados if l)
+            if fallos / total >= self.tasa_error or lentas / total >= self.tasa_lentas:
+                self._abrir()
+
+    def abandonar(self):
+        """ La llamada permitida terminó sin resultado (ej. cancelada): libera su prueba sin juzgar al banco. """
+        with self._lock:
+            if self.estado == self.SEMIABIERTO:
+                self._pruebas_en_curso = max(0, self._pruebas_en_curso - 1)
+
+    def _abrir(self):
+        self.estado = self.ABIERTO
+        self.aperturas += 1
+        self._abierto_hasta = time.monotonic() + self.segundos_abierto
+        self._resultados.clear()
+
+    def resumen(self):
+        with self._lock:
+            total = len(self._resultados)
+            return {
+                "estado": self.estado,
+                "aperturas": self.aperturas,
+                "tasa_error": round(sum(1 for f, _ in self._resultados if f) / total, 3) if total else 0.0,
+                "reabre_en_s": round(max(0.0, self._abierto_hasta - time.monotonic()), 1)
+                    if self.estado == self.ABIERTO else 0.0,
+            }
+
+
+class EstadisticasLatencia:
+    """ Contadores y ventana de las últimas muestras para percentiles. """
+
+    def __init__(self, muestras=512):
+        self._muestras = deque(maxlen=muestras)
+        self._lock = threading.Lock()
+        self.llamadas = 0
+        self.errores = 0
+        self.maximo_ms = 0.0
+
+    def registrar(self, duracion_ms, exito):
+        with self._lock:
+            self.llamadas += 1
+            if not exito:
+                self.errores += 1
+            self.maximo_ms = max(self.maximo_ms, duracion_ms)
+            self._muestras.append(duracion_ms)
+
+    def resumen(self):
+        with self._lock:
+            ordenadas = sorted(self._muestras)
+            llamadas, errores, maximo = self.llamadas, self.errores, self.maximo_ms
+
+        def percentil(p):
+            if not ordenadas:
+                return None
+            return round(ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * p))], 2)
+
+        return {
+            "llamadas": llamadas,
+            "errores": errores,
+            "p50_ms": percentil(0.50),
+            "p95_ms": percentil(0.95),
+            "p99_ms": percentil(0.99),
+            "max_ms": round(maximo, 2),
+        }
+
+
+class ConectorBanco:
+    """ Sesión HTTP persistente y acotada hacia un banco aliado. """
+
+    def __init__(self, codigo, config, circuito):
+        self.codigo = codigo
+        self.config = config
+        self.circuito = circuito
+        self.estadisticas = EstadisticasLatencia()
+        self._cupos = threading.BoundedSemaphore(config.pool_conexiones)
+
+        self.session = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=config.pool_conexiones, max_retries=0)
+        self.session.mount('https://', adaptador)
+        self.session.mount('http://', adaptador)
+        self.session.headers.update(self.cabeceras())
+        self._clientes_async = weakref.WeakKeyDictionary() # event loop -> httpx.AsyncClient
+        self._en_curso_async = weakref.WeakKeyDictionary() # event loop -> peticiones en curso
+        self._cerrado = False
+        self._lock_async = threading.RLock()
+
+    def cabeceras(self):
+        headers = {
+            "Content-Type": "application/json",
+            "Accept": "application/json",  # Fuerza a que el otro banco responda en JSON
+        }
+        if self.config.tipo_autenticacion in ('BEARER', 'SUPABASE'):
+            headers["Authorization"] = f"Bearer {self.config.token}"
+        if self.config.tipo_autenticacion == 'SUPABASE':
+            # Supabase requiere adicionalmente este header en la mayoría de sus configuraciones
+            headers["apikey"] = self.config.token
+        return headers
+
+    def autorizar(self, payload):
+        """
+        POST de autorización. Lanza CircuitoAbierto si el banco está en cortocircuito
+        y RequestException (incluida ConectorSaturado) si no hay respuesta.
+        """
+        if not self.circuito.permitir():
+            raise CircuitoAbierto(f"Circuito abierto hacia el banco {self.codigo}.")
+        if not self._cupos.acquire(timeout=self.config.timeout_conexion):
+            self._registrar(0.0, False)
+            raise ConectorSaturado(f"Sin conexiones libres hacia el banco {self.codigo}.")
+        inicio = time.perf_counter()
+        try:
+            response = self.session.post(
+                self.config.url, json=payload,
+                timeout=(self.config.timeout_conexion, self.config.timeout_lectura)
+            )
+        except requests.exceptions.RequestException:
+            self._registrar((time.perf_counter() - inicio) * 1000, False)
+            raise
+        except BaseException:
+            self.circuito.abandonar()
+            raise
+        finally:
+            self._cupos.release()
+        self._registrar((time.perf_counter() - inicio) * 1000, response.status_code < 500)
+        return response
+
+    def _cliente_async(self):
+        loop = asyncio.get_running_loop()
+        with self._lock_async:
+            cliente = self._clientes_async.get(loop)
+            if cliente is not None:
+                return cliente
+            cliente = httpx.AsyncClient(
+                headers=self.cabeceras(),
+                limits=httpx.Limits(
+                    max_connections=self.config.pool_conexiones,
+                    max_keepalive_connections=self.config.pool_conexiones,
+                ),
+                timeout=httpx.Timeout(
+                    self.config.timeout_lectura, connect=self.config.timeout_conexion, pool=self.config.timeout_conexion
+                ),
+            )
+            self._clientes_async[loop] = cliente
+        return cliente
+
+    def _soltar_async(self, loop, cliente):
+        """ Descuenta una petición en curso. True si el conector ya se cerró y el cliente quedó sin uso. """
+        with self._lock_async:
+            self._en_curso_async[loop] -= 1
+            if self._cerrado and not self._en_curso_async[loop] and self._clientes_async.get(loop) is cliente:
+                del self._clientes_async[loop]
+                return True
+        return False
+
+    async def autorizar_async(self, payload):
+        """ Igual que autorizar(), sin bloquear el event loop mientras el banco responde. """
+        if not self.circuito.permitir():
+            raise CircuitoAbierto(f"Circuito abierto hacia el banco {self.codigo}.")
+        loop = asyncio.get_running_loop()
+        with self._lock_async: # Tomar el cliente y contarlo en curso es atómico frente a cerrar()
+            cliente = self._cliente_async()
+            self._en_curso_async[loop] = self._en_curso_async.get(loop, 0) + 1
+        inicio = time.perf_counter()
+        try:
+            response = await cliente.post(self.config.url, json=payload)
+        except httpx.PoolTimeout as error:
+            self._registrar(0.0, False)
+            raise ConectorSaturado(f"Sin conexiones libres hacia el banco {self.codigo}.") from error
+        except httpx.HTTPError as error:
+            self._registrar((time.perf_counter() - inicio) * 1000, False)
+            raise BancoSinRespuesta(str(error)) from error
+        except BaseException:
+            # CancelledError (el cliente se desconectó) u otro error ajeno al banco: sin esto una
+            # prueba en SEMIABIERTO quedaría en curso para siempre y el circuito no volvería a cerrar.
+            self.circuito.abandonar()
+            raise
+        finally:
+            if self._soltar_async(loop, cliente): # Última petición de un conector reemplazado
+                await cliente.aclose()
+        self._registrar((time.perf_counter() - inicio) * 1000, response.status_code < 500)
+        return response
+
+    def _registrar(self, duracion_ms, exito):
+        self.estadisticas.registrar(duracion_ms, exito)
+        self.circuito.registrar(duracion_ms, not exito)
+
+    def cerrar(self):
+        """
+        Cierra la sesión y los clientes httpx de cada event loop. El cierre de un cliente
+        se agenda en su propio loop; si tiene peticiones en curso, lo cierra la última.
+        """
+        self.session.close()
+        with self._lock_async:
+            self._cerrado = True
+            libres = [
+                (loop, cliente) for loop, cliente in self._clientes_async.items() if not self._en_curso_async.get(loop)
+            ]
+            for loop, _ in libres:
+                del self._clientes_async[loop]
+        for loop, cliente in libres:
+            # Con el loop ya cerrado sus conexiones no pueden volver a usarse: las libera el recolector
+            if not loop.is_closed():
+                asyncio.run_coroutine_threadsafe(cliente.aclose(), loop)
+
+
+_conectores = {}
+_circuitos = {} # Sobreviven a la recreación del conector cuando cambia su configuración
+_lock = threading.Lock()
+
+
+def _nuevo_circuito():
+    umbrales = settings.CIRCUITO_BANCOS
+    return CircuitoBanco(
+        ventana=umbrales['VENTANA'], minimo_llamadas=umbrales['MINIMO_LLAMADAS'],
+        tasa_error=umbrales['TASA_ERROR'], latencia_lenta_ms=umbrales['LATENCIA_LENTA_MS'],
+        tasa_lentas=umbrales['TASA_LENTAS'], segundos_abierto=umbrales['SEGUNDOS_ABIERTO'],
+        pruebas_semiabierto=umbrales['PRUEBAS_SEMIABIERTO'],
+    )
+
+
+def obtener_conector(ruta):
+    """ Conector del banco de la ruta; se recrea si su configuración en el Directorio cambió. """
+    conector = _conectores.get(ruta.codigo)
+    if conector is not None and conector.config == ruta.conector:
+        return conector
+    with _lock:
+        conector = _conectores.get(ruta.codigo)
+        if conector is None or conector.config != ruta.conector:
+            anterior = conector
+            circuito = _circuitos.setdefault(ruta.codigo, _nuevo_circuito())
+            conector = ConectorBanco(ruta.codigo, ruta.conector, circuito)
+            _conectores[ruta.codigo] = conector
+            if anterior is not None:
+                anterior.cerrar()
+        return conector
+
+
+def estadisticas_conectores():
+    """ Latencia y estado del cortacircuitos por banco (para el panel de administración). """
+    return {
+        codigo: dict(conector.estadisticas.resumen(), circuito=conector.circuito.resumen())
+        for codigo, conector in list(_conectores.items())
+    }
@@ -0,0 +1,145 @@
+# backend/core_bancario/enrutamiento.py
+
+"""
+Tabla de enrutamiento de bancos construida a partir del Directorio.
+
+Reemplaza los diccionarios fijos MAPEO_BANCOS / FORMATO_EXTERNO_BANCOS y el
+corte fijo de 4 dígitos del BIN:
+
+- Cada banco se reconoce por su código, sus alias ("BANCO_2", "0002", ...) y
+  sus prefijos BIN de longitud variable.
+- Los BIN se resuelven por coincidencia del prefijo más largo.
+- La tabla se compila en memoria y se sustituye de forma atómica (una sola
+  asignación) cuando el Directorio cambia, así enrutar una tarjeta no hace
+  consultas y agregar un banco aliado no requiere desplegar código.
+"""
+
+import re
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+from .conectores import ConfigConector
+from .models import Directorio
+
+RutaBanco = namedtuple('RutaBanco', ['codigo', 'nombre', 'nombre_externo', 'api_url', 'alias', 'propio', 'conector'])
+
+_PATRON_NOMBRE_BANCO = re.compile(r'^BANCO_(\d+)$')
+
+
+def _lista(valor):
+    """ "0002, banco_2" -> ["0002", "BANCO_2"] """
+    return [v.strip().upper() for v in (valor or '').split(',') if v.strip()]
+
+
+def formas_codigo(codigo):
+    """
+    Deriva las formas equivalentes de un código de banco.
+    Devuelve (codigo_canonico, alias, nombre_externo): "BANCO_2" y "0002" son el mismo banco,
+    el canónico es el numérico de 4 dígitos y el nombre externo el formato "BANCO_N".
+    """
+    codigo = codigo.strip().upper()
+    coincidencia = _PATRON_NOMBRE_BANCO.match(codigo)
+    if coincidencia:
+        numero = int(coincidencia.group(1))
+    elif codigo.isdigit():
+        numero = int(codigo)
+    else:
+        return codigo, {codigo}, codigo
+    canonico = f"{numero:04d}"
+    nombre_externo = f"BANCO_{numero}"
+    return canonico, {codigo, canonico, nombre_externo}, nombre_externo
+
+
+class TablaEnrutamiento:
+    """ Estructura inmutable: índice de alias y de prefijos BIN por longitud. """
+
+    def __init__(self, rutas_con_bins):
+        self._por_alias = {}
+        self._por_bin = {}
+        for ruta, bins in rutas_con_bins:
+            for alias in ruta.alias:
+                self._por_alias[alias] = ruta
+            for prefijo in bins:
+                self._por_bin[prefijo] = ruta
+        # Longitudes de prefijo de mayor a menor: la primera coincidencia es la más larga.
+        self._longitudes = sorted({len(p) for p in self._por_bin}, reverse=True)
+
+    def por_codigo(self, codigo):
+        if not codigo:
+            return None
+        return self._por_alias.get(str(codigo).strip().upper())
+
+    def por_tarjeta(self, numero_tarjeta):
+        for longitud in self._longitudes:
+            ruta = self._por_bin.get(numero_tarjeta[:longitud])
+            if ruta is not None:
+                return ruta
+        return None
+
+    def nombre_externo(self, codigo):
+        """ Código en el formato que esperan los otros bancos en peticiones salientes. """
+        ruta = self.por_codigo(codigo)
+        return ruta.nombre_externo if ruta else codigo
+
+
+def _ruta_desde_directorio(banco):
+    canonico, alias, nombre_externo = formas_codigo(banco['codigo'])
+    alias |= set(_lista(banco['alias']))
+    if banco['nombre_externo']:
+        nombre_externo = banco['nombre_externo'].strip().upper()
+        alias.add(nombre_externo)
+    # Sin BIN explícitos se conserva la convención histórica: BIN = código numérico del banco.
+    bins = _lista(banco['bins']) or ([canonico] if canonico.isdigit() else [])
+    conector = ConfigConector(
+        banco['url_autorizacion'] or f"{banco['api_url'].rstrip('/')}/autorizar_pago/",
+        banco['tipo_autenticacion'], banco['token_api'], banco['pool_conexiones'],
+        banco['timeout_conexion'], banco['timeout_lectura'],
+    )
+    ruta = RutaBanco(canonico, banco['nombre'], nombre_externo, banco['api_url'], frozenset(alias), False, conector)
+    return ruta, bins
+
+
+def _ruta_propia():
+    canonico, alias, nombre_externo = formas_codigo(settings.MI_CODIGO_BANCO)
+    ruta = RutaBanco(canonico, 'WholaBank', nombre_externo, '', frozenset(alias), True, None)
+    return ruta, [settings.MI_BIN_TARJETA]
+
+
+def construir_tabla():
+    """ Compila la tabla completa con una sola consulta al Directorio. """
+    bancos = Directorio.objects.filter(tipo='BANCO').values(
+        'codigo', 'nombre', 'api_url', 'alias', 'bins', 'nombre_externo',
+        'url_autorizacion', 'tipo_autenticacion', 'token_api', 'pool_conexiones', 'timeout_conexion', 'timeout_lectura',
+    )
+    rutas = [_ruta_desde_directorio(banco) for banco in bancos]
+    rutas.append(_ruta_propia()) # Nuestro banco se agrega al final: siempre gana sobre el Directorio
+    return TablaEnrutamiento(rutas)
+
+
+_tabla = None
+_construida_en = 0.0
+_lock = threading.Lock()
+
+
+def obtener_tabla():
+    """
+    Devuelve la tabla vigente. Se recompila si fue invalidada en este proceso o
+    si superó ENRUTAMIENTO_TTL (cambios hechos desde otro worker).
+    """
+    global _tabla, _construida_en
+    tabla = _tabla
+    if tabla is not None and time.monotonic() - _construida_en < settings.ENRUTAMIENTO_TTL:
+        return tabla
+    with _lock:
+        if _tabla is None or time.monotonic() - _construida_en >= settings.ENRUTAMIENTO_TTL:
+            nueva = construir_tabla()
+            _tabla, _construida_en = nueva, time.monotonic() # Sustitución atómica
+        return _tabla
+
+
+def invalidar_tabla():
+    global _tabla
+    _tabla = None
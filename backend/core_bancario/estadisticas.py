@@ -0,0 +1,93 @@
+# backend/core_bancario/estadisticas.py
+
+"""
+Estadísticas globales del banco para el panel de administración, mantenidas
+de forma incremental en lugar de recalcularse sobre todas las cuentas y
+clientes en cada carga.
+
+- LIQUIDEZ: suma de los saldos de todas las cuentas según el libro mayor. La
+  ajusta asentar_lote() con las piernas de cuenta de cada asiento, en la
+  misma transacción del movimiento.
+- CLIENTES, BANCOS, COMERCIOS: altas y bajas de Cliente y Directorio (signals.py).
+
+Ajustar una estadística solo inserta una fila en AjusteEstadistica
+(append-only, como AbonoPendiente): la ruta de pago no bloquea ninguna fila
+compartida y la fila de la Tarjeta sigue siendo su único bloqueo. consolidar()
+suma los ajustes a la fila de EstadisticaBanco de cada clave y los borra; lo
+corre `manage.py consolidar_estadisticas` (cron o --intervalo). Leer suma los
+valores consolidados y los ajustes pendientes: el panel ve el valor exacto
+aunque la consolidación vaya atrasada. `manage.py recalcular_estadisticas` las recalcula desde cero si
+hiciera falta.
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+
+from .models import AjusteEstadistica, Cliente, Directorio, EstadisticaBanco, Partida
+
+LIQUIDEZ = 'LIQUIDEZ'
+CLIENTES = 'CLIENTES'
+BANCOS = 'BANCOS'
+COMERCIOS = 'COMERCIOS'
+
+
+def sumar(clave, delta):
+    """ Ajusta una estadística en `delta`: un INSERT. Debe llamarse en la transacción del cambio que la origina. """
+    if delta:
+        AjusteEstadistica.objects.create(clave=clave, delta=delta)
+
+
+def consolidar():
+    """
+    Suma los ajustes pendientes a EstadisticaBanco y los borra.
+    Solo toma los ajustes confirmados hasta el inicio y que no esté consolidando
+    otro proceso. Devuelve cuántos ajustes consolidó.
+    """
+    with transaction.atomic():
+        ajustes = list(
+            AjusteEstadistica.objects.select_for_update(skip_locked=True).order_by('pk').values_list('pk', 'clave', 'delta')
+        )
+        if not ajustes:
+            return 0
+        totales = {}
+        for _, clave, delta in ajustes:
+            totales[clave] = totales.get(clave, Decimal('0')) + delta
+        for clave, total in totales.items():
+            filas = EstadisticaBanco.objects.filter(clave=clave).update(valor=F('valor') + total)
+            if not filas:
+                EstadisticaBanco.objects.create(clave=clave, valor=total)
+        AjusteEstadistica.objects.filter(pk__in=[pk for pk, _, _ in ajustes]).delete()
+    return len(ajustes)
+
+
+def fijar(clave, valor):
+    """ Reemplaza el valor de una estadística (recálculo), descartando sus ajustes pendientes. """
+    with transaction.atomic():
+        AjusteEstadistica.objects.filter(clave=clave).delete()
+        EstadisticaBanco.objects.update_or_create(clave=clave, defaults={'valor': valor})
+
+
+def leer():
+    """ {clave: valor} de todas las estadísticas: valores consolidados + ajustes pendientes (dos consultas). """
+    valores = {}
+    for modelo, campo in ((EstadisticaBanco, 'valor'), (AjusteEstadistica, 'delta')):
+        for clave, total in modelo.objects.values('clave').annotate(total=Sum(campo)).values_list('clave', 'total'):
+            valores[clave] = valores.get(clave, Decimal('0')) + total
+    return valores
+
+
+def contar_directorio():
+    """ El Directorio tiene pocas filas: ante cualquier cambio se vuelven a contar sus tipos. """
+    fijar(BANCOS, Directorio.objects.filter(tipo='BANCO').count())
+    fijar(COMERCIOS, Directorio.objects.filter(tipo='COMERCIO').count())
+
+
+def recalcular():
+    """ Recalcula todas las estadísticas desde las tablas de origen. Devuelve leer(). """
+    with transaction.atomic():
+        fijar(LIQUIDEZ, Partida.objects.filter(cuenta__isnull=False).aggregate(total=Sum('monto'))['total'] or Decimal('0'))
+        fijar(CLIENTES, Cliente.objects.count())
+        contar_directorio()
+    return leer()
@@ -0,0 +1,108 @@
+# backend/core_bancario/estado_cuenta.py
+
+"""
+Estado de cuenta exportable (CSV o NDJSON) generado en streaming.
+
+La fuente es el libro mayor: cada partida de la cuenta es un movimiento y el
+saldo corrido es la suma acumulada de las partidas, partiendo del saldo al
+inicio del rango. Así el estado de cuenta incluye los abonos aún no
+consolidados y siempre cuadra con `verificar_libro`.
+
+Las partidas se leen con `.iterator(chunk_size)` (cursor del lado del servidor
+en PostgreSQL) en el orden del índice partida_cuenta_asiento, y el archivo se
+escribe por bloques de ESTADO_CUENTA_BLOQUE filas: la memoria usada no depende
+de cuántos movimientos tenga el rango.
+"""
+
+import csv
+import io
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Sum
+
+from .historial import inicio_del_dia
+from .models import Partida
+
+CERO = Decimal('0.00')
+COLUMNAS = ('fecha', 'transaccion', 'tipo', 'referencia', 'descripcion', 'monto', 'saldo')
+
+
+def _partidas(cuenta_id, desde=None, hasta=None):
+    partidas = Partida.objects.filter(cuenta_id=cuenta_id)
+    if desde is not None:
+        partidas = partidas.filter(transaccion__fecha__gte=inicio_del_dia(desde))
+    if hasta is not None:
+        partidas = partidas.filter(transaccion__fecha__lt=inicio_del_dia(hasta + timedelta(days=1)))
+    return partidas
+
+
+def saldo_inicial(cuenta_id, desde=None):
+    """ Saldo de la cuenta según el libro al primer instante de `desde` (0 sin fecha). """
+    if desde is None:
+        return CERO
+    anteriores = Partida.objects.filter(cuenta_id=cuenta_id, transaccion__fecha__lt=inicio_del_dia(desde))
+    return (anteriores.aggregate(total=Sum('monto'))['total'] or CERO).quantize(CERO)
+
+
+def movimientos(cuenta_id, desde=None, hasta=None, tamano_bloque=None):
+    """
+    Genera la fila de saldo inicial y luego un diccionario por movimiento (COLUMNAS)
+    con el saldo corrido, en orden de asiento.
+    """
+    tamano_bloque = tamano_bloque or settings.ESTADO_CUENTA_BLOQUE
+    saldo = saldo_inicial(cuenta_id, desde)
+    yield {
+        'fecha': inicio_del_dia(desde).isoformat() if desde else None, 'transaccion': None, 'tipo': 'SALDO_INICIAL',
+        'referencia': None, 'descripcion': 'Saldo inicial', 'monto': None, 'saldo': str(saldo),
+    }
+    partidas = _partidas(cuenta_id, desde, hasta).order_by('transaccion_id', 'pk').values_list(
+        'transaccion__fecha', 'transaccion_id', 'transaccion__tipo',
+        'transaccion__referencia_externa', 'transaccion__mensaje_error', 'monto',
+    )
+    for fecha, transaccion_id, tipo, referencia, descripcion, monto in partidas.iterator(chunk_size=tamano_bloque):
+        saldo += monto
+        yield {
+            'fecha': fecha.isoformat(), 'transaccion': transaccion_id, 'tipo': tipo,
+            'referencia': referencia, 'descripcion': descripcion, 'monto': str(monto), 'saldo': str(saldo),
+        }
+
+
+def _por_bloques(filas, buffer, escribir, tamano_bloque):
+    """ Escribe las filas en `buffer` y lo vacía hacia la respuesta cada `tamano_bloque` filas. """
+    pendientes = 0
+    for fila in filas:
+        escribir(fila)
+        pendientes += 1
+        if pendientes >= tamano_bloque:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pendientes = 0
+    if pendientes:
+        yield buffer.getvalue()
+
+
+def exportar_csv(cuenta_id, desde=None, hasta=None, tamano_bloque=None):
+    tamano_bloque = tamano_bloque or settings.ESTADO_CUENTA_BLOQUE
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer) # Los None se escriben como campo vacío
+    escritor.writerow(COLUMNAS)
+
+    def escribir(fila):
+        escritor.writerow([fila[columna] for columna in COLUMNAS])
+
+    yield from _por_bloques(movimientos(cuenta_id, desde, hasta, tamano_bloque), buffer, escribir, tamano_bloque)
+
+
+def exportar_ndjson(cuenta_id, desde=None, hasta=None, tamano_bloque=None):
+    tamano_bloque = tamano_bloque or settings.ESTADO_CUENTA_BLOQUE
+    buffer = io.StringIO()
+
+    def escribir(fila):
+        buffer.write(json.dumps(fila, ensure_ascii=False))
+        buffer.write('\n')
+
+    yield from _por_bloques(movimientos(cuenta_id, desde, hasta, tamano_bloque), buffer, escribir, tamano_bloque)
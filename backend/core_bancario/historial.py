@@ -0,0 +1,125 @@
+# backend/core_bancario/historial.py
+
+"""
+Historial de movimientos del cliente paginado por cursor (keyset) sobre (fecha, id).
+
+Una página no usa OFFSET ni DISTINCT: es un UNION ALL de dos piernas disjuntas,
+cada una servida por su índice compuesto y cortada en `limite + 1` filas:
+
+- Débitos:  cuenta_origen IN (cuentas del cliente)          -> tx_origen_fecha
+- Créditos: cuenta_destino IN (...) y cuenta_origen fuera   -> tx_destino_fecha
+  (una transferencia entre cuentas propias sale solo en la primera pierna).
+
+El cursor es opaco para el cliente: base64 de "fecha_iso|id" de la última fila
+entregada. La página siguiente pide (fecha, id) estrictamente menores, así el
+costo de cualquier página es el mismo sin importar cuán largo sea el historial.
+
+Las filas salen como diccionarios planos con la dirección del movimiento, los
+últimos dígitos de la cuenta contraparte y el nombre del comercio ya calculados
+en la misma consulta (ver TransaccionSerializer): serializar no toca la BD.
+"""
+
+import base64
+import binascii
+from datetime import datetime, time, timedelta
+
+from django.db import connection
+from django.db.models import Case, CharField, F, Q, Value, When
+from django.db.models.functions import Right
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Transaccion
+
+
+class CursorInvalido(ValueError):
+    """ El cursor recibido no fue emitido por este historial. """
+
+
+# Columnas de cada fila del historial
+CAMPOS = (
+    'id', 'tipo', 'monto', 'fecha', 'estado', 'mensaje_error',
+    'direccion', 'contraparte_cuenta', 'contraparte_comercio',
+)
+
+
+def codificar_cursor(fila):
+    crudo = f"{fila['fecha'].isoformat()}|{fila['id']}"
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """ Devuelve (fecha, id) o lanza CursorInvalido. """
+    try:
+        crudo = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        fecha, pk = crudo.rsplit('|', 1)
+        fecha, pk = parse_datetime(fecha), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise CursorInvalido("Cursor de paginación inválido.")
+    if fecha is None:
+        raise CursorInvalido("Cursor de paginación inválido.")
+    return fecha, pk
+
+
+def inicio_del_dia(dia):
+    """ Primer instante de `dia` (date) en la zona horaria del banco. """
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def _filas(consulta, cuenta_ids):
+    """
+    Anota, desde la perspectiva del dueño de cuenta_ids, la dirección del movimiento
+    y su contraparte (la otra cuenta y, si es de un comercio, su nombre).
+    """
+    entrante = Q(cuenta_destino_id__in=cuenta_ids)
+    return consulta.annotate(
+        direccion=Case(
+            When(entrante, then=Value('ENTRANTE')),
+            When(cuenta_origen_id__in=cuenta_ids, then=Value('SALIENTE')),
+            default=Value('DESCONOCIDO'), output_field=CharField(),
+        ),
+        contraparte_cuenta=Case(
+            When(entrante, then=Right('cuenta_origen__numero_cuenta', 6)),
+            default=Right('cuenta_destino__numero_cuenta', 6), output_field=CharField(),
+        ),
+        contraparte_comercio=Case(
+            When(entrante, then=F('cuenta_origen__perfil_comercio__nombre')),
+            default=F('cuenta_destino__perfil_comercio__nombre'), output_field=CharField(),
+        ),
+    ).values(*CAMPOS)
+
+
+def pagina_historial(cuenta_ids, limite, cursor=None, desde=None, hasta=None, tipo=None, estado=None):
+    """
+    Una página del historial de las cuentas indicadas, de la más reciente a la más antigua.
+    desde / hasta son fechas (date) inclusivas en la zona horaria del banco.
+    Devuelve (filas, siguiente_cursor): filas son diccionarios con CAMPOS y
+    siguiente_cursor es None en la última página.
+    """
+    filtros = Q()
+    if desde is not None:
+        filtros &= Q(fecha__gte=inicio_del_dia(desde))
+    if hasta is not None:
+        filtros &= Q(fecha__lt=inicio_del_dia(hasta + timedelta(days=1)))
+    if tipo:
+        filtros &= Q(tipo=tipo)
+    if estado:
+        filtros &= Q(estado=estado)
+    if cursor:
+        fecha, pk = decodificar_cursor(cursor)
+        filtros &= Q(fecha__lt=fecha) | Q(fecha=fecha, pk__lt=pk)
+
+    orden = ('-fecha', '-id')
+    debitos = Transaccion.objects.filter(filtros, cuenta_origen_id__in=cuenta_ids)
+    creditos = Transaccion.objects.filter(filtros, cuenta_destino_id__in=cuenta_ids).exclude(cuenta_origen_id__in=cuenta_ids)
+    debitos, creditos = (_filas(pierna, cuenta_ids).order_by(*orden)[:limite + 1] for pierna in (debitos, creditos))
+    if connection.features.supports_slicing_ordering_in_compound:
+        filas = list(debitos.union(creditos, all=True).order_by(*orden)[:limite + 1])
+    else:
+        # SQLite no admite LIMIT dentro de un UNION: las mismas dos consultas, mezcladas aquí.
+        filas = sorted([*debitos, *creditos], key=lambda fila: (fila['fecha'], fila['id']), reverse=True)[:limite + 1]
+
+    if len(filas) <= limite:
+        return filas, None
+    filas = filas[:limite]
+    return filas, codificar_cursor(filas[-1])
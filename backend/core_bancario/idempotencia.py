@@ -0,0 +1,240 @@
+# backend/core_bancario/idempotencia.py
+
+"""
+Almacén de idempotencia para los endpoints de pago.
+
+Cada (alcance, clave) se reserva con un INSERT sobre un índice único, así dos
+reintentos simultáneos no pueden pasar a la vez: el segundo choca con la
+restricción y recibe la respuesta original (o un aviso de "en curso").
+Un reintento cuesta una sola búsqueda indexada, sin recorrer Transaccion.
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+
+from . import parametros
+from .asincronia import en_hilo_bd
+from .models import ClaveIdempotencia
+
+logger = logging.getLogger(__name__)
+
+TIPO_CONTENIDO = 'application/json'
+
+
+def _respuesta_http(contenido, codigo_http):
+    return HttpResponse(contenido, status=codigo_http, content_type=TIPO_CONTENIDO)
+
+
+def renderizar(respuesta):
+    """ Convierte una Response de DRF en bytes JSON (para vistas que no son APIView). """
+    return _respuesta_http(JSONRenderer().render(respuesta.data), respuesta.status_code)
+
+
+def reservar(alcance, clave):
+    """
+    Intenta reservar la clave. Devuelve (registro, ya_existia).
+    Si la clave existente ya venció, se descarta y se vuelve a reservar.
+
+    Solo termina con un INSERT propio o con un registro vigente: cada vuelta
+    extra se debe a que otro proceso liberó, purgó o reservó la clave entre
+    el INSERT y la lectura, así que nunca devuelve un registro vencido ni None.
+    """
+    ahora = timezone.now()
+    while True:
+        try:
+            with transaction.atomic():
+                registro = ClaveIdempotencia.objects.create(
+                    alcance=alcance, clave=clave, expira=ahora + parametros.obtener('IDEMPOTENCIA_TTL')
+                )
+            return registro, False
+        except IntegrityError:
+            registro = ClaveIdempotencia.objects.filter(alcance=alcance, clave=clave).first()
+            if registro is None:
+                continue # Se liberó o purgó entre el INSERT y la lectura: reintentamos
+            if registro.expira > ahora:
+                return registro, True
+            ClaveIdempotencia.objects.filter(pk=registro.pk, expira__lte=ahora).delete()
+
+
+def repetir(registro):
+    """ Respuesta a un reintento: la original byte a byte, o 409 si aún está en curso. """
+    if registro.estado == 'COMPLETADA':
+        return _respuesta_http(bytes(registro.respuesta), registro.codigo_http)
+    contenido = JSONRenderer().render({"error": {
+        "code": "IERROR_IDEM_01", "message": "La transacción aún está en proceso. Reintente en unos segundos."
+    }})
+    return _respuesta_http(contenido, status.HTTP_409_CONFLICT)
+
+
+def liberar(registro):
+    """ Elimina una reserva en curso para permitir un nuevo intento (error interno). """
+    ClaveIdempotencia.objects.filter(pk=registro.pk, estado='EN_CURSO').delete()
+
+
+def completar(registro, respuesta):
+    """
+    Serializa la respuesta DRF y la guarda como resultado de la clave.
+    Los errores 5xx no se memorizan: el cliente debe poder reintentar.
+    """
+    http = renderizar(respuesta)
+    if respuesta.status_code >= 500:
+        liberar(registro)
+    else:
+        # Solo si sigue en curso: la cola de salida pudo haber guardado ya la respuesta final.
+        ClaveIdempotencia.objects.filter(pk=registro.pk, estado='EN_CURSO').update(
+            estado='COMPLETADA', codigo_http=respuesta.status_code, respuesta=http.content
+        )
+    return http
+
+
+def fijar_respuesta(alcance, clave, respuesta):
+    """
+    Reemplaza la respuesta guardada de una clave por la definitiva. La usa la cola de
+    salida cuando un pago que se respondió como "en proceso" (202) termina de resolverse.
+    """
+    http = renderizar(respuesta)
+    ClaveIdempotencia.objects.filter(alcance=alcance, clave=clave).update(
+        estado='COMPLETADA', codigo_http=respuesta.status_code, respuesta=http.content
+    )
+
+
+def ejecutar_idempotente(alcance, clave, operacion):
+    """
+    Ejecuta operacion() una sola vez por (alcance, clave).
+    operacion debe devolver un rest_framework.response.Response.
+    """
+    registro, ya_existia = reservar(alcance, clave)
+    if ya_existia:
+        return repetir(registro)
+    try:
+        respuesta = operacion()
+    except Exception:
+        liberar(registro)
+        raise
+    return completar(registro, respuesta)
+
+
+async def ejecutar_idempotente_async(alcance, clave, operacion):
+    """
+    Igual que ejecutar_idempotente, para vistas asíncronas: operacion() es una corrutina.
+
+    La operación y el guardado de su respuesta corren protegidos de la cancelación
+    (asyncio.shield): si el cliente se desconecta, el débito que ya está en el hilo
+    de la BD termina y su resultado queda en la clave. Sin esto la clave quedaría
+    EN_CURSO hasta vencer (409 a cada reintento) y luego permitiría cobrar de nuevo.
+    """
+    registro, ya_existia = await en_hilo_bd(reservar, alcance, clave)
+    if ya_existia:
+        return repetir(registro)
+
+    async def ejecutar_y_completar():
+        try:
+            respuesta = await operacion()
+        except Exception:
+            await en_hilo_bd(liberar, registro)
+            raise
+        return await en_hilo_bd(completar, registro, respuesta)
+
+    tarea = asyncio.ensure_future(ejecutar_y_completar())
+    try:
+        return await asyncio.shield(tarea)
+    except asyncio.CancelledError:
+        tarea.add_done_callback(_registrar_error_huerfano)
+        raise
+
+
+def _registrar_error_huerfano(tarea):
+    """ Error de una operación cuyo cliente ya se fue: nadie más lo verá. """
+    if not tarea.cancelled() and tarea.exception() is not None:
+        logger.error("Operación idempotente fallida tras desconectarse el cliente", exc_info=tarea.exception())
+
+
+# --- LOTES (carga masiva desde datáfonos) ---
+
+def reservar_lote(pares):
+    """
+    Reserva muchas claves con una lectura y un INSERT masivo.
+    pares: lista de (alcance, clave) sin repetidos. Devuelve {(alcance, clave): (registro, ya_existia)}.
+    """
+    ahora = timezone.now()
+    claves_por_alcance = defaultdict(list)
+    for alcance, clave in pares:
+        claves_por_alcance[alcance].append(clave)
+    filtro = Q()
+    for alcance, claves in claves_por_alcance.items():
+        filtro |= Q(alcance=alcance, clave__in=claves)
+
+    reservas = {}
+    vencidas = []
+    for registro in ClaveIdempotencia.objects.filter(filtro):
+        if registro.expira > ahora:
+            reservas[(registro.alcance, registro.clave)] = (registro, True)
+        else:
+            vencidas.append(registro.pk)
+    if vencidas:
+        ClaveIdempotencia.objects.filter(pk__in=vencidas, expira__lte=ahora).delete()
+
+    nuevas = [
+        ClaveIdempotencia(alcance=alcance, clave=clave, expira=ahora + parametros.obtener('IDEMPOTENCIA_TTL'))
+        for alcance, clave in pares if (alcance, clave) not in reservas
+    ]
+    try:
+        with transaction.atomic():
+            ClaveIdempotencia.objects.bulk_create(nuevas)
+        for registro in nuevas:
+            reservas[(registro.alcance, registro.clave)] = (registro, False)
+    except IntegrityError:
+        # Otro proceso reservó alguna de las claves entre la lectura y el INSERT: una a una.
+        for registro in nuevas:
+            reservas[(registro.alcance, registro.clave)] = reservar(registro.alcance, registro.clave)
+    return reservas
+
+
+def completar_lote(resultados):
+    """
+    Igual que completar() para muchos registros: resultados es una lista de (registro, Response).
+    Las respuestas idénticas (el caso común: aprobado) se guardan con un solo UPDATE.
+    Devuelve la lista de HttpResponse en el mismo orden.
+    """
+    respuestas = []
+    por_contenido = defaultdict(list)
+    a_liberar = []
+    for registro, respuesta in resultados:
+        http = renderizar(respuesta)
+        respuestas.append(http)
+        if respuesta.status_code >= 500:
+            a_liberar.append(registro.pk)
+        else:
+            por_contenido[(respuesta.status_code, http.content)].append(registro.pk)
+    for (codigo_http, contenido), ids in por_contenido.items():
+        ClaveIdempotencia.objects.filter(pk__in=ids, estado='EN_CURSO').update(
+            estado='COMPLETADA', codigo_http=codigo_http, respuesta=contenido
+        )
+    liberar_lote(a_liberar)
+    return respuestas
+
+
+def liberar_lote(ids):
+    if ids:
+        ClaveIdempotencia.objects.filter(pk__in=ids, estado='EN_CURSO').delete()
+
+
+def purgar_vencidas(lote=5000):
+    """ Borra claves vencidas en lotes acotados. Devuelve el total eliminado. """
+    total = 0
+    while True:
+        ids = list(
+            ClaveIdempotencia.objects.filter(expira__lte=timezone.now()).values_list('pk', flat=True)[:lote]
+        )
+        if not ids:
+            return total
+        borradas, _ = ClaveIdempotencia.objects.filter(pk__in=ids).delete()
+        total += borradas
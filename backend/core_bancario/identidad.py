@@ -0,0 +1,128 @@
+# backend/core_bancario/identidad.py
+
+"""
+Autenticación JWT sin consultar la BD en cada petición.
+
+JWTAuthentication de Simple JWT carga el User en cada petición y luego las
+vistas vuelven a buscar su Cliente y sus cuentas. JWTIdentidadAuthentication
+resuelve el `user_id` del token a una Identidad plana (usuario, permisos,
+cliente y cuentas) guardada en una caché en memoria por proceso: un fallo de
+caché cuesta una consulta y un acierto ninguna. request.user es esa Identidad:
+las vistas acotan sus consultas con request.user.cliente_id / cuenta_ids.
+
+Los cambios de User (desactivación, permisos), las altas y bajas de Cliente y
+de Cuenta descartan la entrada mediante señales (ver signals.py); el TTL
+(IDENTIDAD['TTL_S']) acota la desactualización entre workers de gunicorn.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+
+class Identidad:
+    """ Lo que las vistas necesitan de request.user, sin instancias del ORM. """
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, pk, username, is_active, is_staff, is_superuser, cliente_id, cuenta_ids):
+        self.pk = self.id = pk
+        self.username = username
+        self.is_active = is_active
+        self.is_staff = is_staff
+        self.is_superuser = is_superuser
+        self.cliente_id = cliente_id # None para administradores sin perfil de cliente
+        self.cuenta_ids = cuenta_ids # tupla, en orden de id
+
+    def __str__(self):
+        return self.username
+
+
+class CacheIdentidades:
+    """ LRU con capacidad máxima y expiración por entrada. Segura entre hilos. """
+
+    def __init__(self, capacidad, ttl_segundos):
+        self.capacidad = capacidad
+        self.ttl = ttl_segundos
+        self._entradas = OrderedDict() # user_id -> (identidad, expira_en)
+        self._lock = threading.Lock()
+
+    def obtener(self, user_id):
+        """ Devuelve la Identidad, o None si el usuario no existe. """
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(user_id)
+            if entrada is not None and entrada[1] > ahora:
+                self._entradas.move_to_end(user_id)
+                return entrada[0]
+
+        # Fallo de caché: una sola consulta (User + Cliente + Cuentas, una fila por cuenta), fuera del lock.
+        filas = list(
+            User.objects.filter(pk=user_id).order_by('cliente__cuentas__id').values_list(
+                'username', 'is_active', 'is_staff', 'is_superuser', 'cliente__id', 'cliente__cuentas__id'
+            )
+        )
+        if not filas:
+            return None
+        username, is_active, is_staff, is_superuser, cliente_id, _ = filas[0]
+        identidad = Identidad(
+            user_id, username, is_active, is_staff, is_superuser, cliente_id,
+            tuple(fila[5] for fila in filas if fila[5] is not None),
+        )
+
+        with self._lock:
+            self._entradas[user_id] = (identidad, ahora + self.ttl)
+            self._entradas.move_to_end(user_id)
+            while len(self._entradas) > self.capacidad:
+                self._entradas.popitem(last=False)
+        return identidad
+
+    def invalidar(self, user_id):
+        with self._lock:
+            self._entradas.pop(user_id, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+
+_cache = CacheIdentidades(settings.IDENTIDAD['CAPACIDAD'], settings.IDENTIDAD['TTL_S'])
+
+
+def obtener_identidad(user_id):
+    return _cache.obtener(user_id)
+
+
+def invalidar_identidad(user_id):
+    """
+    Descarta la identidad ya y de nuevo al confirmarse la transacción en curso
+    (una petición concurrente pudo volver a cargarla con los datos anteriores).
+    """
+    _cache.invalidar(user_id)
+    transaction.on_commit(lambda: _cache.invalidar(user_id))
+
+
+class JWTIdentidadAuthentication(JWTAuthentication):
+    """ Como JWTAuthentication, pero request.user es una Identidad en caché (ver arriba). """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken("El token no identifica a ningún usuario.") from e
+
+        # Simple JWT guarda el id como texto; las señales invalidan por la pk del modelo
+        identidad = obtener_identidad(self.user_model._meta.pk.to_python(user_id))
+        if identidad is None:
+            raise AuthenticationFailed("Usuario no encontrado.", code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not identidad.is_active:
+            raise AuthenticationFailed("Usuario inactivo.", code="user_inactive")
+        return identidad
@@ -0,0 +1,257 @@
+# backend/core_bancario/importacion.py
+
+"""
+Alta masiva de clientes (y del Directorio de aliados) desde CSV.
+
+Hace lo mismo que RegistroClienteSerializer (User + Cliente + Cuenta + Tarjeta,
+y Comercio si es jurídico) pero por bloques de IMPORTACION['FILAS_POR_BLOQUE']:
+
+1. Las filas se leen en streaming y se validan con ImportacionClienteSerializer
+   (formato, sin consultas).
+2. Usuario, cédula, RIF y código de comercio se verifican contra la BD con una
+   consulta `__in` por bloque y contra lo ya aceptado del mismo archivo.
+3. Las contraseñas (PBKDF2, deliberadamente lento) se cifran en un pool de
+   procesos mientras se guarda el bloque anterior.
+4. Cada bloque se guarda en una transacción con bulk_create de cada modelo, un
+   solo asiento de APERTURA en el libro para todas sus tarjetas y un solo
+   ajuste de las estadísticas del panel.
+
+bulk_create no llama a save() ni dispara señales: los números de cuenta y de
+tarjeta se toman aquí de las secuencias de numeracion.py (un lote por bloque) y
+el asiento de apertura y el conteo de clientes se hacen explícitamente.
+
+Cada fila rechazada se informa con su número de línea y sus errores.
+"""
+
+import multiprocessing
+from collections import namedtuple
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import IntegrityError, connections, transaction
+from rest_framework import serializers
+
+from . import estadisticas
+from .enrutamiento import invalidar_tabla
+from .libro import asiento_apertura
+from .models import Cliente, Comercio, Cuenta, Directorio, Tarjeta
+from .numeracion import numeros_cuenta, numeros_tarjeta
+from .serializers import ImportacionClienteSerializer
+
+ErrorFila = namedtuple('ErrorFila', ['linea', 'errores'])
+
+
+def _bloques(filas, tamano):
+    """ (linea, fila) en listas de `tamano`. La línea 1 es el encabezado del CSV. """
+    numeradas = enumerate(filas, start=2)
+    while True:
+        bloque = list(islice(numeradas, tamano))
+        if not bloque:
+            return
+        yield bloque
+
+
+# --- VALIDACIÓN ---
+
+def _validar(bloque, validador, vistos, errores):
+    """ Devuelve las filas válidas del bloque [(linea, datos, rif_final)] y anota los errores. """
+    candidatas = []
+    for linea, fila in bloque:
+        try:
+            datos = validador.run_validation(fila)
+        except serializers.ValidationError as error:
+            errores.append(ErrorFila(linea, error.detail))
+            continue
+        candidatas.append((linea, datos, ImportacionClienteSerializer.rif_final(datos)))
+
+    # Unicidad contra la BD: una consulta por campo para todo el bloque
+    usuarios = set(User.objects.filter(username__in=[datos['username'] for _, datos, _ in candidatas]).values_list('username', flat=True))
+    cedulas = set(Cliente.objects.filter(cedula__in=[datos['cedula'] for _, datos, _ in candidatas if datos.get('cedula')]).values_list('cedula', flat=True))
+    rifs = set(Cliente.objects.filter(rif__in=[rif for _, _, rif in candidatas]).values_list('rif', flat=True))
+    rifs |= set(Comercio.objects.filter(codigo_identificador__in=[rif for _, _, rif in candidatas]).values_list('codigo_identificador', flat=True))
+
+    validas = []
+    for linea, datos, rif in candidatas:
+        natural = datos.get('tipo_persona', 'NATURAL') == 'NATURAL'
+        cedula = datos.get('cedula') if natural else None
+        problemas = {}
+        if datos['username'] in usuarios or datos['username'] in vistos['username']:
+            problemas['username'] = ["El nombre de usuario ya existe."]
+        if cedula and (cedula in cedulas or cedula in vistos['cedula']):
+            problemas['cedula'] = ["Esta cédula ya está registrada."]
+        if rif in rifs or rif in vistos['rif']:
+            problemas['rif'] = ["Este RIF ya está registrado."]
+        if problemas:
+            errores.append(ErrorFila(linea, problemas))
+            continue
+        vistos['username'].add(datos['username'])
+        vistos['rif'].add(rif)
+        if cedula:
+            vistos['cedula'].add(cedula)
+        validas.append((linea, datos, rif))
+    return validas
+
+
+# --- ESCRITURA ---
+
+def _guardar(validas, contrasenas):
+    """ Crea todas las entidades de las filas válidas de un bloque en una transacción. """
+    with transaction.atomic():
+        usuarios = User.objects.bulk_create([
+            User(username=datos['username'], email=datos['email'], first_name=datos['nombre_completo'], password=contrasena)
+            for (_, datos, _), contrasena in zip(validas, contrasenas)
+        ])
+        clientes = Cliente.objects.bulk_create([
+            Cliente(
+                user=usuario, tipo_persona=datos.get('tipo_persona', 'NATURAL'),
+                cedula=datos.get('cedula') if datos.get('tipo_persona', 'NATURAL') == 'NATURAL' else None,
+                rif=rif, telefono=datos['telefono'], fecha_nacimiento=datos.get('fecha_nacimiento'),
+                lugar_nacimiento=datos.get('lugar_nacimiento', 'Venezuela'),
+                estado_civil=datos.get('estado_civil') if datos.get('tipo_persona', 'NATURAL') == 'NATURAL' else None,
+                profesion=datos.get('profesion', 'Comercio'), origen_fondos=datos.get('origen_fondos', 'Actividad Comercial'),
+            )
+            for usuario, (_, datos, rif) in zip(usuarios, validas)
+        ])
+        cuentas = Cuenta.objects.bulk_create([
+            Cuenta(cliente=cliente, numero_cuenta=numero, tipo_cuenta=datos.get('tipo_cuenta', 'CORRIENTE'))
+            for cliente, numero, (_, datos, _) in zip(clientes, numeros_cuenta(len(clientes)), validas)
+        ])
+        tarjetas = []
+        for cuenta, numero in zip(cuentas, numeros_tarjeta(len(cuentas))):
+            tarjeta = Tarjeta(cuenta=cuenta)
+            tarjeta.emitir(numero)
+            tarjetas.append(tarjeta)
+        Tarjeta.objects.bulk_create(tarjetas)
+        Comercio.objects.bulk_create([
+            Comercio(codigo_identificador=rif, nombre=datos['nombre_completo'], cuenta=cuenta, activo=True)
+            for cuenta, (_, datos, rif) in zip(cuentas, validas)
+            if datos.get('tipo_persona') == 'JURIDICO'
+        ])
+
+        # Lo que harían las señales post_save, en una sola operación por bloque
+        asiento_apertura(
+            cuentas=[(cuenta.pk, cuenta.saldo) for cuenta in cuentas],
+            tarjetas=[(tarjeta.pk, tarjeta.saldo_disponible) for tarjeta in tarjetas],
+        )
+        estadisticas.sumar(estadisticas.CLIENTES, len(clientes))
+    return len(clientes)
+
+
+def _escribir(pendiente, errores):
+    validas, contrasenas = pendiente
+    if not validas:
+        return 0
+    try:
+        return _guardar(validas, contrasenas())
+    except IntegrityError as error:
+        # Otra alta (ej. el registro en línea) tomó un usuario o documento del bloque a mitad de la carga
+        for linea, _, _ in validas:
+            errores.append(ErrorFila(linea, {"bloque": [f"No se guardó el bloque: {error}"]}))
+        return 0
+
+
+def importar_clientes(filas, procesos=None, tamano_bloque=None):
+    """
+    filas: iterable de diccionarios con los campos de RegistroClienteSerializer
+    (ej. csv.DictReader). Devuelve (creados, [ErrorFila, ...]).
+    """
+    procesos = procesos or settings.IMPORTACION['PROCESOS']
+    tamano_bloque = tamano_bloque or settings.IMPORTACION['FILAS_POR_BLOQUE']
+    validador = ImportacionClienteSerializer()
+    vistos = {'username': set(), 'cedula': set(), 'rif': set()}
+    errores = []
+    creados = 0
+
+    pool = None
+    if procesos > 1:
+        connections.close_all() # Antes de bifurcar: los hijos no heredan la conexión
+        pool = multiprocessing.get_context('fork').Pool(processes=procesos)
+    try:
+        pendiente = None
+        for bloque in _bloques(filas, tamano_bloque):
+            validas = _validar(bloque, validador, vistos, errores)
+            claves = [datos['password'] for _, datos, _ in validas]
+            if pool is not None:
+                # El pool cifra este bloque mientras se guarda el anterior
+                contrasenas = pool.map_async(make_password, claves, chunksize=max(1, len(claves) // procesos)).get
+            else:
+                cifradas = [make_password(clave) for clave in claves]
+                contrasenas = lambda cifradas=cifradas: cifradas
+            if pendiente is not None:
+                creados += _escribir(pendiente, errores)
+            pendiente = (validas, contrasenas)
+        if pendiente is not None:
+            creados += _escribir(pendiente, errores)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    errores.sort(key=lambda error: error.linea)
+    return creados, errores
+
+
+# --- DIRECTORIO DE ALIADOS ---
+
+def fila_comercio(fila, rif):
+    """ Fila de registro para un comercio del Directorio (datos de contacto inventados, como el alta original). """
+    return {
+        'username': fila['nombre'].lower().replace(" ", "_"),
+        'email': f"contacto@{fila['nombre'].lower().replace(' ', '')}.com",
+        'password': f"{fila['codigo']}Test2026.",
+        'nombre_completo': fila['nombre'],
+        'tipo_persona': 'JURIDICO',
+        'rif': rif,
+        'telefono': '04140000000', # Inventado
+        'fecha_nacimiento': '2020-01-01', # Fecha Const. inventada
+        'profesion': 'Ventas Retail',
+        'tipo_cuenta': 'CORRIENTE',
+    }
+
+
+def importar_directorio(filas, corregir_rif=None, procesos=1):
+    """
+    Filas del CSV del Directorio (codigo, nombre, tipo, api_url, rif). Los BANCO van
+    solo al Directorio; cada COMERCIO se registra además como cliente jurídico con
+    cuenta y afiliación. Devuelve (bancos, comercios, [ErrorFila, ...]).
+    Por defecto sin pool: un Directorio tiene pocas filas.
+    """
+    corregir_rif = corregir_rif or (lambda rif: rif)
+    nodos, comercios, errores = [], [], []
+    for linea, fila in enumerate(filas, start=2):
+        try:
+            nodo = Directorio(
+                codigo=fila['codigo'], nombre=fila['nombre'], tipo=fila['tipo'],
+                api_url=fila['api_url'], rif=corregir_rif(fila['rif']),
+            )
+        except KeyError as error:
+            errores.append(ErrorFila(linea, {"fila": [f"Falta la columna {error}."]}))
+            continue
+        if nodo.tipo not in ('BANCO', 'COMERCIO'):
+            errores.append(ErrorFila(linea, {"tipo": [f"Tipo desconocido: {nodo.tipo}."]}))
+            continue
+        nodos.append((linea, nodo))
+        if nodo.tipo == 'COMERCIO':
+            comercios.append(fila_comercio(fila, nodo.rif))
+
+    # Los comercios que no pudieron registrarse como clientes no entran al Directorio
+    lineas_comercio = [linea for linea, nodo in nodos if nodo.tipo == 'COMERCIO']
+    _, errores_comercio = importar_clientes(comercios, procesos=procesos)
+    rechazadas = set()
+    for error in errores_comercio:
+        linea = lineas_comercio[error.linea - 2]
+        rechazadas.add(linea)
+        errores.append(ErrorFila(linea, error.errores))
+
+    aceptados = [nodo for linea, nodo in nodos if linea not in rechazadas]
+    Directorio.objects.bulk_create(
+        aceptados, update_conflicts=True, unique_fields=['codigo'], update_fields=['nombre', 'tipo', 'api_url', 'rif'],
+    )
+    # bulk_create no dispara señales: tabla de enrutamiento y conteos del panel
+    invalidar_tabla()
+    estadisticas.contar_directorio()
+
+    errores.sort(key=lambda error: error.linea)
+    bancos = sum(1 for nodo in aceptados if nodo.tipo == 'BANCO')
+    return bancos, len(aceptados) - bancos, errores
@@ -0,0 +1,175 @@
+# backend/core_bancario/libro.py
+
+"""
+Libro mayor de doble partida.
+
+Cada movimiento aprobado escribe, en la misma transacción que su Transaccion,
+las partidas de su asiento: una o más piernas que suman cero. Las partidas
+son append-only; los saldos de Cuenta y Tarjeta son vistas materializadas
+del libro que se actualizan de forma incremental:
+
+- Tarjeta.saldo_disponible: en la misma transacción (UPDATE condicional).
+- Cuenta.saldo: por consolidación de AbonoPendiente (ver abonos.py).
+
+Invariantes que revisa `manage.py verificar_libro` en una sola pasada:
+- Cada asiento suma cero.
+- Suma de partidas de una cuenta = Cuenta.saldo + sus abonos pendientes.
+- Suma de partidas de una tarjeta = Tarjeta.saldo_disponible.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+
+from . import cache_dashboard, estadisticas
+from .models import AbonoPendiente, Cuenta, Partida, Tarjeta, Transaccion
+
+# --- CONTRAPARTIDAS EXTERNAS ---
+SISTEMA_APERTURA = 'SISTEMA:APERTURA' # Saldos previos al libro y líneas de crédito iniciales
+SISTEMA_BONOS = 'SISTEMA:BONOS'
+
+
+def externa_banco(codigo):
+    """ Cuenta de compensación con un banco aliado. """
+    return f"BANCO:{codigo}"
+
+
+# --- PIERNAS ---
+
+def pierna_cuenta(cuenta_id, monto):
+    return Partida(cuenta_id=cuenta_id, monto=monto)
+
+
+def pierna_tarjeta(tarjeta_id, monto):
+    return Partida(tarjeta_id=tarjeta_id, monto=monto)
+
+
+def pierna_externa(nombre, monto):
+    return Partida(externa=nombre, monto=monto)
+
+
+class AsientoDescuadrado(ValueError):
+    """ Las piernas de un asiento no suman cero. """
+
+
+def asentar(transaccion_id, *piernas):
+    """ Inserta las piernas de un asiento. Debe llamarse dentro de la transacción del movimiento. """
+    asentar_lote([(transaccion_id, piernas)])
+
+
+def asentar_lote(asientos):
+    """
+    [(transaccion_id, piernas), ...] -> un solo INSERT masivo de partidas.
+    Las piernas de cuenta ajustan la liquidez del banco (ver estadisticas.py).
+    """
+    partidas = []
+    for transaccion_id, piernas in asientos:
+        if sum(pierna.monto for pierna in piernas) != 0:
+            raise AsientoDescuadrado(f"El asiento de la transacción {transaccion_id} no suma cero.")
+        for pierna in piernas:
+            pierna.transaccion_id = transaccion_id
+            partidas.append(pierna)
+    Partida.objects.bulk_create(partidas)
+    estadisticas.sumar(estadisticas.LIQUIDEZ, sum(partida.monto for partida in partidas if partida.cuenta_id is not None))
+
+
+def asiento_apertura(cuentas=(), tarjetas=()):
+    """
+    Asiento de apertura para saldos que no nacieron de un movimiento del libro.
+    cuentas / tarjetas: iterables de (id, saldo). Devuelve la Transaccion o None si no hay saldos.
+    """
+    piernas = [pierna_cuenta(pk, Decimal(str(saldo))) for pk, saldo in cuentas if saldo]
+    piernas += [pierna_tarjeta(pk, Decimal(str(saldo))) for pk, saldo in tarjetas if saldo]
+    if not piernas:
+        return None
+    piernas.append(pierna_externa(SISTEMA_APERTURA, -sum(pierna.monto for pierna in piernas)))
+    with transaction.atomic():
+        cabecera = Transaccion.objects.create(
+            tipo='APERTURA', monto=abs(piernas[-1].monto), estado='APROBADO', codigo_respuesta='00',
+            banco_emisor_id='', mensaje_error='Saldo de apertura del libro mayor'
+        )
+        asentar(cabecera.pk, *piernas)
+    return cabecera
+
+
+# --- VERIFICACIÓN Y RECONSTRUCCIÓN ---
+
+def _lectura_consistente():
+    # En PostgreSQL todas las consultas de la verificación ven la misma foto de la BD.
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+
+
+def recorrer_libro(tamano_bloque=5000):
+    """
+    Una sola pasada por todas las partidas en orden de asiento.
+    Devuelve (saldos_cuenta, saldos_tarjeta, asientos_descuadrados).
+    """
+    saldos_cuenta = defaultdict(Decimal)
+    saldos_tarjeta = defaultdict(Decimal)
+    descuadrados = []
+    actual, suma = None, Decimal('0')
+    partidas = Partida.objects.order_by('transaccion_id', 'pk').values_list('transaccion_id', 'cuenta_id', 'tarjeta_id', 'monto')
+    for transaccion_id, cuenta_id, tarjeta_id, monto in partidas.iterator(chunk_size=tamano_bloque):
+        if transaccion_id != actual:
+            if suma:
+                descuadrados.append(actual)
+            actual, suma = transaccion_id, Decimal('0')
+        suma += monto
+        if cuenta_id is not None:
+            saldos_cuenta[cuenta_id] += monto
+        elif tarjeta_id is not None:
+            saldos_tarjeta[tarjeta_id] += monto
+    if suma:
+        descuadrados.append(actual)
+    return saldos_cuenta, saldos_tarjeta, descuadrados
+
+
+def verificar_libro(reconstruir=False, tamano_bloque=5000):
+    """
+    Compara los saldos materializados con el libro. Con reconstruir=True reescribe
+    los saldos desde el libro (y consolida todos los abonos pendientes).
+    Devuelve {"asientos_descuadrados": [...], "cuentas": [(id, materializado, libro)], "tarjetas": [...]}.
+    """
+    with transaction.atomic():
+        _lectura_consistente()
+        if reconstruir:
+            # Se bloquean antes de leer: ningún pago mueve estos saldos durante la reconstrucción.
+            list(Tarjeta.objects.select_for_update().values_list('pk', flat=True))
+            list(Cuenta.objects.select_for_update().values_list('pk', flat=True))
+
+        saldos_cuenta, saldos_tarjeta, descuadrados = recorrer_libro(tamano_bloque)
+
+        pendientes = defaultdict(Decimal)
+        abonos_leidos = []
+        for pk, cuenta_id, monto in AbonoPendiente.objects.values_list('pk', 'cuenta_id', 'monto').iterator(chunk_size=tamano_bloque):
+            pendientes[cuenta_id] += monto
+            abonos_leidos.append(pk)
+
+        cuentas_mal, tarjetas_mal, a_reescribir = [], [], []
+        for pk, saldo in Cuenta.objects.values_list('pk', 'saldo').iterator(chunk_size=tamano_bloque):
+            libro = saldos_cuenta.get(pk, Decimal('0'))
+            if saldo + pendientes.get(pk, Decimal('0')) != libro:
+                cuentas_mal.append((pk, saldo + pendientes.get(pk, Decimal('0')), libro))
+            if saldo != libro:
+                a_reescribir.append(Cuenta(pk=pk, saldo=libro))
+        for pk, saldo in Tarjeta.objects.values_list('pk', 'saldo_disponible').iterator(chunk_size=tamano_bloque):
+            libro = saldos_tarjeta.get(pk, Decimal('0'))
+            if saldo != libro:
+                tarjetas_mal.append((pk, saldo, libro))
+
+        if reconstruir:
+            # Los abonos leídos quedan incluidos en el saldo reconstruido
+            for inicio in range(0, len(abonos_leidos), tamano_bloque):
+                AbonoPendiente.objects.filter(pk__in=abonos_leidos[inicio:inicio + tamano_bloque]).delete()
+            Cuenta.objects.bulk_update(a_reescribir, ['saldo'], batch_size=tamano_bloque)
+            Tarjeta.objects.bulk_update(
+                [Tarjeta(pk=pk, saldo_disponible=libro) for pk, _, libro in tarjetas_mal],
+                ['saldo_disponible'], batch_size=tamano_bloque
+            )
+            cuentas_tarjeta = Tarjeta.objects.filter(pk__in=[pk for pk, _, _ in tarjetas_mal]).values_list('cuenta_id', flat=True)
+            cache_dashboard.invalidar(cuentas=[cuenta.pk for cuenta in a_reescribir] + list(cuentas_tarjeta))
+
+    return {"asientos_descuadrados": descuadrados, "cuentas": cuentas_mal, "tarjetas": tarjetas_mal}
@@ -0,0 +1,138 @@
+# backend/core_bancario/limite_tasa.py
+
+"""
+Límites de tasa (token bucket) para los endpoints públicos: cobros de
+datáfonos, autorizaciones de bancos aliados y registro de clientes. Son
+AllowAny y sin CSRF; sin esto un terminal o un aliado desbocado satura los
+workers que hablan con la BD.
+
+LIMITE_TASA['RUTAS'] asigna a cada ruta una cubeta por dimensión:
+
+- COMERCIO: codigo_identificador_comercio_receptor del cuerpo.
+- BANCO: codigo_banco_comercio_receptor del cuerpo.
+- IP: dirección del cliente (X-Forwarded-For solo si REMOTE_ADDR es un proxy
+  de LIMITE_TASA['PROXIES_CONFIABLES']).
+
+Cada cubeta es (tasa por segundo, ráfaga). Una petición pasa si todas sus
+cubetas tienen una ficha; si no, LimiteTasaMiddleware responde 429 con
+Retry-After antes de la vista: sin serializer ni BD. Una dimensión ausente del
+cuerpo no se limita (la vista rechaza el cuerpo después).
+
+Las cubetas viven en un SQLite local compartido por los workers de la máquina
+(almacen_local.py); con varias máquinas el límite efectivo es por máquina.
+"""
+
+import json
+import math
+import time
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from .almacen_local import AlmacenLocal
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS cubetas (
+    clave TEXT PRIMARY KEY, fichas REAL NOT NULL, actualizado REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cubetas_actualizado ON cubetas (actualizado);
+"""
+
+CAMPOS = {
+    'COMERCIO': 'codigo_identificador_comercio_receptor',
+    'BANCO': 'codigo_banco_comercio_receptor',
+}
+
+
+class AlmacenCubetas(AlmacenLocal):
+    """ Cubetas de fichas por clave (ver almacen_local.py). """
+
+    def __init__(self, archivo, purga_cada):
+        super().__init__(archivo, ESQUEMA)
+        self.purga_cada = purga_cada
+        self._escrituras = 0
+
+    def consumir(self, limites, ahora=None):
+        """
+        limites: [(clave, tasa, rafaga)]. Toma una ficha de cada cubeta si todas
+        tienen una y devuelve 0; si no, no toma ninguna y devuelve los segundos
+        hasta que la más vacía la tenga.
+        """
+        ahora = ahora or time.time()
+        with self.escribir() as conexion:
+            fichas = []
+            espera = 0
+            for clave, tasa, rafaga in limites:
+                fila = conexion.execute("SELECT fichas, actualizado FROM cubetas WHERE clave = ?", (clave,)).fetchone()
+                disponibles = rafaga if fila is None else min(rafaga, fila[0] + (ahora - fila[1]) * tasa)
+                if disponibles < 1:
+                    espera = max(espera, (1 - disponibles) / tasa)
+                fichas.append((clave, disponibles - 1))
+            if espera:
+                return espera
+            conexion.executemany(
+                "INSERT INTO cubetas VALUES (?, ?, ?) ON CONFLICT (clave) DO UPDATE "
+                "SET fichas = excluded.fichas, actualizado = excluded.actualizado",
+                [(clave, restantes, ahora) for clave, restantes in fichas],
+            )
+            self._escrituras += 1
+            if self._escrituras % self.purga_cada == 0: # Una cubeta quieta una hora ya está llena: equivale a no tenerla
+                conexion.execute("DELETE FROM cubetas WHERE actualizado < ?", (ahora - 3600,))
+            return 0
+
+    def limpiar(self):
+        with self.escribir() as conexion:
+            conexion.execute("DELETE FROM cubetas")
+
+
+_almacen = AlmacenCubetas(settings.LIMITE_TASA['ARCHIVO'], settings.LIMITE_TASA['PURGA_CADA'])
+
+
+def ip_cliente(request):
+    remota = request.META.get('REMOTE_ADDR', '')
+    reenviada = request.META.get('HTTP_X_FORWARDED_FOR')
+    if reenviada and remota in settings.LIMITE_TASA['PROXIES_CONFIABLES']:
+        return reenviada.split(',')[-1].strip() # La última entrada la agregó nuestro proxy
+    return remota
+
+
+def _cuerpo(request):
+    """ Cuerpo como dict, o {} si no se puede leer (la vista responderá el error). """
+    try:
+        if request.content_type == 'application/json':
+            cuerpo = json.loads(request.body or b'{}')
+        else:
+            cuerpo = request.POST
+    except ValueError:
+        return {}
+    return cuerpo if hasattr(cuerpo, 'get') else {}
+
+
+def reglas(request):
+    """ {dimensión: (tasa, ráfaga)} que limitan la petición, o None. Sin E/S. """
+    if not settings.LIMITE_TASA['ACTIVO'] or request.method != 'POST':
+        return None
+    return settings.LIMITE_TASA['RUTAS'].get(request.path)
+
+
+def rechazo(request):
+    """ JsonResponse 429 si la petición excede algún límite de su ruta; None si pasa. """
+    reglas_ruta = reglas(request)
+    if not reglas_ruta:
+        return None
+
+    cuerpo = _cuerpo(request) if reglas_ruta.keys() & CAMPOS.keys() else {}
+    limites = []
+    for dimension, (tasa, rafaga) in reglas_ruta.items():
+        valor = ip_cliente(request) if dimension == 'IP' else cuerpo.get(CAMPOS[dimension])
+        if valor:
+            limites.append((f"{request.path}|{dimension}|{valor}", tasa, rafaga))
+    espera = _almacen.consumir(limites) if limites else 0
+    if not espera:
+        return None
+
+    respuesta = JsonResponse(
+        {"error": {"code": "IERROR_TASA_01", "message": "Demasiadas solicitudes. Intente más tarde."}}, status=429
+    )
+    respuesta['Retry-After'] = str(math.ceil(espera))
+    return respuesta
@@ -0,0 +1,33 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+from core_bancario.volumen import acumular
+
+
+class Command(BaseCommand):
+    """
+    Agrega las transacciones nuevas a VolumenTransacciones (por minuto y por hora)
+    desde la marca del último id procesado. Con --continuo queda corriendo junto a
+    Gunicorn; sin él, un solo pase hasta ponerse al día (cron).
+    """
+    help = 'Actualiza el volumen de transacciones por minuto y por hora de forma incremental.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--continuo', action='store_true', help='No terminar: repetir cada --intervalo segundos.')
+        parser.add_argument('--intervalo', type=float, default=5.0, help='Segundos entre pases en modo continuo.')
+        parser.add_argument('--lote', type=int, default=None, help='Transacciones por lote (VOLUMEN["TRANSACCIONES_POR_LOTE"]).')
+
+    def handle(self, *args, **options):
+        if not options['continuo']:
+            total = acumular(options['lote'])
+            self.stdout.write(self.style.SUCCESS(f"Transacciones agregadas: {total}"))
+            return
+
+        detener = []
+        signal.signal(signal.SIGTERM, lambda *_: detener.append(True))
+        self.stdout.write(self.style.SUCCESS("Volumen de transacciones: agregado continuo en ejecución."))
+        while not detener:
+            acumular(options['lote'])
+            time.sleep(options['intervalo'])
@@ -4,15 +4,13 @@ import random
 import re
 import django
 from django.core.management.base import BaseCommand
-from django.db import transaction
-from django.contrib.auth.models import User
 
 # Configurar el entorno de Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 django.setup()
 
-from core_bancario.models import Directorio, Cliente, Cuenta, Tarjeta
-from core_bancario.serializers import RegistroClienteSerializer
+from core_bancario.importacion import importar_directorio
+from core_bancario.models import Directorio
 
 def validar_y_corregir_rif(rif):
     """
@@ -45,61 +43,11 @@ class Command(BaseCommand):
             self.stderr.write(self.style.ERROR(f"Error: No se encuentra el archivo {csv_file}"))
             return
 
-        with open(csv_file, mode='r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                print(row.keys())
-                try:
-                    with transaction.atomic():
-                        rif_corregido = validar_y_corregir_rif(row['rif'])
+        # Bancos al Directorio; comercios además como clientes jurídicos con cuenta y afiliación
+        # (alta por bloques, ver importacion.py)
+        with open(csv_file, mode='r', encoding='utf-8-sig', newline='') as f:
+            bancos, comercios, errores = importar_directorio(csv.DictReader(f), corregir_rif=validar_y_corregir_rif)
 
-                        # 1. SI ES BANCO: Solo registro en el Directorio
-                        if row['tipo'] == 'BANCO':
-                            Directorio.objects.update_or_create(
-                                codigo=row['codigo'],
-                                defaults={
-                                    'nombre': row['nombre'],
-                                    'tipo': 'BANCO',
-                                    'api_url': row['api_url'],
-                                    'rif': rif_corregido
-                                }
-                            )
-                            self.stdout.write(self.style.SUCCESS(f"Banco registrado: {row['nombre']}"))
-
-                        # 2. SI ES COMERCIO: Crear Usuario, Cuenta ($1000) y Afiliación
-                        elif row['tipo'] == 'COMERCIO':
-                            # Datos inventados para completar el registro (según serializers.py)
-                            datos_registro = {
-                                'username': row['nombre'].lower().replace(" ", "_"),
-                                'email': f"contacto@{row['nombre'].lower().replace(' ', '')}.com",
-                                'password': f"{row['codigo']}Test2026.",
-                                'nombre_completo': row['nombre'], # Asegúrate que este campo exista en tu CSV
-                                'tipo_persona': 'JURIDICO',
-                                'rif': rif_corregido,
-                                'telefono': '04140000000', # Inventado
-                                'fecha_nacimiento': '2020-01-01', # Fecha Const. inventada
-                                'profesion': 'Ventas Retail',
-                                'tipo_cuenta': 'CORRIENTE'
-                            }
-
-                            # Usamos el serializador para disparar toda la lógica automática
-                            serializer = RegistroClienteSerializer(data=datos_registro)
-                            if serializer.is_valid():
-                                serializer.save()
-                                
-                                # También lo agregamos al Directorio para enrutamiento
-                                Directorio.objects.update_or_create(
-                                    codigo=row['codigo'],
-                                    defaults={
-                                        'nombre': row['nombre'],
-                                        'tipo': 'COMERCIO',
-                                        'api_url': row['api_url'],
-                                        'rif': rif_corregido
-                                    }
-                                )
-                                self.stdout.write(self.style.SUCCESS(f"Comercio y Cuenta ($1000) creados: {row['nombre']}"))
-                            else:
-                                self.stderr.write(self.style.ERROR(f"Error validando {row['nombre']}: {serializer.errors}"))
-
-                except Exception as e:
-                    self.stderr.write(self.style.ERROR(f"Error procesando {row['nombre']}: {str(e)}"))
+        for error in errores:
+            self.stderr.write(self.style.ERROR(f"Error en la línea {error.linea}: {error.errores}"))
+        self.stdout.write(self.style.SUCCESS(f"Bancos registrados: {bancos}. Comercios y cuentas creados: {comercios}."))
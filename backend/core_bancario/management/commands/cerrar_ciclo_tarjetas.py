@@ -0,0 +1,31 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from core_bancario.ciclos_tarjeta import cerrar_ciclo
+
+class Command(BaseCommand):
+    """
+    Genera los estados de cuenta (EstadoCuentaTarjeta) de las tarjetas cuyo día de corte
+    es la fecha indicada. Pensado para un cron diario; repetir un corte no duplica estados.
+    """
+    help = 'Cierra el ciclo de facturación de las tarjetas con corte en la fecha indicada.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', help='Fecha de corte AAAA-MM-DD (por defecto, hoy).')
+        parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1, help='Procesos del pool.')
+        parser.add_argument('--rango', type=int, default=None, help='Tarjetas (ids) por tarea.')
+
+    def handle(self, *args, **options):
+        fecha = parse_date(options['fecha']) if options['fecha'] else timezone.localdate()
+        if fecha is None:
+            raise CommandError("Fecha inválida: use el formato AAAA-MM-DD.")
+
+        inicio = time.monotonic()
+        tareas, creados = cerrar_ciclo(fecha, procesos=options['procesos'], tamano_rango=options['rango'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Corte {fecha}: {creados} estado(s) de cuenta en {tareas} tarea(s) ({time.monotonic() - inicio:.1f} s)."
+        ))
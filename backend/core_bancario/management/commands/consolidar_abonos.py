@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+from core_bancario.abonos import consolidar_pendientes
+
+class Command(BaseCommand):
+    """
+    Suma a Cuenta.saldo los abonos pendientes (AbonoPendiente) de los comercios.
+    Pensado para ejecutarse periódicamente (cron) o en bucle con --intervalo.
+    """
+    help = 'Consolida los abonos pendientes en el saldo de cada cuenta.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float, default=0, help='Si es > 0, repite cada N segundos.')
+
+    def handle(self, *args, **options):
+        while True:
+            cuentas, monto = consolidar_pendientes()
+            self.stdout.write(self.style.SUCCESS(f"Cuentas consolidadas: {cuentas} (Bs. {monto})"))
+            if options['intervalo'] <= 0:
+                return
+            time.sleep(options['intervalo'])
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+from core_bancario.estadisticas import consolidar
+
+class Command(BaseCommand):
+    """
+    Suma a EstadisticaBanco los ajustes pendientes (AjusteEstadistica) de las
+    estadísticas del panel. Pensado para ejecutarse periódicamente (cron) o en
+    bucle con --intervalo: mientras no corre, los ajustes se acumulan y cada
+    carga del panel los suma.
+    """
+    help = 'Consolida los ajustes pendientes de las estadísticas globales del banco.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float, default=0, help='Si es > 0, repite cada N segundos.')
+
+    def handle(self, *args, **options):
+        while True:
+            ajustes = consolidar()
+            self.stdout.write(self.style.SUCCESS(f"Ajustes de estadísticas consolidados: {ajustes}"))
+            if options['intervalo'] <= 0:
+                return
+            time.sleep(options['intervalo'])
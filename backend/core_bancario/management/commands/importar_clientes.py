@@ -0,0 +1,44 @@
+import csv
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core_bancario.importacion import importar_clientes
+
+
+class Command(BaseCommand):
+    """
+    Alta masiva de clientes desde un CSV con las columnas de RegistroClienteSerializer
+    (username, email, password, nombre_completo, tipo_persona, cedula, rif, telefono, ...).
+    Las filas rechazadas se listan con su línea y errores; con --errores se guardan en un CSV.
+    """
+    help = 'Importa clientes (usuario, cuenta, tarjeta y comercio) desde un CSV por bloques.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del CSV (UTF-8, con encabezado).')
+        parser.add_argument('--procesos', type=int, default=None, help='Procesos que cifran contraseñas (IMPORTACION["PROCESOS"]).')
+        parser.add_argument('--bloque', type=int, default=None, help='Filas por bloque (IMPORTACION["FILAS_POR_BLOQUE"]).')
+        parser.add_argument('--errores', default=None, help='CSV donde guardar las filas rechazadas (linea, errores).')
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        try:
+            with open(options['archivo'], newline='', encoding='utf-8-sig') as f:
+                creados, errores = importar_clientes(csv.DictReader(f), options['procesos'], options['bloque'])
+        except FileNotFoundError:
+            raise CommandError(f"No se encuentra el archivo {options['archivo']}")
+
+        if options['errores']:
+            with open(options['errores'], 'w', newline='', encoding='utf-8') as f:
+                escritor = csv.writer(f)
+                escritor.writerow(['linea', 'errores'])
+                for error in errores:
+                    escritor.writerow([error.linea, json.dumps(error.errores, ensure_ascii=False)])
+        else:
+            for error in errores:
+                self.stderr.write(self.style.ERROR(f"Línea {error.linea}: {json.dumps(error.errores, ensure_ascii=False)}"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Clientes creados: {creados}. Filas rechazadas: {len(errores)} ({time.monotonic() - inicio:.1f} s)."
+        ))
@@ -1,9 +1,15 @@
 from django.core.management.base import BaseCommand
 from django.db import transaction
-from core_bancario.models import Directorio, Cliente, Cuenta, Tarjeta, User
+from core_bancario.estadisticas import recalcular
+from core_bancario.models import Directorio, Cliente, Cuenta, Tarjeta, Transaccion, User
 
 class Command(BaseCommand):
-    help = 'Limpia las tablas Directorio, Cliente, Cuenta, Tarjeta y User.'
+    """
+    Las partidas del libro mayor protegen a sus cuentas y tarjetas (PROTECT):
+    primero se borran las transacciones, que arrastran sus asientos completos,
+    y solo entonces las tarjetas, cuentas, clientes y usuarios.
+    """
+    help = 'Limpia las tablas Directorio, Transaccion (con su libro mayor), Cliente, Cuenta, Tarjeta y User.'
 
     @transaction.atomic
     def handle(self, *args, **options):
@@ -13,6 +19,10 @@ class Command(BaseCommand):
         num_deleted, _ = Directorio.objects.all().delete()
         self.stdout.write(self.style.SUCCESS(f"Directorio: {num_deleted} registros eliminados."))
 
+        # Limpiar Transacciones (en cascada: partidas, mensajes salientes y reclasificaciones)
+        num_deleted, _ = Transaccion.objects.all().delete()
+        self.stdout.write(self.style.SUCCESS(f"Transaccion: {num_deleted} registros eliminados."))
+
         # Limpiar Tarjetas
         num_deleted, _ = Tarjeta.objects.all().delete()
         self.stdout.write(self.style.SUCCESS(f"Tarjeta: {num_deleted} registros eliminados."))
@@ -29,4 +39,5 @@ class Command(BaseCommand):
         num_deleted, _ = User.objects.filter(is_superuser=False).delete()
         self.stdout.write(self.style.SUCCESS(f"User (no-superusuarios): {num_deleted} registros eliminados."))
 
+        recalcular() # Estadísticas del panel de administración
         self.stdout.write(self.style.SUCCESS("Limpieza completada."))
@@ -0,0 +1,88 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from core_bancario import rendimiento
+
+HOSTS_LOCALES = ('', 'localhost', '127.0.0.1', '::1')
+
+
+class Command(BaseCommand):
+    """
+    Banco de pruebas de rendimiento (ver core_bancario/rendimiento.py). Corre en una
+    BD de pruebas creada para la ocasión a partir de DATABASES['default'] (SQLite o
+    PostgreSQL local) y la borra al terminar: nunca toca los datos de la aplicación.
+    Guarda el informe en JSON; con --comparar muestra la diferencia con otro informe.
+    """
+    help = 'Mide rendimiento, latencia y consultas por endpoint con clientes virtuales concurrentes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=100, help='Clientes naturales sembrados (con tarjeta).')
+        parser.add_argument('--comercios', type=int, default=10, help='Comercios jurídicos sembrados.')
+        parser.add_argument('--historial', type=int, default=2, help='Pagos previos por cliente antes de medir.')
+        parser.add_argument('--peticiones', type=int, default=200, help='Peticiones por endpoint.')
+        parser.add_argument('--concurrencia', type=int, default=8, help='Clientes virtuales simultáneos.')
+        parser.add_argument('--endpoints', default=','.join(rendimiento.ENDPOINTS), help='Endpoints a medir, separados por comas.')
+        parser.add_argument('--semilla', type=int, default=1, help='Semilla de las peticiones (misma semilla, mismas peticiones).')
+        parser.add_argument('--limites', action='store_true', help='Mantiene activos los límites de tasa y de velocidad.')
+        parser.add_argument('--procesos', type=int, default=None, help='Procesos que cifran contraseñas al sembrar.')
+        parser.add_argument('--salida', default='rendimiento.json', help='Archivo JSON del informe.')
+        parser.add_argument('--comparar', default=None, help='Informe JSON anterior con el que comparar.')
+
+    def handle(self, *args, **options):
+        endpoints = [nombre.strip() for nombre in options['endpoints'].split(',') if nombre.strip()]
+        desconocidos = set(endpoints) - set(rendimiento.ENDPOINTS)
+        if desconocidos:
+            raise CommandError(f"Endpoints desconocidos: {', '.join(sorted(desconocidos))}. Opciones: {', '.join(rendimiento.ENDPOINTS)}")
+        if options['peticiones'] < 1 or options['concurrencia'] < 1 or options['clientes'] < 1 or options['comercios'] < 1:
+            raise CommandError("--peticiones, --concurrencia, --clientes y --comercios deben ser mayores que 0.")
+        if connection.vendor != 'sqlite' and connection.settings_dict['HOST'] not in HOSTS_LOCALES:
+            raise CommandError(f"La BD ({connection.settings_dict['HOST']}) no es local: el banco de pruebas solo corre en local.")
+
+        anterior = None
+        if options['comparar']:
+            try:
+                with open(options['comparar'], encoding='utf-8') as f:
+                    anterior = json.load(f)
+            except FileNotFoundError:
+                raise CommandError(f"No se encuentra el archivo {options['comparar']}")
+
+        if connection.vendor == 'sqlite' and not connection.settings_dict['TEST']['NAME']:
+            # La BD de pruebas de SQLite es en memoria por defecto: los hilos necesitan un archivo
+            connection.settings_dict['TEST']['NAME'] = str(settings.BASE_DIR / 'rendimiento.sqlite3')
+        nombre_original = connection.settings_dict['NAME']
+        setup_test_environment()
+        self.stdout.write("Creando la BD de pruebas...")
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            informe = rendimiento.ejecutar(
+                endpoints, options['clientes'], options['comercios'], options['historial'], options['peticiones'],
+                options['concurrencia'], options['semilla'], options['limites'], options['procesos'],
+            )
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+            teardown_test_environment()
+
+        with open(options['salida'], 'w', encoding='utf-8') as f:
+            json.dump(informe, f, ensure_ascii=False, indent=2)
+
+        self.stdout.write(f"Siembra: {informe['siembra_s']} s. BD: {informe['bd']}. Commit: {informe['commit'] or '-'}")
+        self.stdout.write(f"{'endpoint':<16}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'consultas':>11}{'errores':>9}")
+        for nombre, datos in informe['endpoints'].items():
+            latencia = datos['latencia_ms']
+            linea = (f"{nombre:<16}{datos['rendimiento_rps']:>9}{latencia['p50']:>10}{latencia['p95']:>10}"
+                     f"{latencia['p99']:>10}{datos['consultas']['por_peticion']:>11}{datos['errores']:>9}")
+            self.stdout.write(self.style.ERROR(linea) if datos['errores'] else linea)
+
+        if anterior is not None:
+            self.stdout.write(f"\nFrente a {options['comparar']} (commit {anterior.get('commit') or '-'}):")
+            for nombre, rps_antes, rps_ahora, p95_antes, p95_ahora in rendimiento.comparar(anterior, informe):
+                self.stdout.write(
+                    f"{nombre:<16} rps {rps_antes} -> {rps_ahora} ({(rps_ahora / rps_antes - 1) * 100:+.0f}%), "
+                    f"p95 {p95_antes} -> {p95_ahora} ms ({(p95_ahora / p95_antes - 1) * 100:+.0f}%)"
+                )
+
+        self.stdout.write(self.style.SUCCESS(f"Informe guardado en {options['salida']}."))
@@ -0,0 +1,71 @@
+import multiprocessing
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core_bancario.outbox import bancos_con_pendientes, drenar_banco
+
+
+def trabajador(indice, total, hilos, intervalo):
+    """
+    Bucle de un proceso worker: atiende solo los bancos de su partición, cada
+    banco en un hilo a la vez (orden por banco) y varios bancos en paralelo.
+    """
+    connections.close_all() # No reutilizar la conexión heredada del proceso padre
+    detener = []
+    signal.signal(signal.SIGTERM, lambda *_: detener.append(True))
+    with ThreadPoolExecutor(max_workers=hilos, thread_name_prefix=f'outbox-{indice}') as pool:
+        while not detener:
+            bancos = bancos_con_pendientes(indice, total)
+            limite = settings.OUTBOX['MENSAJES_POR_CICLO']
+            resueltos = sum(pool.map(lambda banco: drenar_banco(banco, limite), bancos))
+            if not resueltos:
+                time.sleep(intervalo)
+
+
+class Command(BaseCommand):
+    """
+    Drena la cola de salida (MensajeSaliente) hacia los bancos aliados.
+    Lanza N procesos; cada banco lo atiende siempre el mismo proceso para
+    conservar el orden de envío. Pensado para correr junto a Gunicorn.
+    """
+    help = 'Envía las autorizaciones pendientes de la cola de salida con reintentos y backoff.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Procesos worker.')
+        parser.add_argument('--hilos', type=int, default=8, help='Bancos atendidos en paralelo por cada proceso.')
+        parser.add_argument('--intervalo', type=float, default=1.0, help='Segundos de espera cuando la cola está vacía.')
+        parser.add_argument('--una-vez', action='store_true', help='Un solo ciclo en este proceso y salir (cron / pruebas).')
+
+    def handle(self, *args, **options):
+        if options['una_vez']:
+            resueltos = sum(drenar_banco(banco, settings.OUTBOX['MENSAJES_POR_CICLO']) for banco in bancos_con_pendientes())
+            self.stdout.write(self.style.SUCCESS(f"Mensajes resueltos: {resueltos}"))
+            return
+
+        total = options['workers']
+        connections.close_all() # Antes de bifurcar: cada hijo abre su propia conexión
+        contexto = multiprocessing.get_context('fork')
+        procesos = [
+            contexto.Process(
+                target=trabajador, args=(indice, total, options['hilos'], options['intervalo']),
+                name=f'outbox-{indice}', daemon=True
+            )
+            for indice in range(total)
+        ]
+        for proceso in procesos:
+            proceso.start()
+        self.stdout.write(self.style.SUCCESS(f"Cola de salida: {total} worker(s) en ejecución."))
+
+        try:
+            for proceso in procesos:
+                proceso.join()
+        except KeyboardInterrupt:
+            for proceso in procesos:
+                proceso.terminate()
+            for proceso in procesos:
+                proceso.join()
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from core_bancario.idempotencia import purgar_vencidas
+
+class Command(BaseCommand):
+    """
+    Elimina en lote las claves de idempotencia vencidas (ver IDEMPOTENCIA_TTL).
+    Pensado para ejecutarse periódicamente (cron / tarea programada).
+    """
+    help = 'Purga las claves de idempotencia vencidas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=5000, help='Filas a borrar por sentencia DELETE.')
+
+    def handle(self, *args, **options):
+        total = purgar_vencidas(lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f"Claves de idempotencia purgadas: {total}"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from core_bancario.estadisticas import recalcular
+
+class Command(BaseCommand):
+    """
+    Recalcula desde cero las estadísticas globales del panel de administración
+    (EstadisticaBanco). Solo hace falta tras cargas o borrados fuera de la aplicación.
+    """
+    help = 'Recalcula las estadísticas globales del banco (liquidez, clientes, directorio).'
+
+    def handle(self, *args, **options):
+        for clave, valor in sorted(recalcular().items()):
+            self.stdout.write(self.style.SUCCESS(f"{clave}: {valor}"))
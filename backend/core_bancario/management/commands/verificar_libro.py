@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from core_bancario.libro import verificar_libro
+
+class Command(BaseCommand):
+    """
+    Recalcula todos los saldos desde el libro mayor en una sola pasada y los
+    compara con los materializados (Cuenta.saldo + abonos pendientes, Tarjeta.saldo_disponible).
+    Con --reconstruir reescribe los saldos desde el libro (bloquea cuentas y tarjetas mientras corre).
+    """
+    help = 'Verifica (o reconstruye) los saldos a partir del libro mayor.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reconstruir', action='store_true', help='Reescribe los saldos materializados desde el libro.')
+        parser.add_argument('--bloque', type=int, default=5000, help='Filas por lectura en el recorrido del libro.')
+        parser.add_argument('--detalle', type=int, default=20, help='Diferencias a listar por tipo.')
+
+    def handle(self, *args, **options):
+        resultado = verificar_libro(reconstruir=options['reconstruir'], tamano_bloque=options['bloque'])
+        descuadrados, cuentas, tarjetas = resultado['asientos_descuadrados'], resultado['cuentas'], resultado['tarjetas']
+
+        for transaccion_id in descuadrados[:options['detalle']]:
+            self.stdout.write(self.style.ERROR(f"Asiento descuadrado: transacción {transaccion_id}"))
+        for pk, materializado, libro in cuentas[:options['detalle']]:
+            self.stdout.write(self.style.WARNING(f"Cuenta {pk}: saldo {materializado} / libro {libro}"))
+        for pk, materializado, libro in tarjetas[:options['detalle']]:
+            self.stdout.write(self.style.WARNING(f"Tarjeta {pk}: saldo {materializado} / libro {libro}"))
+
+        resumen = f"Asientos descuadrados: {len(descuadrados)} | Cuentas con diferencia: {len(cuentas)} | Tarjetas con diferencia: {len(tarjetas)}"
+        if options['reconstruir']:
+            self.stdout.write(self.style.SUCCESS(f"{resumen}. Saldos reconstruidos desde el libro."))
+        elif descuadrados or cuentas or tarjetas:
+            self.stdout.write(self.style.ERROR(resumen))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{resumen}. El libro cuadra."))
@@ -1,3 +1,8 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from . import limite_tasa
+
+
 class DisableCSRFForAPIMiddleware:
     """
     Middleware: Desactiva la verificación CSRF globalmente 
@@ -9,4 +14,33 @@ class DisableCSRFForAPIMiddleware:
     def __call__(self, request):
         if request.path.startswith('/api/'):
             setattr(request, '_dont_enforce_csrf_checks', True)
-        return self.get_response(request)
\ No newline at end of file
+        return self.get_response(request)
+
+
+class LimiteTasaMiddleware:
+    """
+    Middleware: Responde 429 a los endpoints públicos que exceden su límite de
+    tasa, antes de la vista (ver limite_tasa.py). Síncrono y asíncrono: bajo
+    ASGI las rutas limitadas consultan sus cubetas (SQLite, puede esperar el
+    bloqueo de escritura) en un hilo, sin bloquear el event loop; las demás
+    pasan sin salto de hilo.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return limite_tasa.rechazo(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        if limite_tasa.reglas(request):
+            rechazo = await sync_to_async(limite_tasa.rechazo, thread_sensitive=False)(request)
+            if rechazo is not None:
+                return rechazo
+        return await self.get_response(request)
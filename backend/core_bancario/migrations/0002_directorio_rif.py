@@ -3,6 +3,20 @@
 from django.db import migrations, models
 
 
+def agregar_rif_si_falta(apps, schema_editor):
+    """
+    0001_initial se editó después de aplicarse y ya crea Directorio.rif: en una BD
+    nueva la columna existe y un AddField fallaría (duplicate column name: rif).
+    Solo las BD migradas con la 0001 original necesitan agregarla.
+    """
+    Directorio = apps.get_model('core_bancario', 'Directorio')
+    tabla = Directorio._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        columnas = {c.name for c in schema_editor.connection.introspection.get_table_description(cursor, tabla)}
+    if 'rif' not in columnas:
+        schema_editor.add_field(Directorio, Directorio._meta.get_field('rif'))
+
+
 class Migration(migrations.Migration):
 
     dependencies = [
@@ -10,9 +24,6 @@ class Migration(migrations.Migration):
     ]
 
     operations = [
-        migrations.AddField(
-            model_name='directorio',
-            name='rif',
-            field=models.CharField(blank=True, help_text='J-12345678-9', max_length=20, null=True),
-        ),
+        # El estado ya tiene el campo desde 0001_initial; solo la BD puede no tenerlo
+        migrations.RunPython(agregar_rif_si_falta, migrations.RunPython.noop),
     ]
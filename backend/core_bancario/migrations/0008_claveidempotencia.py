@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-18 12:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_bancario', '0007_tarjeta_dia_corte_tarjeta_dia_pago_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaveIdempotencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alcance', models.CharField(help_text='Ej: COMERCIO:J-12345678-9 o BANCO:0002', max_length=50)),
+                ('clave', models.CharField(help_text='numero_transaccion enviado por el cliente', max_length=100)),
+                ('estado', models.CharField(choices=[('EN_CURSO', 'En curso'), ('COMPLETADA', 'Completada')], default='EN_CURSO', max_length=10)),
+                ('codigo_http', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('respuesta', models.BinaryField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expira', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('alcance', 'clave'), name='idempotencia_unica_por_alcance')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_bancario', '0008_claveidempotencia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='directorio',
+            name='alias',
+            field=models.CharField(blank=True, help_text='Códigos alternos separados por coma. Ej: BANCO_2,0002', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='directorio',
+            name='bins',
+            field=models.CharField(blank=True, help_text='Prefijos BIN de longitud variable separados por coma. Ej: 0002,458912', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='directorio',
+            name='nombre_externo',
+            field=models.CharField(blank=True, help_text='Formato del código en peticiones salientes. Ej: BANCO_2', max_length=50),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 6.0 on 2026-10-18 12:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_bancario', '0010_directorio_conector'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaccion',
+            name='estado',
+            field=models.CharField(choices=[('APROBADO', 'Aprobado'), ('RECHAZADO', 'Rechazado'), ('PENDIENTE', 'Pendiente')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='MensajeSaliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('banco', models.CharField(help_text='Código canónico del banco emisor destino', max_length=10)),
+                ('payload', models.JSONField()),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('ENTREGADO', 'Entregado'), ('RECHAZADO', 'Rechazado'), ('FALLIDO', 'Fallido'), ('CANCELADO', 'Cancelado')], default='PENDIENTE', max_length=10)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('en_linea', models.BooleanField(default=False, help_text='Reservado por la petición que lo originó (primer envío en línea)')),
+                ('disponible_desde', models.DateTimeField(help_text='No se (re)intenta antes de esta hora: backoff o reserva de un worker')),
+                ('codigo_http', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('ultimo_error', models.TextField(blank=True)),
+                ('alcance', models.CharField(blank=True, max_length=50)),
+                ('clave', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('resuelto_en', models.DateTimeField(blank=True, null=True)),
+                ('transaccion', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='mensaje_saliente', to='core_bancario.transaccion')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['banco', 'estado', 'id'], name='outbox_cabeza_por_banco'), models.Index(fields=['estado', 'disponible_desde'], name='outbox_pendientes')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 12:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_bancario', '0011_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AbonoPendiente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('monto', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('cuenta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='abonos_pendientes', to='core_bancario.cuenta')),
+            ],
+        ),
+    ]
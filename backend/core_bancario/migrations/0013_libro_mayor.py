@@ -0,0 +1,81 @@
+# Generated by Django 6.0 on 2026-10-18 12:21
+
+import django.db.models.deletion
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def _asiento(Transaccion, Partida, tipo, mensaje, piernas):
+    total = sum(pierna.monto for pierna in piernas)
+    cabecera = Transaccion.objects.create(
+        tipo=tipo, monto=abs(total), estado='APROBADO', codigo_respuesta='00', banco_emisor_id='', mensaje_error=mensaje
+    )
+    piernas.append(Partida(externa='SISTEMA:APERTURA', monto=-total))
+    for pierna in piernas:
+        pierna.transaccion_id = cabecera.pk
+    Partida.objects.bulk_create(piernas, batch_size=5000)
+
+
+def asiento_apertura(apps, schema_editor):
+    """
+    Lleva al libro los saldos existentes (incluidos los abonos pendientes) contra SISTEMA:APERTURA.
+
+    En las tarjetas la APERTURA es la línea de crédito (limite_credito), como en las
+    tarjetas nuevas: el motor de ciclos (ciclos_tarjeta.py) la excluye al calcular la
+    deuda. La deuda que ya tenían (limite_credito - saldo_disponible) va en un asiento
+    DEUDA_INICIAL aparte, que sí cuenta como movimiento.
+    """
+    Cuenta = apps.get_model('core_bancario', 'Cuenta')
+    Tarjeta = apps.get_model('core_bancario', 'Tarjeta')
+    AbonoPendiente = apps.get_model('core_bancario', 'AbonoPendiente')
+    Transaccion = apps.get_model('core_bancario', 'Transaccion')
+    Partida = apps.get_model('core_bancario', 'Partida')
+
+    pendientes = dict(AbonoPendiente.objects.values('cuenta_id').annotate(total=Sum('monto')).values_list('cuenta_id', 'total'))
+    piernas = [
+        Partida(cuenta_id=pk, monto=saldo + pendientes.get(pk, Decimal('0')))
+        for pk, saldo in Cuenta.objects.values_list('pk', 'saldo').iterator()
+        if saldo + pendientes.get(pk, Decimal('0'))
+    ]
+    deudas = []
+    for pk, disponible, limite in Tarjeta.objects.values_list('pk', 'saldo_disponible', 'limite_credito').iterator():
+        if limite:
+            piernas.append(Partida(tarjeta_id=pk, monto=limite))
+        if disponible != limite:
+            deudas.append(Partida(tarjeta_id=pk, monto=disponible - limite))
+    if piernas:
+        _asiento(Transaccion, Partida, 'APERTURA', 'Saldo de apertura del libro mayor', piernas)
+    if deudas:
+        _asiento(Transaccion, Partida, 'DEUDA_INICIAL', 'Deuda de tarjetas previa al libro mayor', deudas)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_bancario', '0012_abonopendiente'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaccion',
+            name='tipo',
+            field=models.CharField(choices=[('PAGO_COMERCIO', 'Pago en Comercio'), ('TRANSFERENCIA', 'Transferencia'), ('PAGO_INTERBANCARIO', 'Pago Interbancario'), ('COMISION_BANCARIA', 'Comisión Bancaria'), ('APERTURA', 'Saldo de apertura'), ('DEUDA_INICIAL', 'Deuda previa al libro')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='Partida',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('externa', models.CharField(blank=True, max_length=30)),
+                ('monto', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('cuenta', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='partidas', to='core_bancario.cuenta')),
+                ('tarjeta', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='partidas', to='core_bancario.tarjeta')),
+                ('transaccion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='partidas', to='core_bancario.transaccion')),
+            ],
+            options={
+                'constraints': [models.CheckConstraint(condition=models.Q(models.Q(('cuenta__isnull', False), ('externa', ''), ('tarjeta__isnull', True)), models.Q(('cuenta__isnull', True), ('externa', ''), ('tarjeta__isnull', False)), models.Q(('cuenta__isnull', True), ('tarjeta__isnull', True), models.Q(('externa', ''), _negated=True)), _connector='OR'), name='partida_un_solo_titular')],
+            },
+        ),
+        migrations.RunPython(asiento_apertura, migrations.RunPython.noop),
+    ]
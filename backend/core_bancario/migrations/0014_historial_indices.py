@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-18 12:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_bancario', '0013_libro_mayor'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaccion',
+            index=models.Index(fields=['cuenta_origen', 'fecha'], name='tx_origen_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='transaccion',
+            index=models.Index(fields=['cuenta_destino', 'fecha'], name='tx_destino_fecha'),
+        ),
+    ]
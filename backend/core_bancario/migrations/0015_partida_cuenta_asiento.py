@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_bancario', '0014_historial_indices'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='partida',
+            index=models.Index(fields=['cuenta', 'transaccion'], name='partida_cuenta_asiento'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 6.0 on 2026-10-18 12:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_bancario', '0015_partida_cuenta_asiento'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadoCuentaTarjeta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_inicio', models.DateField(help_text='Primer día del ciclo')),
+                ('fecha_corte', models.DateField(help_text='Último día del ciclo')),
+                ('fecha_vencimiento', models.DateField(help_text='Fecha límite de pago')),
+                ('saldo_anterior', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('cargos', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('abonos', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('saldo_total', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('pago_minimo', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('limite_credito', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='partida',
+            index=models.Index(fields=['tarjeta', 'transaccion'], name='partida_tarjeta_asiento'),
+        ),
+        migrations.AddField(
+            model_name='estadocuentatarjeta',
+            name='tarjeta',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='estados_cuenta', to='core_bancario.tarjeta'),
+        ),
+        migrations.AddConstraint(
+            model_name='estadocuentatarjeta',
+            constraint=models.UniqueConstraint(fields=('tarjeta', 'fecha_corte'), name='estado_tarjeta_unico_por_corte'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 6.0 on 2026-10-18 12:39
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def estadisticas_iniciales(apps, schema_editor):
+    """ Punto de partida de los contadores incrementales (ver estadisticas.py). """
+    EstadisticaBanco = apps.get_model('core_bancario', 'EstadisticaBanco')
+    Partida = apps.get_model('core_bancario', 'Partida')
+    Cliente = apps.get_model('core_bancario', 'Cliente')
+    Directorio = apps.get_model('core_bancario', 'Directorio')
+
+    valores = {
+        'LIQUIDEZ': Partida.objects.filter(cuenta__isnull=False).aggregate(total=Sum('monto'))['total'] or Decimal('0'),
+        'CLIENTES': Cliente.objects.count(),
+        'BANCOS': Directorio.objects.filter(tipo='BANCO').count(),
+        'COMERCIOS': Directorio.objects.filter(tipo='COMERCIO').count(),
+    }
+    EstadisticaBanco.objects.bulk_create(
+        [EstadisticaBanco(clave=clave, fragmento=0, valor=valor) for clave, valor in valores.items()]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_bancario', '0016_estado_cuenta_tarjeta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadisticaBanco',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=30)),
+                ('fragmento', models.PositiveSmallIntegerField(default=0)),
+                ('valor', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('clave', 'fragmento'), name='estadistica_fragmento_unico')],
+            },
+        ),
+        migrations.RunPython(estadisticas_iniciales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0 on 2026-10-18 12:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_bancario', '0017_estadisticabanco'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcaProceso',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=30, unique=True)),
+                ('ultimo_id', models.PositiveBigIntegerField(default=0)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VolumenTransacciones',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularidad', models.CharField(choices=[('MINUTO', 'Minuto'), ('HORA', 'Hora')], max_length=6)),
+                ('inicio', models.DateTimeField()),
+                ('tipo', models.CharField(max_length=20)),
+                ('estado', models.CharField(max_length=20)),
+                ('banco_emisor_id', models.CharField(max_length=10)),
+                ('codigo_respuesta', models.CharField(max_length=20)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('monto_total', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('granularidad', 'inicio', 'tipo', 'estado', 'banco_emisor_id', 'codigo_respuesta'), name='volumen_intervalo_unico')],
+            },
+        ),
+    ]
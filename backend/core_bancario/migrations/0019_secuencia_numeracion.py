@@ -0,0 +1,39 @@
+# Generated by Django 6.0 on 2026-10-18 12:59
+
+from django.db import migrations, models
+
+SECUENCIAS = ('numeracion_cuenta', 'numeracion_tarjeta')
+
+
+def crear_secuencias(apps, schema_editor):
+    """ En PostgreSQL numeracion.py usa secuencias nativas; en otras bases, la tabla SecuenciaNumeracion. """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nombre in SECUENCIAS:
+        schema_editor.execute(f"CREATE SEQUENCE IF NOT EXISTS {nombre} START WITH 0 MINVALUE 0")
+
+
+def borrar_secuencias(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nombre in SECUENCIAS:
+        schema_editor.execute(f"DROP SEQUENCE IF EXISTS {nombre}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_bancario', '0018_volumen_transacciones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SecuenciaNumeracion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=20, unique=True)),
+                ('siguiente', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(crear_secuencias, borrar_secuencias),
+    ]
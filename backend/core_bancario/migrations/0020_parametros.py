@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 13:08
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_bancario', '0019_secuencia_numeracion'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='configuracionglobal',
+            options={'verbose_name': 'Parámetro', 'verbose_name_plural': 'Parámetros'},
+        ),
+    ]
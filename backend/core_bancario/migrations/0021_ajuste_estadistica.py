@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-18 13:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_bancario', '0020_parametros'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AjusteEstadistica',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=30)),
+                ('delta', models.DecimalField(decimal_places=2, max_digits=20)),
+            ],
+        ),
+    ]
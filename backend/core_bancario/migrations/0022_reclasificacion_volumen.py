@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-18 13:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_bancario', '0021_ajuste_estadistica'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='marcaproceso',
+            name='huecos',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.CreateModel(
+            name='ReclasificacionVolumen',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado_anterior', models.CharField(max_length=20)),
+                ('codigo_anterior', models.CharField(max_length=20)),
+                ('estado', models.CharField(max_length=20)),
+                ('codigo_respuesta', models.CharField(max_length=20)),
+                ('transaccion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core_bancario.transaccion')),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0 on 2026-10-18 14:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_bancario', '0022_reclasificacion_volumen'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='partida',
+            name='cuenta',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='partidas', to='core_bancario.cuenta'),
+        ),
+        migrations.AlterField(
+            model_name='partida',
+            name='tarjeta',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='partidas', to='core_bancario.tarjeta'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0 on 2026-10-18 14:15
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def unir_fragmentos(apps, schema_editor):
+    """ Una sola fila por estadística: los fragmentos de cada clave se suman al de menor id. """
+    EstadisticaBanco = apps.get_model('core_bancario', 'EstadisticaBanco')
+    totales = EstadisticaBanco.objects.values('clave').annotate(total=Sum('valor')).values_list('clave', 'total')
+    for clave, total in totales:
+        filas = EstadisticaBanco.objects.filter(clave=clave).order_by('pk')
+        primera = filas.first()
+        filas.exclude(pk=primera.pk).delete()
+        EstadisticaBanco.objects.filter(pk=primera.pk).update(valor=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_bancario', '0023_partidas_protegidas'),
+    ]
+
+    operations = [
+        migrations.RunPython(unir_fragmentos, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='estadisticabanco',
+            name='estadistica_fragmento_unico',
+        ),
+        migrations.RemoveField(
+            model_name='estadisticabanco',
+            name='fragmento',
+        ),
+        migrations.AlterField(
+            model_name='estadisticabanco',
+            name='clave',
+            field=models.CharField(max_length=30, unique=True),
+        ),
+    ]
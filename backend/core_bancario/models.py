@@ -7,7 +7,6 @@ from django.contrib.auth.models import User
 import random
 from datetime import datetime
 from dateutil.relativedelta import relativedelta # Necesitarás: pip install python-dateutil
-from django.conf import settings
 
 class Cliente(models.Model):
     TIPO_PERSONA_CHOICES = (
@@ -57,22 +56,11 @@ class Cuenta(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def save(self, *args, **kwargs):
-        # Solo generamos el número si la cuenta es nueva (no tiene ID aún)
+        # Solo generamos el número si la cuenta es nueva: Banco + Agencia + Control + 10 dígitos
+        # de una secuencia, sin consultas de colisión (ver numeracion.py)
         if not self.numero_cuenta:
-            unique = False
-            while not unique:
-                # 1. Definir Estructura Venezolana
-                # Banco (0001) + Agencia (0001) + Control (00)
-                prefix = f"{settings.MI_CODIGO_BANCO}{settings.MI_CODIGO_AGENCIA}00" 
-                
-                # 2. Generar 10 dígitos aleatorios
-                unique_id = str(random.randint(1, 9999999999)).zfill(10)
-                posible_numero = f"{prefix}{unique_id}"
-                
-                # 3. Verificar colisión (¿Ya existe este número?)
-                if not Cuenta.objects.filter(numero_cuenta=posible_numero).exists():
-                    self.numero_cuenta = posible_numero
-                    unique = True
+            from .numeracion import numeros_cuenta # Importación diferida: numeracion importa este módulo
+            self.numero_cuenta = numeros_cuenta(1)[0]
             
         super().save(*args, **kwargs)
 
@@ -90,24 +78,24 @@ class Tarjeta(models.Model):
     dia_corte = models.IntegerField(default=15, help_text="Día del mes en que cierra la facturación")
     dia_pago = models.IntegerField(default=5, help_text="Día del mes límite para pagar")
 
+    def emitir(self, numero):
+        """ Asigna número, CVV y vencimiento a una tarjeta nueva. """
+        self.numero = numero
+
+        # --- SEGURIDAD ---
+        # CVV: 3 dígitos aleatorios (simulación criptográfica)
+        self.cvv = str(random.randint(100, 999))
+        
+        # FECHA VENCIMIENTO: VIGENCIA_TARJETA_ANOS (5 por defecto) a partir de hoy
+        from .parametros import obtener as parametro # Importación diferida: parametros importa este módulo
+        fecha_futura = datetime.now() + relativedelta(years=parametro('VIGENCIA_TARJETA_ANOS'))
+        self.fecha_vencimiento = fecha_futura.strftime("%m/%y") # Formato MM/YY
+
     def save(self, *args, **kwargs):
         if not self.numero:
-            # --- Generación de Número de Tarjeta ---
-            # 1. BIN del banco (definido en settings, ej. 5 dígitos)
-            bin_prefix = settings.MI_BIN_TARJETA
-            
-            # 2. Número de cuenta individual (para completar a 16 dígitos, ej. 11 dígitos aleatorios)
-            account_id = str(random.randint(1, 10**(16 - len(bin_prefix)) - 1)).zfill(16 - len(bin_prefix))
-            
-            self.numero = f"{bin_prefix}{account_id}"
-
-            # --- SEGURIDAD ---
-            # CVV: 3 dígitos aleatorios (simulación criptográfica)
-            self.cvv = str(random.randint(100, 999))
-            
-            # FECHA VENCIMIENTO: 5 años a partir de hoy
-            fecha_futura = datetime.now() + relativedelta(years=5)
-            self.fecha_vencimiento = fecha_futura.strftime("%m/%y") # Formato MM/YY
+            # BIN del banco + identificador de secuencia + dígito Luhn (ver numeracion.py)
+            from .numeracion import numeros_tarjeta # Importación diferida: numeracion importa este módulo
+            self.emitir(numeros_tarjeta(1)[0])
 
         super().save(*args, **kwargs)
 
@@ -130,6 +118,24 @@ class Directorio(models.Model):
     rif = models.CharField(max_length=20, null=True, blank=True, help_text="J-12345678-9") 
     tipo = models.CharField(max_length=10, choices=TIPO_ENTIDAD)
     api_url = models.URLField(help_text="Endpoint base del equipo. Ej: http://192.168.1.50:8000/api/")
+
+    # --- Enrutamiento (ver enrutamiento.py) ---
+    alias = models.CharField(max_length=100, blank=True, help_text="Códigos alternos separados por coma. Ej: BANCO_2,0002")
+    bins = models.CharField(max_length=255, blank=True, help_text="Prefijos BIN de longitud variable separados por coma. Ej: 0002,458912")
+    nombre_externo = models.CharField(max_length=50, blank=True, help_text="Formato del código en peticiones salientes. Ej: BANCO_2")
+
+    # --- Conector saliente (ver conectores.py) ---
+    TIPO_AUTENTICACION = (
+        ('NINGUNA', 'Sin autenticación'),
+        ('BEARER', 'Bearer token'),
+        ('SUPABASE', 'Bearer + apikey (Supabase)'),
+    )
+    url_autorizacion = models.URLField(blank=True, help_text="Sobrescribe {api_url}/autorizar_pago/ si el banco usa otra ruta")
+    tipo_autenticacion = models.CharField(max_length=10, choices=TIPO_AUTENTICACION, default='NINGUNA')
+    token_api = models.CharField(max_length=512, blank=True)
+    pool_conexiones = models.PositiveSmallIntegerField(default=10, help_text="Máximo de conexiones concurrentes hacia el banco")
+    timeout_conexion = models.FloatField(default=3.05, help_text="Segundos")
+    timeout_lectura = models.FloatField(default=15, help_text="Segundos")
     
     def __str__(self):
         return f"{self.nombre} ({self.codigo})"
@@ -157,10 +163,13 @@ class Transaccion(models.Model):
         ('TRANSFERENCIA', 'Transferencia'),
         ('PAGO_INTERBANCARIO', 'Pago Interbancario'),
         ('COMISION_BANCARIA', 'Comisión Bancaria'),
+        ('APERTURA', 'Saldo de apertura'), # Asiento inicial del libro mayor (ver libro.py)
+        ('DEUDA_INICIAL', 'Deuda previa al libro'), # Deuda de tarjetas al crear el libro (migración 0013)
     )
     ESTADO_CHOICES = (
         ('APROBADO', 'Aprobado'),
         ('RECHAZADO', 'Rechazado'),
+        ('PENDIENTE', 'Pendiente'), # Autorización externa en la cola de salida (ver outbox.py)
     )
 
     tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
@@ -178,9 +187,262 @@ class Transaccion(models.Model):
     codigo_respuesta = models.CharField(max_length=20) # 201, 404, IERROR...
     mensaje_error = models.TextField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Historial del cliente por cursor (ver historial.py): una pierna por índice
+            models.Index(fields=['cuenta_origen', 'fecha'], name='tx_origen_fecha'),
+            models.Index(fields=['cuenta_destino', 'fecha'], name='tx_destino_fecha'),
+        ]
+
     def __str__(self):
         return f"{self.tipo} - {self.monto} - {self.estado}"
     
+# --- LIBRO MAYOR DE DOBLE PARTIDA ---
+class Partida(models.Model):
+    """
+    Pierna de un asiento contable. Solo se insertan, nunca se modifican ni borran.
+
+    Cada Transaccion aprobada es la cabecera de un asiento cuyas partidas suman
+    cero. `monto` es positivo si aumenta el saldo del titular (Cuenta.saldo o
+    Tarjeta.saldo_disponible) y negativo si lo disminuye. Los movimientos con
+    terceros o con el propio banco usan una contrapartida `externa`
+    (ej. "BANCO:0002", "SISTEMA:BONOS").
+
+    Un asiento solo se borra completo (junto con su Transaccion). Por eso una
+    Cuenta o Tarjeta con historial en el libro no se puede eliminar (PROTECT),
+    ni tampoco el Cliente o User que la contiene: borrar solo una pierna
+    descuadraría el libro.
+    """
+    transaccion = models.ForeignKey(Transaccion, on_delete=models.CASCADE, related_name='partidas')
+    cuenta = models.ForeignKey(Cuenta, on_delete=models.PROTECT, null=True, blank=True, related_name='partidas')
+    tarjeta = models.ForeignKey(Tarjeta, on_delete=models.PROTECT, null=True, blank=True, related_name='partidas')
+    externa = models.CharField(max_length=30, blank=True)
+    monto = models.DecimalField(max_digits=15, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=(
+                    models.Q(cuenta__isnull=False, tarjeta__isnull=True, externa='')
+                    | models.Q(cuenta__isnull=True, tarjeta__isnull=False, externa='')
+                    | (models.Q(cuenta__isnull=True, tarjeta__isnull=True) & ~models.Q(externa=''))
+                ),
+                name='partida_un_solo_titular',
+            ),
+        ]
+        indexes = [
+            # Estado de cuenta en streaming (ver estado_cuenta.py): partidas de una cuenta en orden de asiento
+            models.Index(fields=['cuenta', 'transaccion'], name='partida_cuenta_asiento'),
+            # Cierre de ciclo de tarjetas (ver ciclos_tarjeta.py)
+            models.Index(fields=['tarjeta', 'transaccion'], name='partida_tarjeta_asiento'),
+        ]
+
+    def __str__(self):
+        titular = self.externa or (f"Cuenta {self.cuenta_id}" if self.cuenta_id else f"Tarjeta {self.tarjeta_id}")
+        return f"{titular}: {self.monto:+}"
+
+# --- ABONOS PENDIENTES A CUENTAS DE COMERCIO ---
+class AbonoPendiente(models.Model):
+    """
+    Crédito aprobado que aún no se suma a Cuenta.saldo.
+    Cada pago inserta su propia fila (sin tocar la fila de la Cuenta), así los
+    pagos a un mismo comercio no se serializan en un bloqueo; abonos.py los
+    consolida en el saldo de forma periódica o al leerlo.
+    """
+    cuenta = models.ForeignKey(Cuenta, on_delete=models.CASCADE, related_name='abonos_pendientes')
+    monto = models.DecimalField(max_digits=15, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"+{self.monto} -> {self.cuenta_id}"
+
+# --- IDEMPOTENCIA DE LA PASARELA DE PAGOS ---
+class ClaveIdempotencia(models.Model):
+    """
+    Registro de idempotencia por adquirente (comercio) o banco aliado.
+    Guarda la respuesta original ya serializada para repetirla byte a byte
+    cuando el datáfono o el banco reintenta la misma operación.
+    """
+    ESTADO_CHOICES = (
+        ('EN_CURSO', 'En curso'),
+        ('COMPLETADA', 'Completada'),
+    )
+
+    alcance = models.CharField(max_length=50, help_text="Ej: COMERCIO:J-12345678-9 o BANCO:0002")
+    clave = models.CharField(max_length=100, help_text="numero_transaccion enviado por el cliente")
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='EN_CURSO')
+    codigo_http = models.PositiveSmallIntegerField(null=True, blank=True)
+    respuesta = models.BinaryField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expira = models.DateTimeField(db_index=True) # Las claves vencidas se purgan en lote
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['alcance', 'clave'], name='idempotencia_unica_por_alcance'),
+        ]
+
+    def __str__(self):
+        return f"{self.alcance} / {self.clave} ({self.estado})"
+
+# --- COLA DE SALIDA HACIA BANCOS ALIADOS (OUTBOX) ---
+class MensajeSaliente(models.Model):
+    """
+    Autorización pendiente de entregar a un banco aliado.
+    Se escribe en la misma transacción que la Transaccion PENDIENTE que la origina
+    y la drenan los workers de `procesar_outbox`, en orden de id por banco.
+    """
+    ESTADO_CHOICES = (
+        ('PENDIENTE', 'Pendiente'),
+        ('ENTREGADO', 'Entregado'), # El banco aprobó: el abono al comercio ya se aplicó
+        ('RECHAZADO', 'Rechazado'), # El banco respondió con un rechazo de negocio
+        ('FALLIDO', 'Fallido'), # Se agotaron los reintentos o el banco dejó de existir
+        ('CANCELADO', 'Cancelado'), # No llegó a enviarse (cortacircuitos abierto en línea)
+    )
+
+    banco = models.CharField(max_length=10, help_text="Código canónico del banco emisor destino")
+    payload = models.JSONField()
+    transaccion = models.OneToOneField(Transaccion, on_delete=models.CASCADE, related_name='mensaje_saliente')
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='PENDIENTE')
+    intentos = models.PositiveSmallIntegerField(default=0)
+    en_linea = models.BooleanField(default=False, help_text="Reservado por la petición que lo originó (primer envío en línea)")
+    disponible_desde = models.DateTimeField(help_text="No se (re)intenta antes de esta hora: backoff o reserva de un worker")
+    codigo_http = models.PositiveSmallIntegerField(null=True, blank=True)
+    ultimo_error = models.TextField(blank=True)
+
+    # Clave de idempotencia del pago: al resolverse se guarda allí la respuesta final
+    alcance = models.CharField(max_length=50, blank=True)
+    clave = models.CharField(max_length=100, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    resuelto_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['banco', 'estado', 'id'], name='outbox_cabeza_por_banco'),
+            models.Index(fields=['estado', 'disponible_desde'], name='outbox_pendientes'),
+        ]
+
+    def __str__(self):
+        return f"{self.banco} #{self.pk} ({self.estado})"
+
+# --- ESTADOS DE CUENTA DE TARJETAS DE CRÉDITO ---
+class EstadoCuentaTarjeta(models.Model):
+    """
+    Cierre de un ciclo de facturación de una tarjeta. Lo genera `cerrar_ciclo_tarjetas`
+    el día de corte a partir del libro mayor; uno por tarjeta y fecha de corte.
+    """
+    tarjeta = models.ForeignKey(Tarjeta, on_delete=models.CASCADE, related_name='estados_cuenta')
+    fecha_inicio = models.DateField(help_text="Primer día del ciclo")
+    fecha_corte = models.DateField(help_text="Último día del ciclo")
+    fecha_vencimiento = models.DateField(help_text="Fecha límite de pago")
+    saldo_anterior = models.DecimalField(max_digits=15, decimal_places=2) # Deuda al cierre del ciclo anterior
+    cargos = models.DecimalField(max_digits=15, decimal_places=2)
+    abonos = models.DecimalField(max_digits=15, decimal_places=2)
+    saldo_total = models.DecimalField(max_digits=15, decimal_places=2) # Deuda al corte
+    pago_minimo = models.DecimalField(max_digits=15, decimal_places=2)
+    limite_credito = models.DecimalField(max_digits=15, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tarjeta', 'fecha_corte'], name='estado_tarjeta_unico_por_corte'),
+        ]
+
+    def __str__(self):
+        return f"Tarjeta {self.tarjeta_id} - corte {self.fecha_corte} (Bs. {self.saldo_total})"
+
+# --- ESTADÍSTICAS GLOBALES DEL PANEL DE ADMINISTRACIÓN ---
+class EstadisticaBanco(models.Model):
+    """
+    Valor consolidado de una estadística global (ver estadisticas.py).
+    El valor vigente es el de su fila más sus AjusteEstadistica pendientes.
+    """
+    clave = models.CharField(max_length=30, unique=True) # LIQUIDEZ, CLIENTES, BANCOS, COMERCIOS
+    valor = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.clave} = {self.valor}"
+
+class AjusteEstadistica(models.Model):
+    """
+    Ajuste de una estadística global que aún no se suma a EstadisticaBanco.
+    Cada pago inserta su propia fila (sin bloquear ninguna fila compartida);
+    estadisticas.consolidar() los suma al valor consolidado y los borra.
+    """
+    clave = models.CharField(max_length=30)
+    delta = models.DecimalField(max_digits=20, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.clave} {self.delta:+}"
+
+# --- VOLUMEN DE TRANSACCIONES POR MINUTO Y POR HORA ---
+class VolumenTransacciones(models.Model):
+    """
+    Agregado incremental de la bitácora de Transaccion (ver volumen.py).
+    Una fila por intervalo y combinación de tipo, estado, banco emisor y código de respuesta.
+    """
+    GRANULARIDAD_CHOICES = (
+        ('MINUTO', 'Minuto'),
+        ('HORA', 'Hora'),
+    )
+
+    granularidad = models.CharField(max_length=6, choices=GRANULARIDAD_CHOICES)
+    inicio = models.DateTimeField() # Inicio del intervalo (UTC)
+    tipo = models.CharField(max_length=20)
+    estado = models.CharField(max_length=20)
+    banco_emisor_id = models.CharField(max_length=10)
+    codigo_respuesta = models.CharField(max_length=20)
+    cantidad = models.IntegerField(default=0)
+    monto_total = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['granularidad', 'inicio', 'tipo', 'estado', 'banco_emisor_id', 'codigo_respuesta'],
+                name='volumen_intervalo_unico'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.granularidad} {self.inicio:%Y-%m-%d %H:%M} {self.tipo} {self.estado}: {self.cantidad}"
+
+class ReclasificacionVolumen(models.Model):
+    """
+    Cambio de estado de una Transaccion pendiente de aplicar al agregado de volumen
+    (ver volumen.py). Se inserta en la misma transacción que el cambio.
+    """
+    transaccion = models.ForeignKey(Transaccion, on_delete=models.CASCADE, related_name='+')
+    estado_anterior = models.CharField(max_length=20)
+    codigo_anterior = models.CharField(max_length=20)
+    estado = models.CharField(max_length=20)
+    codigo_respuesta = models.CharField(max_length=20)
+
+    def __str__(self):
+        return f"{self.transaccion_id}: {self.estado_anterior} -> {self.estado}"
+
+class MarcaProceso(models.Model):
+    """ Hasta qué Transaccion (id) llegó un proceso incremental, ej. el agregado de volumen. """
+    nombre = models.CharField(max_length=30, unique=True)
+    ultimo_id = models.PositiveBigIntegerField(default=0)
+    # {id: epoch} ids <= ultimo_id que aún no estaban confirmados al procesarse su lote
+    huecos = models.JSONField(default=dict, blank=True)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.nombre}: {self.ultimo_id}"
+
+# --- SECUENCIAS DE NUMERACIÓN (CUENTAS Y TARJETAS) ---
+class SecuenciaNumeracion(models.Model):
+    """
+    Contador de respaldo para numeracion.py en bases sin secuencias (SQLite).
+    En PostgreSQL se usan las secuencias numeracion_cuenta / numeracion_tarjeta.
+    """
+    nombre = models.CharField(max_length=20, unique=True)
+    siguiente = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.nombre}: {self.siguiente}"
+
 # --- MODELO PROXY PARA LINK EN ADMIN ---
 class AdminDashboardProxy(Cliente):
     """
@@ -197,27 +459,20 @@ class AdminDashboardProxy(Cliente):
 # --- MODELO PARA CONFIGURACIONES GLOBALES ---
 class ConfiguracionGlobal(models.Model):
     """
-    Modelo Singleton para almacenar configuraciones clave-valor.
-    Permite cambiar parámetros (ej. tasas) desde el admin sin redesplegar.
+    Parámetros de negocio clave-valor (ej. monto del bono, pago mínimo).
+    Permite cambiarlos desde el admin sin redesplegar. Las claves válidas, su
+    tipo y su valor por defecto están en parametros.py, que también los lee.
     """
     clave = models.CharField(max_length=50, primary_key=True)
     valor = models.CharField(max_length=255)
 
+    class Meta:
+        verbose_name = 'Parámetro'
+        verbose_name_plural = 'Parámetros'
+
     def __str__(self):
         return self.clave
 
-    def save(self, *args, **kwargs):
-        # Forzar a que siempre se use el mismo ID para mantener un único registro
-        self.pk = "config"
-        super(ConfiguracionGlobal, self).save(*args, **kwargs)
-    
-    @classmethod
-    def load(cls):
-        # Cargar la configuración como un objeto fácil de usar
-        # Esto es más para uso futuro, pero es un buen patrón
-        try:
-            config = cls.objects.get(pk="config")
-            # En un futuro, podríamos parsear los valores (ej. a float)
-            return config
-        except cls.DoesNotExist:
-            return None
+    def clean(self):
+        from .parametros import convertir # Importación diferida: parametros importa este módulo
+        convertir(self.clave, self.valor)
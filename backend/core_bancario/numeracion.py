@@ -0,0 +1,148 @@
+# backend/core_bancario/numeracion.py
+
+"""
+Asignación de números de cuenta y de tarjeta sin consultas de colisión.
+
+Cada número sale de un valor de secuencia único, permutado (opcionalmente)
+para que números consecutivos no se vean consecutivos:
+
+- Cuenta (20 dígitos, formato venezolano): Banco (4) + Agencia (4) +
+  Dígitos de control (2) + Cuenta (10). El primer dígito de control se
+  calcula sobre banco + agencia y el segundo sobre agencia + cuenta, módulo
+  11 con los pesos 3, 2, 7, 6, 5, 4, 3, 2 (repetidos).
+- Tarjeta (16 dígitos): BIN del banco + identificador + dígito de Luhn.
+
+En PostgreSQL los valores vienen de las secuencias numeracion_cuenta y
+numeracion_tarjeta (`nextval` no bloquea ni se revierte con la transacción):
+cada proceso reserva NUMERACION['BLOQUE'] valores de una vez y los va
+gastando sin ir a la BD. Un proceso que termina deja huecos, nunca repetidos.
+En otras bases (SQLite, desarrollo) se usa la tabla SecuenciaNumeracion
+dentro de la transacción en curso, sin reservar bloques por proceso.
+
+La permutación es afín módulo 10^dígitos (biyectiva: el multiplicador es
+coprimo con 10). Oculta el orden de alta; no es un mecanismo de seguridad.
+Los números asignados antes de este módulo eran aleatorios y llevan control
+"00", que este esquema no produce para el banco y agencia por defecto.
+"""
+
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import SecuenciaNumeracion
+
+CUENTA = 'cuenta'
+TARJETA = 'tarjeta'
+LARGO_CUENTA = 10
+LARGO_TARJETA = 16
+PESOS_CONTROL = (3, 2, 7, 6, 5, 4, 3, 2)
+
+
+# --- DÍGITOS DE CONTROL ---
+
+def _modulo_11(digitos):
+    suma = sum(int(digito) * PESOS_CONTROL[indice % len(PESOS_CONTROL)] for indice, digito in enumerate(digitos))
+    resto = 11 - suma % 11
+    return {11: 0, 10: 1}.get(resto, resto)
+
+
+def digitos_control(banco, agencia, cuenta):
+    """ Los dos dígitos de control de una cuenta de 20 dígitos. """
+    return f"{_modulo_11(banco + agencia)}{_modulo_11(agencia + cuenta)}"
+
+
+def digito_luhn(parcial):
+    """ Dígito que completa `parcial` para que pase la verificación de Luhn. """
+    suma = 0
+    for indice, digito in enumerate(reversed(parcial)):
+        valor = int(digito)
+        if indice % 2 == 0: # Se duplican las posiciones pares contando desde el dígito que se agregará
+            valor *= 2
+            if valor > 9:
+                valor -= 9
+        suma += valor
+    return str((10 - suma % 10) % 10)
+
+
+def es_luhn_valido(numero):
+    return digito_luhn(numero[:-1]) == numero[-1]
+
+
+def cuenta_valida(numero):
+    return len(numero) == 20 and numero.isdigit() and numero[8:10] == digitos_control(numero[:4], numero[4:8], numero[10:])
+
+
+# --- SECUENCIAS ---
+
+def _reservar(nombre, cantidad):
+    """ `cantidad` valores nuevos de la secuencia `nombre`. """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT nextval('numeracion_{nombre}') FROM generate_series(1, %s)", [cantidad])
+            return [fila[0] for fila in cursor.fetchall()]
+    with transaction.atomic():
+        SecuenciaNumeracion.objects.get_or_create(nombre=nombre)
+        secuencia = SecuenciaNumeracion.objects.select_for_update().get(nombre=nombre)
+        inicio = secuencia.siguiente
+        secuencia.siguiente += cantidad
+        secuencia.save(update_fields=['siguiente'])
+    return list(range(inicio, inicio + cantidad))
+
+
+class Asignador:
+    """ Valores de una secuencia reservados por bloques para este proceso. Seguro entre hilos. """
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self._valores = deque()
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def tomar(self, cantidad):
+        if connection.vendor != 'postgresql':
+            # El contador de respaldo es transaccional: un bloque guardado en memoria podría
+            # revertirse con la transacción y volver a entregarse a otro proceso.
+            return _reservar(self.nombre, cantidad)
+        with self._lock:
+            if self._pid != os.getpid(): # Proceso bifurcado: el bloque heredado es del padre
+                self._valores.clear()
+                self._pid = os.getpid()
+            faltan = cantidad - len(self._valores)
+            if faltan > 0:
+                self._valores.extend(_reservar(self.nombre, max(faltan, settings.NUMERACION['BLOQUE'])))
+            return [self._valores.popleft() for _ in range(cantidad)]
+
+
+_asignadores = {CUENTA: Asignador(CUENTA), TARJETA: Asignador(TARJETA)}
+
+
+def _permutar(valor, digitos):
+    """ Biyección de [0, 10^digitos) en sí mismo. """
+    if not settings.NUMERACION['MEZCLAR']:
+        return valor
+    return (valor * settings.NUMERACION['MULTIPLICADOR'] + settings.NUMERACION['DESPLAZAMIENTO']) % 10 ** digitos
+
+
+# --- NÚMEROS ---
+
+def numeros_cuenta(cantidad, banco=None, agencia=None):
+    banco = banco or settings.MI_CODIGO_BANCO
+    agencia = agencia or settings.MI_CODIGO_AGENCIA
+    numeros = []
+    for valor in _asignadores[CUENTA].tomar(cantidad):
+        cuenta = str(_permutar(valor, LARGO_CUENTA)).zfill(LARGO_CUENTA)
+        numeros.append(f"{banco}{agencia}{digitos_control(banco, agencia, cuenta)}{cuenta}")
+    return numeros
+
+
+def numeros_tarjeta(cantidad, bin_tarjeta=None):
+    bin_tarjeta = bin_tarjeta or settings.MI_BIN_TARJETA
+    digitos = LARGO_TARJETA - len(bin_tarjeta) - 1
+    numeros = []
+    for valor in _asignadores[TARJETA].tomar(cantidad):
+        parcial = f"{bin_tarjeta}{str(_permutar(valor, digitos)).zfill(digitos)}"
+        numeros.append(parcial + digito_luhn(parcial))
+    return numeros
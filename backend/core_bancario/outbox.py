@@ -0,0 +1,235 @@
+# backend/core_bancario/outbox.py
+
+"""
+Cola de salida (transactional outbox) para las autorizaciones hacia bancos aliados.
+
+Un pago externo ya no depende de que el banco emisor responda dentro de la
+petición del datáfono:
+
+1. En una sola transacción se crea la Transaccion PENDIENTE y su MensajeSaliente.
+2. En modo EN_LINEA la vista intenta el envío de inmediato (el mensaje nace
+   reservado para ella). Si el banco no responde, el mensaje queda en la cola
+   y el datáfono recibe 202 "en proceso".
+3. Los workers de `procesar_outbox` drenan la cola: cada banco lo atiende un
+   único proceso, en orden de id, con reintentos y backoff exponencial.
+
+El abono al comercio, sus partidas en el libro mayor, el cambio de la
+Transaccion a APROBADO y la marca ENTREGADO del mensaje se aplican en la
+misma transacción, así todo abono por
+un pago externo tiene su mensaje entregado. La respuesta final se guarda en la
+clave de idempotencia del pago: el reintento del datáfono la recibe.
+
+Reservar un mensaje es un UPDATE condicional sobre `disponible_desde`: quien
+lo reserva tiene OUTBOX['RESERVA_S'] segundos para resolverlo; si el proceso
+muere, el mensaje vuelve a estar disponible al vencer la reserva.
+"""
+
+import logging
+import random
+import zlib
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import parametros
+from .autorizacion import acreditar_cuenta
+from .conectores import CircuitoAbierto, obtener_conector
+from .enrutamiento import obtener_tabla
+from .idempotencia import fijar_respuesta
+from .libro import asentar, externa_banco, pierna_cuenta, pierna_externa
+from .models import MensajeSaliente, Transaccion
+from .volumen import reclasificar
+
+logger = logging.getLogger(__name__)
+
+
+def _error(code, message, http_status):
+    return Response({"error": {"code": code, "message": message}}, status=http_status)
+
+
+def respuesta_pendiente():
+    return Response(
+        {"message": "Pago en proceso con el banco emisor. Consulte de nuevo con el mismo numero_transaccion."},
+        status=status.HTTP_202_ACCEPTED
+    )
+
+
+# --- ENCOLADO ---
+
+def encolar_autorizacion(banco, payload, cuenta_destino_id, monto, alcance='', clave='', **datos_transaccion):
+    """
+    Crea la Transaccion PENDIENTE y su mensaje en la misma transacción.
+    Devuelve (mensaje, en_linea): si en_linea es True el mensaje nace reservado para
+    que quien llama lo envíe ya; si no, lo enviará un worker.
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        # Orden por banco: si ya hay cola hacia este banco, el nuevo pago espera su turno.
+        en_linea = (
+            settings.OUTBOX['MODO'] == 'EN_LINEA'
+            and not MensajeSaliente.objects.filter(banco=banco, estado='PENDIENTE', en_linea=False).exists()
+        )
+        pago = Transaccion.objects.create(
+            monto=monto, cuenta_destino_id=cuenta_destino_id,
+            estado='PENDIENTE', codigo_respuesta='202', **datos_transaccion
+        )
+        mensaje = MensajeSaliente.objects.create(
+            banco=banco, payload=payload, transaccion=pago, alcance=alcance, clave=clave,
+            intentos=1 if en_linea else 0, en_linea=en_linea,
+            disponible_desde=ahora + timedelta(seconds=settings.OUTBOX['RESERVA_S']) if en_linea else ahora,
+        )
+    return mensaje, en_linea
+
+
+def reservar_mensaje(mensaje):
+    """ Reserva el mensaje para un envío. False si otro worker lo tomó o aún no toca. """
+    ahora = timezone.now()
+    filas = MensajeSaliente.objects.filter(
+        pk=mensaje.pk, estado='PENDIENTE', disponible_desde__lte=ahora
+    ).update(
+        disponible_desde=ahora + timedelta(seconds=settings.OUTBOX['RESERVA_S']), intentos=F('intentos') + 1
+    )
+    return filas == 1
+
+
+# --- RESOLUCIÓN ---
+
+def _cerrar(mensaje, estado, estado_pago, codigo_respuesta, respuesta, mensaje_error=None, codigo_http=None, ultimo_error=''):
+    """
+    Marca el mensaje como resuelto (si sigue pendiente) y actualiza su Transaccion.
+    Devuelve False si otro proceso ya lo había resuelto.
+    """
+    filas = MensajeSaliente.objects.filter(pk=mensaje.pk, estado='PENDIENTE').update(
+        estado=estado, codigo_http=codigo_http, ultimo_error=ultimo_error, resuelto_en=timezone.now()
+    )
+    if filas == 0:
+        return False
+    reclasificar(mensaje.transaccion_id, estado_pago, codigo_respuesta) # Por si el volumen ya la contó PENDIENTE
+    Transaccion.objects.filter(pk=mensaje.transaccion_id).update(
+        estado=estado_pago, codigo_respuesta=codigo_respuesta, mensaje_error=mensaje_error
+    )
+    if mensaje.clave and respuesta.status_code < 500:
+        # Un 5xx no se memoriza (ver idempotencia.completar): el datáfono puede reintentar.
+        fijar_respuesta(mensaje.alcance, mensaje.clave, respuesta)
+    return True
+
+
+def registrar_respuesta(mensaje, response):
+    """
+    Aplica la respuesta HTTP del banco emisor. Devuelve la Response final para el
+    comercio, o None si el mensaje sigue en la cola (error 5xx del banco: se reintenta).
+    """
+    if response.status_code >= 500:
+        reprogramar(mensaje, f"HTTP {response.status_code}")
+        return None
+
+    if response.status_code == 201:
+        respuesta = Response({"message": "Pago aprobado por banco externo"}, status=status.HTTP_201_CREATED)
+        with transaction.atomic():
+            if _cerrar(mensaje, 'ENTREGADO', 'APROBADO', '201', respuesta, codigo_http=201):
+                pago = Transaccion.objects.values('cuenta_destino_id', 'monto').get(pk=mensaje.transaccion_id)
+                acreditar_cuenta(pago['cuenta_destino_id'], pago['monto'])
+                # Libro mayor: el banco emisor nos debe el monto que abonamos al comercio
+                asentar(
+                    mensaje.transaccion_id,
+                    pierna_externa(externa_banco(mensaje.banco), -pago['monto']),
+                    pierna_cuenta(pago['cuenta_destino_id'], pago['monto']),
+                )
+        return respuesta
+
+    # --- MEJORA PARA DEPURACIÓN B2B ---
+    # Si el banco responde algo distinto a 201, capturamos su mensaje exacto
+    try:
+        detalle_banco = response.json()
+    except Exception:
+        detalle_banco = response.text
+    mensaje_rechazo = f"Transacción declinada por el banco emisor. Detalle: {detalle_banco}"
+    respuesta = _error("IERROR_1002", mensaje_rechazo, status.HTTP_402_PAYMENT_REQUIRED)
+    with transaction.atomic():
+        _cerrar(mensaje, 'RECHAZADO', 'RECHAZADO', str(response.status_code), respuesta,
+                mensaje_error=mensaje_rechazo, codigo_http=response.status_code)
+    return respuesta
+
+
+def reprogramar(mensaje, error, espera=None, contar=True):
+    """
+    Devuelve el mensaje a la cola con backoff exponencial (con jitter).
+    Al agotar el parámetro OUTBOX_MAX_INTENTOS el pago se da por fallido.
+    """
+    mensaje.refresh_from_db(fields=['intentos'])
+    if contar and mensaje.intentos >= parametros.obtener('OUTBOX_MAX_INTENTOS'):
+        logger.warning("Outbox: mensaje %s hacia el banco %s descartado tras %s intentos (%s)",
+                       mensaje.pk, mensaje.banco, mensaje.intentos, error)
+        descartar(mensaje, 'FALLIDO', f"Sin respuesta del banco emisor tras {mensaje.intentos} intentos: {error}")
+        return
+    if espera is None:
+        espera = min(settings.OUTBOX['BACKOFF_MAX_S'], settings.OUTBOX['BACKOFF_BASE_S'] * 2 ** (mensaje.intentos - 1))
+        espera *= random.uniform(0.8, 1.2)
+    MensajeSaliente.objects.filter(pk=mensaje.pk, estado='PENDIENTE').update(
+        disponible_desde=timezone.now() + timedelta(seconds=espera), ultimo_error=str(error)[:1000], en_linea=False,
+        intentos=F('intentos') if contar else F('intentos') - 1,
+    )
+
+
+def descartar(mensaje, estado, motivo):
+    """ Cierra el mensaje sin abono (FALLIDO o CANCELADO) y rechaza su Transaccion. """
+    if estado == 'CANCELADO':
+        respuesta = _error("IERROR_1008", "Banco emisor no disponible temporalmente. Intente más tarde.", status.HTTP_503_SERVICE_UNAVAILABLE)
+    else:
+        respuesta = _error("IERROR_1002", "Timeout conectando con banco emisor.", status.HTTP_404_NOT_FOUND)
+    with transaction.atomic():
+        _cerrar(mensaje, estado, 'RECHAZADO', respuesta.data['error']['code'], respuesta,
+                mensaje_error=motivo, ultimo_error=motivo)
+    return respuesta
+
+
+# --- WORKERS ---
+
+def drenar_banco(banco, limite):
+    """
+    Envía en orden los mensajes pendientes de un banco hasta `limite` o hasta que
+    la cabeza de la cola esté en espera (backoff). Devuelve cuántos se resolvieron.
+    """
+    close_old_connections()
+    ruta = obtener_tabla().por_codigo(banco)
+    resueltos = 0
+    while resueltos < limite:
+        mensaje = MensajeSaliente.objects.filter(banco=banco, estado='PENDIENTE').order_by('pk').first()
+        if mensaje is None or not reservar_mensaje(mensaje):
+            break # Cola vacía, o la cabeza espera su backoff: no se adelanta a los siguientes
+
+        if ruta is None or ruta.propio:
+            descartar(mensaje, 'FALLIDO', f"Banco {banco} no registrado en el Directorio.")
+            resueltos += 1
+            continue
+
+        try:
+            response = obtener_conector(ruta).autorizar(mensaje.payload)
+        except CircuitoAbierto as error:
+            # No hubo llamada: no consume intento, se espera a que el circuito pase a semiabierto.
+            reprogramar(mensaje, error, espera=settings.CIRCUITO_BANCOS['SEGUNDOS_ABIERTO'], contar=False)
+            break
+        except requests.exceptions.RequestException as error:
+            reprogramar(mensaje, error)
+            break
+
+        if registrar_respuesta(mensaje, response) is None:
+            break
+        resueltos += 1
+    return resueltos
+
+
+def bancos_con_pendientes(indice=0, total=1):
+    """ Bancos con mensajes listos para enviar que le tocan al worker `indice` de `total`. """
+    bancos = (
+        MensajeSaliente.objects.filter(estado='PENDIENTE', disponible_desde__lte=timezone.now())
+        .values_list('banco', flat=True).distinct()
+    )
+    # Partición estable: cada banco siempre lo atiende el mismo proceso (orden por banco).
+    return [banco for banco in bancos if zlib.crc32(banco.encode()) % total == indice]
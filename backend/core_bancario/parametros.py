@@ -0,0 +1,197 @@
+# backend/core_bancario/parametros.py
+
+"""
+Parámetros de negocio editables en caliente (bono, pago mínimo, vencimientos,
+reintentos), guardados como texto en ConfiguracionGlobal y leídos con su tipo.
+
+Cada clave se declara en PARAMETROS con su tipo y su valor por defecto (que
+sale de settings cuando ya existía ahí). Una clave sin fila en la BD usa el
+valor por defecto; una fila con un valor inválido se ignora con un aviso en
+el log (el admin la valida antes de guardarla, ver ConfiguracionGlobal.clean).
+
+Los valores viven en memoria en cada proceso: leer un parámetro es una
+búsqueda en un dict. Guardar o borrar una fila (signals.py) marca una nueva
+versión en la caché compartida al confirmarse la transacción. Cada proceso
+compara su versión con la compartida a lo sumo cada PARAMETROS['REVISION_S']
+segundos (una lectura de la caché, sin BD) y, si cambió, recarga todas las
+filas con una consulta. Además recarga cada PARAMETROS['TTL_S'] segundos
+aunque la versión no cambie (caché compartida vaciada o local a un proceso).
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils.dateparse import parse_duration
+from django.utils.duration import duration_string
+
+from .models import ConfiguracionGlobal
+
+logger = logging.getLogger(__name__)
+
+CLAVE_VERSION = 'parametros:version'
+
+
+# --- TIPOS ---
+
+def _a_decimal(texto):
+    try:
+        valor = Decimal(texto)
+    except InvalidOperation:
+        valor = None
+    if valor is None or not valor.is_finite():
+        raise ValueError("Se esperaba un número decimal (ej: 1000.00).")
+    return valor
+
+
+def _a_entero(texto):
+    try:
+        return int(texto)
+    except ValueError:
+        raise ValueError("Se esperaba un número entero.")
+
+
+def _a_duracion(texto):
+    duracion = parse_duration(texto)
+    if duracion is None:
+        raise ValueError("Se esperaba una duración: segundos, HH:MM:SS, 'D HH:MM:SS' o ISO 8601 (ej: P1D).")
+    return duracion
+
+
+def _a_booleano(texto):
+    valor = texto.strip().lower()
+    if valor in ('1', 'true', 'si', 'sí', 'on'):
+        return True
+    if valor in ('0', 'false', 'no', 'off'):
+        return False
+    raise ValueError("Se esperaba un booleano: true / false.")
+
+
+Tipo = namedtuple('Tipo', ['nombre', 'convertir', 'texto'])
+
+DECIMAL = Tipo('decimal', _a_decimal, str)
+ENTERO = Tipo('entero', _a_entero, str)
+DURACION = Tipo('duración', _a_duracion, duration_string)
+BOOLEANO = Tipo('booleano', _a_booleano, lambda valor: 'true' if valor else 'false')
+
+Parametro = namedtuple('Parametro', ['tipo', 'defecto', 'descripcion'])
+
+PARAMETROS = {
+    'BONO_BIENVENIDA_ACTIVO': Parametro(BOOLEANO, True, "Permite reclamar el bono de bienvenida."),
+    'BONO_BIENVENIDA_MONTO': Parametro(DECIMAL, Decimal('1000.00'), "Monto del bono de bienvenida (Bs.)."),
+    'PAGO_MINIMO_PORCENTAJE': Parametro(
+        DECIMAL, settings.CICLO_TARJETAS['PAGO_MINIMO_PORCENTAJE'], "Pago mínimo de la tarjeta: % del saldo al corte."
+    ),
+    'PAGO_MINIMO_FIJO': Parametro(
+        DECIMAL, settings.CICLO_TARJETAS['PAGO_MINIMO_FIJO'], "Pago mínimo de la tarjeta: monto fijo (Bs.)."
+    ),
+    'VIGENCIA_TARJETA_ANOS': Parametro(ENTERO, 5, "Años de vigencia de una tarjeta nueva."),
+    'IDEMPOTENCIA_TTL': Parametro(
+        DURACION, settings.IDEMPOTENCIA_TTL, "Tiempo que se repite la respuesta original de un numero_transaccion."
+    ),
+    'OUTBOX_MAX_INTENTOS': Parametro(
+        ENTERO, settings.OUTBOX['MAX_INTENTOS'], "Envíos a un banco aliado antes de dar un pago por fallido."
+    ),
+}
+
+# Límite de cada regla de velocidad (ver velocidad.py); 0 la desactiva
+PARAMETROS.update({
+    f"VELOCIDAD_{regla['NOMBRE']}": Parametro(
+        DECIMAL if regla['MEDIDA'] == 'MONTO' else ENTERO, regla['LIMITE'],
+        f"Velocidad: máximo de {regla['MEDIDA']} por {regla['ENTIDAD']} en {regla['VENTANA_S']} s (0 = sin límite).",
+    )
+    for regla in settings.VELOCIDAD['REGLAS']
+})
+
+
+def convertir(clave, texto):
+    """ Valor tipado de `texto` para `clave`. Lanza ValidationError si la clave o el valor no son válidos. """
+    parametro = PARAMETROS.get(clave)
+    if parametro is None:
+        raise ValidationError(f"Parámetro desconocido: {clave}.")
+    try:
+        return parametro.tipo.convertir(texto)
+    except ValueError as error:
+        raise ValidationError(f"{clave} ({parametro.tipo.nombre}): {error}")
+
+
+# --- CACHÉ POR PROCESO ---
+
+class CacheParametros:
+    """ Todos los parámetros tipados de este proceso. Segura entre hilos. """
+
+    def __init__(self, revision_segundos, ttl_segundos):
+        self.revision = revision_segundos
+        self.ttl = ttl_segundos
+        self._valores = None
+        self._version = None
+        self._revisar_en = 0 # monotonic: próxima comparación con la versión compartida
+        self._recargar_en = 0 # monotonic: próxima recarga aunque la versión no cambie
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        if time.monotonic() >= self._revisar_en:
+            self._revisar()
+        return self._valores[clave]
+
+    def _revisar(self):
+        with self._lock:
+            ahora = time.monotonic()
+            if ahora < self._revisar_en:
+                return # Otro hilo revisó mientras esperábamos el lock
+            version = cache.get(CLAVE_VERSION)
+            if self._valores is None or version != self._version or ahora >= self._recargar_en:
+                self._valores = self._cargar()
+                self._version = version
+                self._recargar_en = ahora + self.ttl
+            self._revisar_en = ahora + self.revision
+
+    def _cargar(self):
+        """ Valores por defecto + filas de la BD (una consulta). """
+        valores = {clave: parametro.defecto for clave, parametro in PARAMETROS.items()}
+        for clave, texto in ConfiguracionGlobal.objects.values_list('clave', 'valor'):
+            if clave not in PARAMETROS:
+                continue
+            try:
+                valores[clave] = convertir(clave, texto)
+            except ValidationError as error:
+                logger.warning("Parámetro %s ignorado, se usa el valor por defecto: %s", clave, error.messages[0])
+        return valores
+
+    def limpiar(self):
+        """ Fuerza la recarga en la próxima lectura (sin dejar a otros hilos sin valores). """
+        with self._lock:
+            self._revisar_en = self._recargar_en = 0
+
+
+_cache = CacheParametros(settings.PARAMETROS['REVISION_S'], settings.PARAMETROS['TTL_S'])
+
+
+def obtener(clave):
+    """ Valor tipado vigente de un parámetro (KeyError si no está declarado en PARAMETROS). """
+    return _cache.obtener(clave)
+
+
+def _marcar():
+    cache.set(CLAVE_VERSION, uuid.uuid4().hex, timeout=None)
+    _cache.limpiar() # Este proceso lo ve de inmediato; los demás en la próxima revisión
+
+
+def invalidar():
+    """ Nueva versión de los parámetros, al confirmarse la transacción en curso. """
+    transaction.on_commit(_marcar)
+
+
+def fijar(clave, valor):
+    """ Guarda un parámetro desde su valor tipado (o su texto). Devuelve el valor tipado. """
+    texto = valor if isinstance(valor, str) else PARAMETROS[clave].tipo.texto(valor)
+    tipado = convertir(clave, texto)
+    ConfiguracionGlobal.objects.update_or_create(clave=clave, defaults={'valor': texto})
+    return tipado
@@ -0,0 +1,308 @@
+# backend/core_bancario/rendimiento.py
+
+"""
+Banco de pruebas de rendimiento de la API (ver el comando medir_rendimiento).
+
+1. Siembra un conjunto de datos reproducible: clientes naturales con su
+   tarjeta, comercios jurídicos (importacion.py) y un historial de pagos
+   previos por cliente.
+2. Mide cada endpoint por separado: registro, login, dashboard, historial,
+   cobro de datáfono (On-Us) y autorización de un banco aliado. Cada fase
+   reparte sus peticiones entre clientes virtuales concurrentes
+   (hilos con su propio django.test.Client: pila completa de middlewares y
+   vistas, sin red).
+3. Informa por endpoint: rendimiento (peticiones/s), latencia p50/p95/p99,
+   códigos de respuesta y consultas a la BD por petición. El informe es un
+   dict serializable a JSON, comparable entre commits (comparar()).
+
+Las peticiones de cada fase se generan antes de medir con random.Random(semilla):
+dos corridas con la misma semilla envían las mismas peticiones. Los límites de
+tasa y los controles de velocidad se desactivan salvo que se pidan (todos los
+clientes virtuales salen de la misma IP). Las claves de la caché compartida
+llevan el prefijo PREFIJO_CACHE para no mezclarse con las de la aplicación.
+"""
+
+import contextvars
+import random
+import statistics
+import subprocess
+import threading
+import time
+from collections import Counter, namedtuple
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import Client, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .asincronia import _pool_bd
+from .importacion import importar_clientes
+from .models import Comercio, Tarjeta
+
+CLAVE = 'Rendimiento123!'
+PREFIJO_CACHE = 'rendimiento'
+BANCO_ALIADO = '0002'
+
+Peticion = namedtuple('Peticion', ['metodo', 'ruta', 'cuerpo', 'token'])
+Datos = namedtuple('Datos', ['clientes', 'comercios']) # clientes: [{username, token, numero, cvv, vencimiento}]
+
+
+# --- SIEMBRA ---
+
+def sembrar(clientes, comercios, procesos=None):
+    """ Crea los clientes y comercios del banco de pruebas. Devuelve Datos. """
+    filas = [
+        {'username': f"rend_c{i}", 'email': f"rend_c{i}@rendimiento.test", 'password': CLAVE,
+         'nombre_completo': f"Cliente {i}", 'tipo_persona': 'NATURAL', 'cedula': str(30000000 + i),
+         'telefono': '04140000000'}
+        for i in range(clientes)
+    ] + [
+        {'username': f"rend_m{i}", 'email': f"rend_m{i}@rendimiento.test", 'password': CLAVE,
+         'nombre_completo': f"Comercio {i}", 'tipo_persona': 'JURIDICO', 'rif': f"J-{40000000 + i}-0",
+         'telefono': '02120000000'}
+        for i in range(comercios)
+    ]
+    creados, errores = importar_clientes(filas, procesos)
+    if errores:
+        raise ValueError(f"No se pudo sembrar el banco de pruebas: {errores[0]}")
+
+    usuarios = {u.pk: u for u in User.objects.filter(username__startswith='rend_c')}
+    tarjetas = Tarjeta.objects.filter(cuenta__cliente__user__in=usuarios.keys()).order_by('cuenta__cliente__user_id').values_list(
+        'cuenta__cliente__user_id', 'numero', 'cvv', 'fecha_vencimiento'
+    )
+    datos_clientes = [
+        {'username': usuarios[user_id].username, 'token': str(RefreshToken.for_user(usuarios[user_id]).access_token),
+         'numero': numero, 'cvv': cvv, 'vencimiento': vencimiento}
+        for user_id, numero, cvv, vencimiento in tarjetas
+    ]
+    codigos = list(Comercio.objects.filter(cuenta__cliente__user__username__startswith='rend_m').order_by('pk').values_list('codigo_identificador', flat=True))
+    return Datos(datos_clientes, codigos)
+
+
+# --- PETICIONES POR ENDPOINT ---
+
+def _registro(datos, rng, n):
+    return Peticion('post', '/api/registro/', {
+        'username': f"rend_r{n}", 'email': f"rend_r{n}@rendimiento.test", 'password': CLAVE,
+        'nombre_completo': f"Registro {n}", 'tipo_persona': 'NATURAL', 'cedula': str(50000000 + n),
+        'telefono': '04140000000',
+    }, None)
+
+
+def _login(datos, rng, n):
+    return Peticion('post', '/api/token/', {'username': rng.choice(datos.clientes)['username'], 'password': CLAVE}, None)
+
+
+def _dashboard(datos, rng, n):
+    return Peticion('get', '/api/dashboard/', None, rng.choice(datos.clientes)['token'])
+
+
+def _historial(datos, rng, n):
+    return Peticion('get', '/api/transacciones/', None, rng.choice(datos.clientes)['token'])
+
+
+def _pago_comercio(datos, rng, n, prefijo='RP'):
+    cliente = rng.choice(datos.clientes)
+    return Peticion('post', '/api/procesar_pago_comercio/', {
+        'numero_transaccion': f"{prefijo}-{n}", 'numero_tarjeta': cliente['numero'], 'cvc_tarjeta': cliente['cvv'],
+        'fecha_vencimiento_tarjeta': cliente['vencimiento'], 'codigo_banco_comercio_receptor': settings.MI_CODIGO_BANCO,
+        'codigo_identificador_comercio_receptor': rng.choice(datos.comercios), 'monto_pagado': '1.00',
+    }, None)
+
+
+def _autorizar_pago(datos, rng, n):
+    cliente = rng.choice(datos.clientes)
+    return Peticion('post', '/api/autorizar_pago/', {
+        'numero_transaccion': f"RA-{n}", 'numero_tarjeta': cliente['numero'], 'cvc_tarjeta': cliente['cvv'],
+        'fecha_vencimiento_tarjeta': cliente['vencimiento'], 'codigo_banco_comercio_receptor': BANCO_ALIADO,
+        'numero_cuenta_comercio_receptor': f"{BANCO_ALIADO}{rng.randrange(10 ** 16):016d}", 'monto_pagado': '1.00',
+    }, None)
+
+
+ENDPOINTS = {
+    'registro': _registro,
+    'login': _login,
+    'dashboard': _dashboard,
+    'historial': _historial,
+    'pago_comercio': _pago_comercio,
+    'autorizar_pago': _autorizar_pago,
+}
+
+
+def enviar(cliente, peticion):
+    extra = {'HTTP_AUTHORIZATION': f"Bearer {peticion.token}"} if peticion.token else {}
+    if peticion.metodo == 'get':
+        return cliente.get(peticion.ruta, **extra)
+    return cliente.post(peticion.ruta, peticion.cuerpo, content_type='application/json', **extra)
+
+
+# --- MEDICIÓN ---
+
+_endpoint = contextvars.ContextVar('rendimiento_endpoint', default=None)
+
+
+class ContadorConsultas:
+    """
+    Cuenta las consultas de cada endpoint en todas las conexiones, incluidas las
+    de los hilos de la pasarela (asincronia.en_hilo_bd copia el contexto).
+    """
+
+    def __init__(self):
+        self.consultas = Counter()
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        nombre = _endpoint.get()
+        if nombre is not None:
+            with self._lock:
+                self.consultas[nombre] += 1
+        return execute(sql, params, many, context)
+
+    def instalar(self, sender=None, connection=None, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    def instalar_en_pool(self):
+        """
+        Las conexiones que los hilos del pool abrieron antes de medir no emiten
+        connection_created: se instala en cada hilo (la barrera obliga a que cada
+        tarea ocupe un hilo distinto).
+        """
+        hilos = _pool_bd._max_workers
+        barrera = threading.Barrier(hilos)
+
+        def instalar_en_hilo(_):
+            barrera.wait(timeout=30)
+            self.instalar(connection=connection)
+
+        list(_pool_bd.map(instalar_en_hilo, range(hilos)))
+
+
+def _percentiles(latencias):
+    """ p50, p95, p99 (interpolados) de una lista de latencias. """
+    if len(latencias) == 1:
+        return latencias * 3
+    cortes = statistics.quantiles(latencias, n=100, method='inclusive')
+    return cortes[49], cortes[94], cortes[98]
+
+
+def medir(nombre, peticiones, concurrencia, contador):
+    """ Envía `peticiones` con `concurrencia` clientes virtuales. Devuelve el resumen del endpoint. """
+    resultados = [None] * len(peticiones)
+    siguiente = iter(range(len(peticiones)))
+    lock = threading.Lock()
+
+    def cliente_virtual():
+        cliente = Client()
+        _endpoint.set(nombre)
+        try:
+            while True:
+                with lock:
+                    indice = next(siguiente, None)
+                if indice is None:
+                    return
+                inicio = time.perf_counter()
+                respuesta = enviar(cliente, peticiones[indice])
+                resultados[indice] = (respuesta.status_code, (time.perf_counter() - inicio) * 1000)
+        finally:
+            connections.close_all()
+
+    inicio = time.perf_counter()
+    hilos = [threading.Thread(target=cliente_virtual, name=f"rendimiento-{i}") for i in range(concurrencia)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    duracion = time.perf_counter() - inicio
+
+    latencias = sorted(ms for _, ms in resultados)
+    p50, p95, p99 = _percentiles(latencias)
+    estados = Counter(str(codigo) for codigo, _ in resultados)
+    return {
+        'peticiones': len(resultados),
+        'errores': sum(n for codigo, n in estados.items() if not codigo.startswith('2')),
+        'estados': dict(sorted(estados.items())),
+        'duracion_s': round(duracion, 3),
+        'rendimiento_rps': round(len(resultados) / duracion, 1),
+        'latencia_ms': {
+            'p50': round(p50, 2), 'p95': round(p95, 2), 'p99': round(p99, 2),
+            'media': round(statistics.fmean(latencias), 2), 'max': round(latencias[-1], 2),
+        },
+        'consultas': {
+            'total': contador.consultas[nombre],
+            'por_peticion': round(contador.consultas[nombre] / len(resultados), 2),
+        },
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ejecutar(endpoints=None, clientes=100, comercios=10, historial=2, peticiones=200, concurrencia=8,
+             semilla=1, limites=False, procesos=None):
+    """
+    Siembra, calienta con el historial y mide cada endpoint sobre la BD de
+    `connection` (el comando la crea vacía). Devuelve el informe.
+    """
+    endpoints = endpoints or list(ENDPOINTS)
+    caches_prefijadas = {alias: {**conf, 'KEY_PREFIX': PREFIJO_CACHE} for alias, conf in settings.CACHES.items()}
+    ajustes = {'CACHES': caches_prefijadas}
+    if not limites:
+        ajustes['LIMITE_TASA'] = {**settings.LIMITE_TASA, 'ACTIVO': False}
+        ajustes['VELOCIDAD'] = {**settings.VELOCIDAD, 'ACTIVA': False}
+
+    contador = ContadorConsultas()
+    connection_created.connect(contador.instalar) # Los clientes virtuales abren sus conexiones después
+    contador.instalar_en_pool()
+    try:
+        with override_settings(**ajustes):
+            inicio = time.perf_counter()
+            datos = sembrar(clientes, comercios, procesos)
+            rng = random.Random(f"{semilla}:historial")
+            previos = [_pago_comercio(datos, rng, n, prefijo='RH') for n in range(historial * len(datos.clientes))]
+            if previos:
+                medir('siembra', previos, concurrencia, contador)
+            siembra_s = time.perf_counter() - inicio
+
+            resultados = {}
+            for nombre in endpoints:
+                rng = random.Random(f"{semilla}:{nombre}")
+                lote = [ENDPOINTS[nombre](datos, rng, n) for n in range(peticiones)]
+                resultados[nombre] = medir(nombre, lote, concurrencia, contador)
+    finally:
+        connection_created.disconnect(contador.instalar)
+
+    return {
+        'fecha': timezone.now().isoformat(),
+        'commit': _commit(),
+        'bd': connection.vendor,
+        'debug': settings.DEBUG,
+        'parametros': {
+            'clientes': clientes, 'comercios': comercios, 'historial': historial, 'peticiones': peticiones,
+            'concurrencia': concurrencia, 'semilla': semilla, 'limites': limites,
+        },
+        'siembra_s': round(siembra_s, 1),
+        'endpoints': resultados,
+    }
+
+
+def comparar(anterior, actual):
+    """ Filas (endpoint, rps antes, rps ahora, p95 antes, p95 ahora) de los endpoints de ambos informes. """
+    filas = []
+    for nombre, ahora in actual['endpoints'].items():
+        antes = anterior['endpoints'].get(nombre)
+        if antes is not None:
+            filas.append((
+                nombre, antes['rendimiento_rps'], ahora['rendimiento_rps'],
+                antes['latencia_ms']['p95'], ahora['latencia_ms']['p95'],
+            ))
+    return filas
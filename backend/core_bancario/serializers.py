@@ -1,7 +1,10 @@
 # backend/core_bancario/serializers.py
 
+from datetime import timedelta
+
+from django.conf import settings
 from rest_framework import serializers
-from .models import Cliente, Cuenta, Tarjeta, Transaccion
+from .models import Cliente, Cuenta, Tarjeta, Transaccion, VolumenTransacciones
 from django.contrib.auth.models import User
 from django.db import transaction
 from .models import Comercio
@@ -29,7 +32,8 @@ class TarjetaSerializer(serializers.ModelSerializer):
 class TransaccionSerializer(serializers.Serializer):
     """
     Serializador para mostrar transacciones al cliente.
-    Determina si la transacción es un crédito o un débito desde la perspectiva del usuario.
+    Recibe las filas planas de historial.pagina_historial, que ya traen la dirección
+    (crédito o débito desde la perspectiva del usuario) y la contraparte: no consulta la BD.
     """
     # Campos directos del modelo
     id = serializers.IntegerField(read_only=True)
@@ -39,7 +43,7 @@ class TransaccionSerializer(serializers.Serializer):
     estado = serializers.CharField(read_only=True)
 
     # Campos personalizados para mejorar la experiencia en el frontend
-    direccion = serializers.SerializerMethodField()
+    direccion = serializers.CharField(read_only=True) # 'ENTRANTE', 'SALIENTE' o 'DESCONOCIDO'
     descripcion = serializers.SerializerMethodField()
     detalle_contraparte = serializers.SerializerMethodField()
     
@@ -47,51 +51,92 @@ class TransaccionSerializer(serializers.Serializer):
         model = Transaccion
         fields = ['id', 'tipo', 'monto', 'fecha', 'estado', 'direccion', 'descripcion', 'detalle_contraparte']
 
-    def get_direccion(self, obj):
-        """ Determina si la transacción es 'ENTRANTE' o 'SALIENTE' para el usuario. """
-        user = self.context['request'].user
-        if obj.cuenta_destino and obj.cuenta_destino.cliente.user == user:
-            return 'ENTRANTE'
-        if obj.cuenta_origen and obj.cuenta_origen.cliente.user == user:
-            return 'SALIENTE'
-        return 'DESCONOCIDO'
-
     def get_descripcion(self, obj):
         """ Genera una descripción legible para la transacción. """
-        if obj.tipo == 'PAGO_COMERCIO':
+        if obj['tipo'] == 'PAGO_COMERCIO':
             return f"Pago en comercio"
-        if obj.tipo == 'TRANSFERENCIA':
+        if obj['tipo'] == 'TRANSFERENCIA':
             # Asumiendo que las transferencias siempre tienen origen y destino
-            if self.get_direccion(obj) == 'ENTRANTE':
+            if obj['direccion'] == 'ENTRANTE':
                 return f"Transferencia recibida"
             else:
                 return f"Transferencia enviada"
-        if obj.tipo == 'PAGO_INTERBANCARIO':
+        if obj['tipo'] == 'PAGO_INTERBANCARIO':
             return f"Pago interbancario a comercio"
-        if obj.mensaje_error == 'Bono de Bienvenida':
+        if obj['mensaje_error'] == 'Bono de Bienvenida':
              return "Bono de Bienvenida"
         return "Movimiento genérico"
 
     def get_detalle_contraparte(self, obj):
         """ Obtiene el origen o destino exacto de la transacción para mostrarlo al usuario """
-        direccion = self.get_direccion(obj)
+        direccion = obj['direccion']
         if direccion == 'ENTRANTE':
-            if obj.cuenta_origen:
-                if hasattr(obj.cuenta_origen, 'perfil_comercio'):
-                    return f"De: {obj.cuenta_origen.perfil_comercio.nombre}"
-                return f"De: Cta. {obj.cuenta_origen.numero_cuenta[-6:]}"
+            if obj['contraparte_cuenta']:
+                if obj['contraparte_comercio']:
+                    return f"De: {obj['contraparte_comercio']}"
+                return f"De: Cta. {obj['contraparte_cuenta']}"
             return "Ingreso / Abono"
         elif direccion == 'SALIENTE':
-            if obj.cuenta_destino:
-                if hasattr(obj.cuenta_destino, 'perfil_comercio'):
-                    return f"Pagado a: {obj.cuenta_destino.perfil_comercio.nombre}"
-                return f"Transferido a: Cta. {obj.cuenta_destino.numero_cuenta[-6:]}"
+            if obj['contraparte_cuenta']:
+                if obj['contraparte_comercio']:
+                    return f"Pagado a: {obj['contraparte_comercio']}"
+                return f"Transferido a: Cta. {obj['contraparte_cuenta']}"
             # Si es un pago hacia otro banco (donde no tenemos el nombre en BD local)
-            if obj.mensaje_error and "comercio" in obj.mensaje_error.lower():
-                return f"Pagado a: {obj.mensaje_error.replace('Aprobado para comercio:', '').strip()}"
+            mensaje_error = obj['mensaje_error']
+            if mensaje_error and "comercio" in mensaje_error.lower():
+                return f"Pagado a: {mensaje_error.replace('Aprobado para comercio:', '').strip()}"
             return "Pago Externo (Interbancario)"
         return "-"
 
+class HistorialFiltroSerializer(serializers.Serializer):
+    """ Parámetros de consulta del historial paginado (ver historial.py). """
+    desde = serializers.DateField(required=False)
+    hasta = serializers.DateField(required=False)
+    tipo = serializers.ChoiceField(choices=Transaccion.TIPO_CHOICES, required=False)
+    estado = serializers.ChoiceField(choices=Transaccion.ESTADO_CHOICES, required=False)
+    limite = serializers.IntegerField(required=False, min_value=1, max_value=settings.HISTORIAL_PAGINA_MAXIMA)
+    cursor = serializers.CharField(required=False)
+
+    def validate(self, attrs):
+        if attrs.get('desde') and attrs.get('hasta') and attrs['desde'] > attrs['hasta']:
+            raise serializers.ValidationError("'desde' no puede ser posterior a 'hasta'.")
+        return attrs
+
+class ClientesFiltroSerializer(serializers.Serializer):
+    """ Parámetros del listado de clientes del panel de administración. """
+    q = serializers.CharField(required=False, allow_blank=True, max_length=100)
+    limite = serializers.IntegerField(required=False, min_value=1, max_value=settings.ADMIN_CLIENTES_PAGINA_MAXIMA)
+    cursor = serializers.IntegerField(required=False, min_value=1) # id del último cliente de la página anterior
+
+class VolumenFiltroSerializer(serializers.Serializer):
+    """ Parámetros de la consulta de volumen de transacciones (ver volumen.py). """
+    granularidad = serializers.ChoiceField(choices=VolumenTransacciones.GRANULARIDAD_CHOICES, default='HORA')
+    desde = serializers.DateTimeField()
+    hasta = serializers.DateTimeField()
+    tipo = serializers.ChoiceField(choices=Transaccion.TIPO_CHOICES, required=False)
+    estado = serializers.ChoiceField(choices=Transaccion.ESTADO_CHOICES, required=False)
+    banco_emisor_id = serializers.CharField(required=False, max_length=10)
+
+    def validate(self, attrs):
+        if attrs['desde'] >= attrs['hasta']:
+            raise serializers.ValidationError("'desde' debe ser anterior a 'hasta'.")
+        horas = settings.VOLUMEN['HORAS_MAXIMAS'][attrs['granularidad']]
+        if attrs['hasta'] - attrs['desde'] > timedelta(hours=horas):
+            raise serializers.ValidationError(f"El rango máximo por {attrs['granularidad'].lower()} es de {horas} horas.")
+        return attrs
+
+class EstadoCuentaFiltroSerializer(serializers.Serializer):
+    """ Parámetros de la exportación del estado de cuenta (ver estado_cuenta.py). """
+    cuenta = serializers.CharField(required=False) # numero_cuenta; por defecto la primera cuenta del cliente
+    desde = serializers.DateField(required=False)
+    hasta = serializers.DateField(required=False)
+    formato = serializers.ChoiceField(choices=('csv', 'ndjson'), default='csv')
+
+    def validate(self, attrs):
+        if attrs.get('desde') and attrs.get('hasta') and attrs['desde'] > attrs['hasta']:
+            raise serializers.ValidationError("'desde' no puede ser posterior a 'hasta'.")
+        return attrs
+
 class CuentaSerializer(serializers.ModelSerializer):
     tarjetas = TarjetaSerializer(many=True, read_only=True)
     
@@ -158,28 +203,32 @@ class RegistroClienteSerializer(serializers.Serializer):
     def validate(self, data):
         tipo = data.get('tipo_persona')
         if tipo == 'NATURAL':
-            cedula = data.get('cedula')
-            if not cedula:
+            if not data.get('cedula'):
                 raise serializers.ValidationError({"cedula": "La cédula es obligatoria para personas naturales."})
-            if Cliente.objects.filter(cedula=cedula).exists():
-                raise serializers.ValidationError({"cedula": "Esta cédula ya está registrada."})
         elif tipo == 'JURIDICO':
-            rif = data.get('rif')
-            if not rif:
+            if not data.get('rif'):
                 raise serializers.ValidationError({"rif": "El RIF es obligatorio para personas jurídicas."})
-            if Cliente.objects.filter(rif=rif).exists():
-                raise serializers.ValidationError({"rif": "Este RIF Jurídico ya está registrado."})
+        self.validar_unicidad(data)
         return data
 
+    def validar_unicidad(self, data):
+        if data.get('tipo_persona') == 'NATURAL':
+            if Cliente.objects.filter(cedula=data['cedula']).exists():
+                raise serializers.ValidationError({"cedula": "Esta cédula ya está registrada."})
+        elif Cliente.objects.filter(rif=data['rif']).exists():
+            raise serializers.ValidationError({"rif": "Este RIF Jurídico ya está registrado."})
+
+    @staticmethod
+    def rif_final(validated_data):
+        """ RIF con el que se registra el cliente (auto-generado para personas naturales sin RIF). """
+        if validated_data.get('tipo_persona', 'NATURAL') == 'NATURAL':
+            return validated_data.get('rif') or f"V-{validated_data['cedula']}"
+        return validated_data['rif']
+
     def create(self, validated_data):
         with transaction.atomic():
             tipo = validated_data.get('tipo_persona', 'NATURAL')
-
-            # Auto-generar RIF Natural si no viene
-            if tipo == 'NATURAL':
-                rif_final = validated_data.get('rif') or f"V-{validated_data['cedula']}"
-            else: # JURIDICO
-                rif_final = validated_data['rif']
+            rif_final = self.rif_final(validated_data)
 
             # 1. Crear Usuario (Login)
             user = User.objects.create_user(
@@ -227,6 +276,18 @@ class RegistroClienteSerializer(serializers.Serializer):
                 "tarjeta": tarjeta
             }
 
+class ImportacionClienteSerializer(RegistroClienteSerializer):
+    """
+    Valida una fila de la carga masiva (ver importacion.py) sin consultar la BD:
+    la unicidad de usuario, cédula y RIF se verifica por bloque, con conjuntos.
+    """
+
+    def validate_username(self, value):
+        return value
+
+    def validar_unicidad(self, data):
+        pass
+
 # Serializador para el CASO 2: Banco Adquiriente -> Banco Emisor (Nosotros)
 class AutorizacionBancoSerializer(serializers.Serializer):
     numero_transaccion = serializers.CharField()
@@ -0,0 +1,102 @@
+# backend/core_bancario/signals.py
+
+"""
+Señales del modelo usadas para invalidar las cachés (comercios, enrutamiento,
+identidades JWT, parámetros y dashboard del cliente), para mantener las estadísticas del panel y para asentar en el libro mayor los saldos con los que nace una cuenta o tarjeta.
+Se registran en CoreBancarioConfig.ready().
+"""
+
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import cache_dashboard, estadisticas, parametros
+from .cache_comercios import invalidar_comercio
+from .enrutamiento import invalidar_tabla
+from .identidad import invalidar_identidad
+from .libro import asiento_apertura
+from .models import Cliente, Comercio, ConfiguracionGlobal, Cuenta, Directorio, Tarjeta
+
+
+@receiver([post_save, post_delete], sender=Comercio)
+def invalidar_cache_comercio(sender, instance, **kwargs):
+    invalidar_comercio(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Directorio)
+def invalidar_tabla_enrutamiento(sender, instance, **kwargs):
+    invalidar_tabla()
+
+
+@receiver([post_save, post_delete], sender=ConfiguracionGlobal)
+def invalidar_parametros(sender, instance, **kwargs):
+    parametros.invalidar()
+
+
+@receiver(post_save, sender=Cuenta)
+def apertura_cuenta(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        asiento_apertura(cuentas=[(instance.pk, instance.saldo)])
+
+
+@receiver(post_save, sender=Tarjeta)
+def apertura_tarjeta(sender, instance, created, raw=False, **kwargs):
+    # La línea de crédito inicial (saldo_disponible) entra al libro contra SISTEMA:APERTURA
+    if created and not raw:
+        asiento_apertura(tarjetas=[(instance.pk, instance.saldo_disponible)])
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidar_dashboard_usuario(sender, instance, **kwargs):
+    cache_dashboard.descartar(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Cliente)
+def invalidar_dashboard_cliente(sender, instance, **kwargs):
+    cache_dashboard.invalidar(clientes=[instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Cuenta)
+def invalidar_dashboard_cuenta(sender, instance, **kwargs):
+    cache_dashboard.invalidar(cuentas=[instance.pk], clientes=[instance.cliente_id])
+
+
+@receiver([post_save, post_delete], sender=Tarjeta)
+def invalidar_dashboard_tarjeta(sender, instance, **kwargs):
+    cache_dashboard.invalidar(cuentas=[instance.cuenta_id])
+
+
+@receiver(post_save, sender=Cliente)
+def contar_cliente_nuevo(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        estadisticas.sumar(estadisticas.CLIENTES, 1)
+
+
+@receiver(post_delete, sender=Cliente)
+def descontar_cliente(sender, instance, **kwargs):
+    estadisticas.sumar(estadisticas.CLIENTES, -1)
+
+
+@receiver([post_save, post_delete], sender=Directorio)
+def contar_directorio(sender, instance, **kwargs):
+    estadisticas.contar_directorio()
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidar_identidad_usuario(sender, instance, **kwargs):
+    # Desactivación, cambio de permisos o baja: la siguiente petición vuelve a leer el usuario
+    invalidar_identidad(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Cliente)
+def invalidar_identidad_cliente(sender, instance, created=False, **kwargs):
+    if created or kwargs['signal'] is post_delete:
+        invalidar_identidad(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=Cuenta)
+def invalidar_identidad_cuenta(sender, instance, created=False, **kwargs):
+    if created or kwargs['signal'] is post_delete:
+        user_id = Cliente.objects.filter(pk=instance.cliente_id).values_list('user_id', flat=True).first()
+        if user_id is not None:
+            invalidar_identidad(user_id)
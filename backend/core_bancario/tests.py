@@ -1,3 +1,982 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import F, ProtectedError, Sum
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+import httpx
+from rest_framework.response import Response
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import estadisticas, limite_tasa, numeracion, outbox, rendimiento, velocidad, volumen
+from .abonos import consolidar_cuenta, consolidar_cuentas, consolidar_pendientes, registrar_abono, registrar_abonos
+from .autorizacion import AutorizacionRechazada, PagoLote, autorizar_debito_tarjeta, autorizar_lote_on_us, debitar_tarjeta
+from .cache_comercios import CacheComercios, desactivar_comercios
+from .ciclos_tarjeta import cerrar_rango
+from .conectores import CircuitoBanco, ConectorBanco, ConfigConector
+from .enrutamiento import formas_codigo, invalidar_tabla, obtener_tabla
+from .identidad import obtener_identidad
+from .libro import SISTEMA_BONOS, AsientoDescuadrado, asentar, pierna_cuenta, pierna_externa, verificar_libro
+from .idempotencia import ejecutar_idempotente, ejecutar_idempotente_async, reservar
+from .middleware import LimiteTasaMiddleware
+from .models import (
+    AbonoPendiente, AjusteEstadistica, ClaveIdempotencia, Cliente, Comercio, Cuenta, Directorio, EstadisticaBanco,
+    EstadoCuentaTarjeta, MarcaProceso, MensajeSaliente, Partida, ReclasificacionVolumen, Tarjeta, Transaccion,
+    VolumenTransacciones,
+)
+
+
+class HistorialConsultasTest(TestCase):
+    """ El historial se serializa con un número fijo de consultas, sin importar el tamaño de la página. """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cliente', password='x')
+        cliente = Cliente.objects.create(user=cls.user, cedula='1', rif='V-1', telefono='0')
+        cuenta = Cuenta.objects.create(cliente=cliente)
+        otro = Cliente.objects.create(
+            user=User.objects.create_user(username='tienda', password='x'),
+            rif='J-2', telefono='0', tipo_persona='JURIDICO'
+        )
+        cuenta_tienda = Cuenta.objects.create(cliente=otro)
+        Comercio.objects.create(codigo_identificador='J-2', nombre='Tienda', cuenta=cuenta_tienda)
+        comunes = dict(monto=Decimal('1.00'), estado='APROBADO', codigo_respuesta='00', banco_emisor_id='0001')
+        for i in range(30):
+            if i % 2:
+                Transaccion.objects.create(tipo='PAGO_COMERCIO', cuenta_origen=cuenta, cuenta_destino=cuenta_tienda, **comunes)
+            else:
+                Transaccion.objects.create(tipo='TRANSFERENCIA', cuenta_origen=cuenta_tienda, cuenta_destino=cuenta, **comunes)
+
+    def setUp(self):
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.defaults['HTTP_AUTHORIZATION'] = f"Bearer {token}"
+
+    def consultas(self, limite):
+        with CaptureQueriesContext(connection) as contexto:
+            respuesta = self.client.get('/api/transacciones/', {'limite': limite})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.json()['resultados']), limite)
+        return len(contexto.captured_queries), respuesta.json()['resultados']
+
+    def test_consultas_fijas_por_pagina(self):
+        self.client.get('/api/transacciones/') # Resuelve la identidad JWT y la deja en caché
+        pocas, _ = self.consultas(1)
+        muchas, filas = self.consultas(25)
+        self.assertEqual(pocas, muchas)
+        # Solo la página (una consulta, o una por pierna sin UNION con LIMIT): usuario y cuentas vienen de la identidad
+        piernas = 1 if connection.features.supports_slicing_ordering_in_compound else 2
+        self.assertEqual(muchas, piernas)
+
+        salientes = [fila for fila in filas if fila['direccion'] == 'SALIENTE']
+        entrantes = [fila for fila in filas if fila['direccion'] == 'ENTRANTE']
+        self.assertTrue(salientes and entrantes)
+        self.assertTrue(all(fila['detalle_contraparte'] == 'Pagado a: Tienda' for fila in salientes))
+        self.assertTrue(all(fila['detalle_contraparte'] == 'De: Tienda' for fila in entrantes))
+
+
+class IdentidadJWTTest(TestCase):
+    """ El usuario del token se resuelve una vez y se descarta al cambiar sus permisos, estado o cuentas. """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='cliente', password='x')
+        self.cliente = Cliente.objects.create(user=self.user, cedula='1', rif='V-1', telefono='0')
+        self.cuenta = Cuenta.objects.create(cliente=self.cliente)
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.defaults['HTTP_AUTHORIZATION'] = f"Bearer {token}"
+
+    def test_identidad_en_cache(self):
+        identidad = obtener_identidad(self.user.pk)
+        self.assertEqual((identidad.cliente_id, identidad.cuenta_ids), (self.cliente.pk, (self.cuenta.pk,)))
+        with CaptureQueriesContext(connection) as contexto:
+            self.assertIs(obtener_identidad(self.user.pk), identidad)
+        self.assertEqual(len(contexto.captured_queries), 0)
+
+    def test_cambios_invalidan(self):
+        otra = Cuenta.objects.create(cliente=self.cliente)
+        self.assertEqual(obtener_identidad(self.user.pk).cuenta_ids, (self.cuenta.pk, otra.pk))
+
+        self.assertEqual(self.client.get('/api/admin-panel/clientes/').status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get('/api/admin-panel/clientes/').status_code, 200)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/transacciones/').status_code, 401)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class RendimientoTest(TransactionTestCase):
+    """ El banco de pruebas siembra, recorre todos los endpoints sin errores e informa sus consultas. """
+
+    def test_informe(self):
+        informe = rendimiento.ejecutar(clientes=3, comercios=1, historial=1, peticiones=3, concurrencia=1, procesos=1)
+        self.assertEqual(list(informe['endpoints']), list(rendimiento.ENDPOINTS))
+        for nombre, datos in informe['endpoints'].items():
+            self.assertEqual((datos['peticiones'], datos['errores']), (3, 0), (nombre, datos['estados']))
+            self.assertGreater(datos['consultas']['por_peticion'], 0, nombre)
+            self.assertLessEqual(datos['latencia_ms']['p50'], datos['latencia_ms']['p99'])
+        self.assertEqual(Transaccion.objects.filter(referencia_externa__startswith='RH-').count(), 3)
+
+
+class CircuitoSemiabiertoTest(SimpleTestCase):
+    """ Una prueba en SEMIABIERTO cancelada libera su cupo: el circuito puede volver a cerrar. """
+
+    def test_prueba_cancelada(self):
+        circuito = CircuitoBanco(
+            ventana=10, minimo_llamadas=1, tasa_error=0.5, latencia_lenta_ms=1000, tasa_lentas=1,
+            segundos_abierto=0, pruebas_semiabierto=1,
+        )
+        circuito.registrar(0, fallo=True) # Abre el circuito; con segundos_abierto=0 pasa a SEMIABIERTO al consultar
+        conector = ConectorBanco('0002', ConfigConector('https://banco.test/', 'NONE', '', 1, 1, 1), circuito)
+        cliente = mock.Mock(post=mock.AsyncMock(side_effect=asyncio.CancelledError))
+        with mock.patch.object(conector, '_cliente_async', return_value=cliente):
+            with self.assertRaises(asyncio.CancelledError):
+                asyncio.run(conector.autorizar_async({}))
+        self.assertEqual(circuito.estado, CircuitoBanco.SEMIABIERTO)
+        self.assertTrue(circuito.permitir()) # La prueba cancelada no ocupa el único cupo
+        circuito.registrar(10, fallo=False)
+        self.assertEqual(circuito.estado, CircuitoBanco.CERRADO)
+
+
+class CierreConectorTest(SimpleTestCase):
+    """ Al reemplazar un conector se cierran sus clientes httpx: los libres enseguida, los ocupados al terminar. """
+
+    def conector(self):
+        circuito = CircuitoBanco(
+            ventana=10, minimo_llamadas=10, tasa_error=1, latencia_lenta_ms=1000, tasa_lentas=1,
+            segundos_abierto=1, pruebas_semiabierto=1,
+        )
+        return ConectorBanco('0002', ConfigConector('https://banco.test/', 'NONE', '', 2, 1, 1), circuito)
+
+    def test_cierra_clientes_async(self):
+        async def escenario():
+            liberar = asyncio.Event()
+
+            async def responder(peticion):
+                await liberar.wait()
+                return httpx.Response(200, json={"ok": True})
+
+            cliente_real = httpx.AsyncClient
+            with mock.patch.object(httpx, 'AsyncClient', lambda **opciones: cliente_real(transport=httpx.MockTransport(responder), **opciones)):
+                libre = self.conector()
+                cliente_libre = libre._cliente_async()
+                libre.cerrar()
+                await asyncio.sleep(0.01) # aclose() agendado en este mismo loop
+                self.assertTrue(cliente_libre.is_closed)
+
+                ocupado = self.conector()
+                pago = asyncio.ensure_future(ocupado.autorizar_async({}))
+                await asyncio.sleep(0.01)
+                cliente_ocupado = ocupado._clientes_async[asyncio.get_running_loop()]
+                ocupado.cerrar()
+                self.assertFalse(cliente_ocupado.is_closed) # La petición en curso termina normalmente
+                liberar.set()
+                self.assertEqual((await pago).status_code, 200)
+                self.assertTrue(cliente_ocupado.is_closed)
+                self.assertEqual(len(ocupado._clientes_async), 0)
+
+        asyncio.run(escenario())
+
+    def test_loop_terminado(self):
+        async def crear():
+            return conector._cliente_async()
+
+        conector = self.conector()
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(crear())
+        loop.close()
+        conector.cerrar() # Sin loop donde agendar aclose(): el cliente solo se suelta
+        self.assertNotIn(loop, conector._clientes_async)
+
+
+class IdempotenciaAsyncTest(TransactionTestCase):
+    """ Si el cliente se desconecta a mitad del pago, la respuesta real igual queda guardada en la clave. """
+
+    def test_cancelacion(self):
+        async def escenario():
+            empezo, seguir = asyncio.Event(), asyncio.Event()
+
+            async def operacion():
+                empezo.set()
+                await seguir.wait()
+                return Response({"estado": "APROBADO"}, status=201)
+
+            peticion = asyncio.ensure_future(ejecutar_idempotente_async('PRUEBA', 'K1', operacion))
+            await empezo.wait()
+            peticion.cancel() # Desconexión del cliente
+            with self.assertRaises(asyncio.CancelledError):
+                await peticion
+            seguir.set()
+            while len(asyncio.all_tasks()) > 1: # Espera a que la operación protegida termine
+                await asyncio.sleep(0.01)
+
+        asyncio.run(escenario())
+        registro = ClaveIdempotencia.objects.get(alcance='PRUEBA', clave='K1')
+        self.assertEqual((registro.estado, registro.codigo_http), ('COMPLETADA', 201))
+
+
+class AperturaLibroTest(TransactionTestCase):
+    """ La migración del libro conserva la deuda que las tarjetas ya tenían: el primer estado de cuenta la cobra. """
+
+    def test_deuda_previa(self):
+        hoy = timezone.localdate()
+        executor = MigrationExecutor(connection)
+        executor.migrate([('core_bancario', '0012_abonopendiente')])
+        apps = executor.loader.project_state([('core_bancario', '0012_abonopendiente')]).apps
+        usuario = apps.get_model('auth', 'User').objects.create(username='previo')
+        cliente = apps.get_model('core_bancario', 'Cliente').objects.create(user=usuario, cedula='9', rif='V-9', telefono='0')
+        cuenta = apps.get_model('core_bancario', 'Cuenta').objects.create(cliente=cliente, numero_cuenta='00010000000000000009')
+        tarjeta = apps.get_model('core_bancario', 'Tarjeta').objects.create(
+            cuenta=cuenta, numero='5000010000000009', cvv='123', fecha_vencimiento='12/30',
+            saldo_disponible=Decimal('7500.00'), limite_credito=Decimal('10000.00'), dia_corte=hoy.day, dia_pago=hoy.day,
+        )
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+        cerrar_rango(hoy, hoy.day, tarjeta.pk, tarjeta.pk)
+        estado = EstadoCuentaTarjeta.objects.get(tarjeta_id=tarjeta.pk)
+        self.assertEqual(estado.saldo_total, Decimal('2500.00'))
+        self.assertGreater(estado.pago_minimo, 0)
+        self.assertEqual(verificar_libro(), {"asientos_descuadrados": [], "cuentas": [], "tarjetas": []})
+
+
+class EstadisticasTest(TestCase):
+    """ Los pagos solo insertan ajustes de estadísticas; consolidar_estadisticas los suma a una fila por clave. """
+
+    def test_ajustes_fuera_del_pago(self):
+        cliente = Cliente.objects.create(user=User.objects.create_user(username='liquidez', password='x'), cedula='3', rif='V-3', telefono='0')
+        cuenta = Cuenta.objects.create(cliente=cliente)
+        estadisticas.consolidar()
+        antes = estadisticas.leer().get(estadisticas.LIQUIDEZ, 0)
+        transaccion = Transaccion.objects.create(tipo='TRANSFERENCIA', monto=Decimal('50.00'), cuenta_destino=cuenta, estado='APROBADO')
+
+        with CaptureQueriesContext(connection) as contexto:
+            asentar(transaccion.pk, pierna_cuenta(cuenta.pk, Decimal('50.00')), pierna_externa(SISTEMA_BONOS, Decimal('-50.00')))
+        self.assertFalse([q for q in contexto.captured_queries if EstadisticaBanco._meta.db_table in q['sql']])
+        self.assertEqual(estadisticas.leer()[estadisticas.LIQUIDEZ], antes + 50)
+
+        self.assertEqual(estadisticas.consolidar(), 1)
+        self.assertFalse(AjusteEstadistica.objects.exists())
+        self.assertEqual(estadisticas.leer()[estadisticas.LIQUIDEZ], antes + 50)
+        self.assertEqual(estadisticas.recalcular()[estadisticas.LIQUIDEZ], antes + 50)
+
+    def test_comando_consolidar(self):
+        estadisticas.recalcular()
+        estadisticas.sumar(estadisticas.CLIENTES, 2)
+        estadisticas.sumar(estadisticas.CLIENTES, -1)
+        esperado = estadisticas.leer()
+        salida = StringIO()
+        call_command('consolidar_estadisticas', stdout=salida)
+        self.assertIn('consolidados: 2', salida.getvalue())
+        self.assertFalse(AjusteEstadistica.objects.exists())
+        self.assertEqual(EstadisticaBanco.objects.filter(clave=estadisticas.CLIENTES).count(), 1)
+        self.assertEqual(estadisticas.leer(), esperado)
+
+
+class EstadisticaFragmentosTest(TransactionTestCase):
+    """ La migración que quita los fragmentos suma las filas de cada clave en una sola. """
+
+    def test_unir_fragmentos(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate([('core_bancario', '0023_partidas_protegidas')])
+        apps = executor.loader.project_state([('core_bancario', '0023_partidas_protegidas')]).apps
+        modelo = apps.get_model('core_bancario', 'EstadisticaBanco')
+        modelo.objects.all().delete()
+        modelo.objects.bulk_create([
+            modelo(clave='LIQUIDEZ', fragmento=0, valor=Decimal('10.00')),
+            modelo(clave='LIQUIDEZ', fragmento=3, valor=Decimal('2.50')),
+            modelo(clave='CLIENTES', fragmento=1, valor=Decimal('4')),
+        ])
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+        self.assertEqual(
+            dict(EstadisticaBanco.objects.values_list('clave', 'valor')), {'LIQUIDEZ': Decimal('12.50'), 'CLIENTES': Decimal('4')}
+        )
+
+
+class VolumenTest(TestCase):
+    """ El agregado de volumen no pierde transacciones confirmadas tarde ni cuenta dos veces un cierre. """
+
+    def pago(self, estado='APROBADO', codigo='201', **extra):
+        return Transaccion.objects.create(
+            tipo='PAGO_COMERCIO', monto=Decimal('10.00'), estado=estado, codigo_respuesta=codigo, banco_emisor_id='0002', **extra
+        )
+
+    def cerrar(self, transaccion, estado, codigo):
+        with CaptureQueriesContext(connection) as contexto:
+            volumen.reclasificar(transaccion.pk, estado, codigo)
+        self.assertFalse([q for q in contexto.captured_queries if MarcaProceso._meta.db_table in q['sql']])
+        Transaccion.objects.filter(pk=transaccion.pk).update(estado=estado, codigo_respuesta=codigo)
+
+    def horas(self):
+        return {
+            (fila.estado, fila.codigo_respuesta): (fila.cantidad, fila.monto_total)
+            for fila in VolumenTransacciones.objects.filter(granularidad='HORA') if fila.cantidad
+        }
+
+    def test_hueco_confirmado_tarde(self):
+        self.pago()
+        tardia = self.pago().pk
+        self.pago()
+        Transaccion.objects.filter(pk=tardia).delete() # Su id ya se tomó, pero aún no hizo COMMIT
+        self.assertEqual(volumen.acumular(), 2)
+        self.assertEqual(list(MarcaProceso.objects.get(nombre=volumen.MARCA).huecos), [str(tardia)])
+
+        self.pago(pk=tardia) # COMMIT
+        self.assertEqual(volumen.acumular(), 1)
+        self.assertEqual(self.horas(), {('APROBADO', '201'): (3, Decimal('30.00'))})
+        self.assertEqual(MarcaProceso.objects.get(nombre=volumen.MARCA).huecos, {})
+
+    def test_hueco_vencido(self):
+        self.pago()
+        self.pago().delete() # ROLLBACK
+        self.pago()
+        volumen.acumular()
+        with override_settings(VOLUMEN={**settings.VOLUMEN, 'HUECO_MAX_S': 0}):
+            self.assertEqual(volumen.acumular(), 0)
+        self.assertEqual(MarcaProceso.objects.get(nombre=volumen.MARCA).huecos, {})
+
+    def test_reclasificacion(self):
+        agregado = self.pago('PENDIENTE', '202')
+        volumen.acumular()
+        self.cerrar(agregado, 'RECHAZADO', '504')
+        nuevo = self.pago('PENDIENTE', '202')
+        self.cerrar(nuevo, 'APROBADO', '201') # Aún no agregado: el lote ya lee el estado final
+        self.assertEqual(self.horas(), {('PENDIENTE', '202'): (1, Decimal('10.00'))})
+
+        self.assertEqual(volumen.acumular(), 1)
+        self.assertEqual(self.horas(), {('RECHAZADO', '504'): (1, Decimal('10.00')), ('APROBADO', '201'): (1, Decimal('10.00'))})
+        self.assertFalse(ReclasificacionVolumen.objects.exists())
+
+
+class VelocidadTest(TestCase):
+    """ Los controles de velocidad aplican igual a los pagos unitarios y a los lotes de datáfonos. """
+
+    @classmethod
+    def setUpTestData(cls):
+        cliente = Cliente.objects.create(user=User.objects.create_user(username='tarjetahabiente', password='x'), cedula='4', rif='V-4', telefono='0')
+        cls.tarjeta = Tarjeta.objects.create(cuenta=Cuenta.objects.create(cliente=cliente))
+        tienda = Cliente.objects.create(
+            user=User.objects.create_user(username='kiosco', password='x'), rif='J-5', telefono='0', tipo_persona='JURIDICO'
+        )
+        cls.cuenta_tienda = Cuenta.objects.create(cliente=tienda)
+        cls.cvv_errado = '000' if cls.tarjeta.cvv != '000' else '001'
+
+    def setUp(self):
+        velocidad._almacen.limpiar()
+
+    def pagar(self, cvc=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return autorizar_debito_tarjeta(
+                self.tarjeta.numero, cvc or self.tarjeta.cvv, Decimal('1.00'), mensaje_fondos='Sin fondos.', comercio='J-5',
+                cuenta_destino_id=self.cuenta_tienda.pk, tipo='PAGO_COMERCIO', banco_emisor_id='0001',
+            )
+
+    def codigo(self, cvc=None):
+        with self.assertRaises(AutorizacionRechazada) as contexto:
+            self.pagar(cvc)
+        return contexto.exception.codigo
+
+    def lote(self, *cvcs):
+        pagos = [
+            PagoLote(self.tarjeta.numero, cvc, Decimal('1.00'), self.cuenta_tienda.pk, 'J-5', dict(tipo='PAGO_COMERCIO', banco_emisor_id='0001'))
+            for cvc in cvcs
+        ]
+        return [
+            resultado.codigo if isinstance(resultado, AutorizacionRechazada) else resultado.codigo_respuesta
+            for resultado in autorizar_lote_on_us(pagos, mensaje_fondos='Sin fondos.')
+        ]
+
+    def test_ventana_por_tarjeta(self):
+        reloj = mock.Mock(return_value=1_000_000.0)
+        with mock.patch.object(velocidad.time, 'time', reloj):
+            for _ in range(10): # VELOCIDAD_TARJETA_TRANSACCIONES_MINUTO
+                self.pagar()
+            self.assertEqual(self.codigo(), 'IERROR_1009')
+            reloj.return_value += 61 # La ventana de un minuto ya pasó
+            self.pagar()
+        self.tarjeta.refresh_from_db()
+        self.assertEqual(self.tarjeta.saldo_disponible, Decimal('9989.00'))
+
+    def test_bloqueo_por_cvv(self):
+        for _ in range(3): # VELOCIDAD_TARJETA_CVV_FALLIDOS_HORA
+            self.assertEqual(self.codigo(self.cvv_errado), 'IERROR_1005')
+        self.assertEqual(self.codigo(), 'IERROR_1009') # Aunque el CVV sea correcto
+
+    def test_lote(self):
+        self.assertEqual(self.lote(*[self.tarjeta.cvv] * 11), ['201'] * 10 + ['IERROR_1009'])
+        velocidad._almacen.limpiar()
+        cvcs = [self.cvv_errado] * 3 + [self.tarjeta.cvv]
+        self.assertEqual(self.lote(*cvcs), ['IERROR_1005'] * 3 + ['IERROR_1009'])
+        self.tarjeta.refresh_from_db()
+        self.assertEqual(self.tarjeta.saldo_disponible, Decimal('9990.00'))
+
+
+@override_settings(LIMITE_TASA={
+    **settings.LIMITE_TASA, 'ACTIVO': True, 'PROXIES_CONFIABLES': ['127.0.0.1'], 'RUTAS': {'/api/limitada/': {'IP': (0.5, 2)}},
+})
+class LimiteTasaTest(SimpleTestCase):
+    """ Límite por IP: 429 con Retry-After antes de la vista (sin BD) y X-Forwarded-For solo desde un proxy confiable. """
+
+    def setUp(self):
+        limite_tasa._almacen.limpiar()
+
+    def estados(self, veces, **meta):
+        return [self.client.post('/api/limitada/', **meta).status_code for _ in range(veces)]
+
+    def test_429_con_retry_after(self):
+        self.assertEqual(self.estados(2), [404, 404]) # La ruta no existe: pasa hasta la resolución de URLs
+        respuesta = self.client.post('/api/limitada/')
+        self.assertEqual(respuesta.status_code, 429)
+        self.assertEqual(respuesta.json()['error']['code'], 'IERROR_TASA_01')
+        self.assertIn(respuesta['Retry-After'], ('1', '2'))
+
+    def test_ip_del_cliente(self):
+        fabrica = RequestFactory()
+        self.assertEqual(limite_tasa.ip_cliente(fabrica.post('/', REMOTE_ADDR='127.0.0.1', HTTP_X_FORWARDED_FOR='6.6.6.6, 1.1.1.1')), '1.1.1.1')
+        self.assertEqual(limite_tasa.ip_cliente(fabrica.post('/', REMOTE_ADDR='10.0.0.9', HTTP_X_FORWARDED_FOR='1.1.1.1')), '10.0.0.9')
+
+        # Detrás del proxy cada cliente tiene su cubeta
+        self.assertEqual(self.estados(3, REMOTE_ADDR='127.0.0.1', HTTP_X_FORWARDED_FOR='1.1.1.1'), [404, 404, 429])
+        self.assertEqual(self.estados(1, REMOTE_ADDR='127.0.0.1', HTTP_X_FORWARDED_FOR='2.2.2.2'), [404])
+        # Sin proxy confiable, cambiar X-Forwarded-For no evade el límite
+        estados = [
+            self.client.post('/api/limitada/', REMOTE_ADDR='10.0.0.9', HTTP_X_FORWARDED_FOR=f"3.3.3.{n}").status_code
+            for n in range(3)
+        ]
+        self.assertEqual(estados, [404, 404, 429])
+
+    def test_asgi_fuera_del_event_loop(self):
+        hilos = []
+        original = limite_tasa.rechazo
+
+        def espia(request):
+            hilos.append(threading.current_thread())
+            return original(request)
+
+        async def vista(request):
+            return HttpResponse()
+
+        middleware = LimiteTasaMiddleware(vista)
+
+        async def escenario():
+            respuestas = [await middleware(RequestFactory().post('/api/limitada/')) for _ in range(3)]
+            return threading.current_thread(), [respuesta.status_code for respuesta in respuestas]
+
+        with mock.patch.object(limite_tasa, 'rechazo', espia):
+            hilo_loop, estados = asyncio.run(escenario())
+        self.assertEqual(estados, [200, 200, 429])
+        self.assertEqual(len(hilos), 3)
+        self.assertNotIn(hilo_loop, hilos)
+
+
+class DebitoCondicionalTest(TestCase):
+    """ El débito es un UPDATE condicional: sin fondos o sin fila no toca el saldo. """
+
+    @classmethod
+    def setUpTestData(cls):
+        cliente = Cliente.objects.create(user=User.objects.create_user(username='debito', password='x'), cedula='6', rif='V-6', telefono='0')
+        cls.cuenta = Cuenta.objects.create(cliente=cliente)
+        cls.tarjeta = Tarjeta.objects.create(cuenta=cls.cuenta, saldo_disponible=Decimal('100.00'))
+
+    def saldo(self):
+        return Tarjeta.objects.values_list('saldo_disponible', flat=True).get(pk=self.tarjeta.pk)
+
+    def test_fondos_insuficientes(self):
+        self.assertFalse(debitar_tarjeta(self.tarjeta.pk, Decimal('100.01')))
+        self.assertEqual(self.saldo(), Decimal('100.00'))
+        self.assertTrue(debitar_tarjeta(self.tarjeta.pk, Decimal('100.00')))
+        self.assertEqual(self.saldo(), Decimal('0.00'))
+
+    def test_sin_fila(self):
+        self.assertFalse(debitar_tarjeta(self.tarjeta.pk + 1000, Decimal('1.00')))
+        Tarjeta.objects.filter(pk=self.tarjeta.pk).update(estado=False) # Bloqueada entre la lectura y el débito
+        self.assertFalse(debitar_tarjeta(self.tarjeta.pk, Decimal('1.00')))
+        self.assertEqual(self.saldo(), Decimal('100.00'))
+
+    def test_rechazo_en_bitacora(self):
+        with self.assertRaises(AutorizacionRechazada) as contexto:
+            autorizar_debito_tarjeta(
+                self.tarjeta.numero, self.tarjeta.cvv, Decimal('500.00'), mensaje_fondos='Sin fondos.', comercio='J-6',
+                cuenta_destino_id=self.cuenta.pk, tipo='PAGO_COMERCIO', banco_emisor_id='0001', referencia_externa='F1',
+            )
+        self.assertEqual(contexto.exception.codigo, 'IERROR_1004')
+        self.assertEqual(self.saldo(), Decimal('100.00'))
+        rechazo = Transaccion.objects.get(referencia_externa='F1')
+        self.assertEqual((rechazo.estado, rechazo.codigo_respuesta, rechazo.cuenta_origen_id), ('RECHAZADO', 'IERROR_1004', self.cuenta.pk))
+        self.assertFalse(Partida.objects.filter(transaccion=rechazo).exists())
+
+
+class IdempotenciaTest(TestCase):
+    """ Una clave ejecuta su operación una sola vez; los reintentos repiten la respuesta original. """
+
+    def setUp(self):
+        self.llamadas = 0
+
+    def operacion(self, codigo_http=201):
+        def operar():
+            self.llamadas += 1
+            return Response({"llamada": self.llamadas}, status=codigo_http)
+        return operar
+
+    def test_repeticion(self):
+        primera = ejecutar_idempotente('PRUEBA', 'R1', self.operacion())
+        segunda = ejecutar_idempotente('PRUEBA', 'R1', self.operacion())
+        self.assertEqual((segunda.status_code, segunda.content), (201, primera.content))
+        self.assertEqual(self.llamadas, 1)
+        self.assertEqual(ejecutar_idempotente('OTRO', 'R1', self.operacion()).status_code, 201) # Otro alcance, otra clave
+        self.assertEqual(self.llamadas, 2)
+
+    def test_en_curso(self):
+        def operar():
+            reintento = ejecutar_idempotente('PRUEBA', 'R2', self.operacion())
+            self.assertEqual(reintento.status_code, 409)
+            self.assertIn(b'IERROR_IDEM_01', reintento.content)
+            return Response({}, status=201)
+
+        self.assertEqual(ejecutar_idempotente('PRUEBA', 'R2', operar).status_code, 201)
+        self.assertEqual(self.llamadas, 0)
+
+    def test_errores_liberan_la_clave(self):
+        self.assertEqual(ejecutar_idempotente('PRUEBA', 'R3', self.operacion(503)).status_code, 503)
+        self.assertFalse(ClaveIdempotencia.objects.filter(clave='R3').exists())
+        with self.assertRaises(ZeroDivisionError):
+            ejecutar_idempotente('PRUEBA', 'R3', lambda: 1 / 0)
+        self.assertFalse(ClaveIdempotencia.objects.filter(clave='R3').exists())
+        self.assertEqual(ejecutar_idempotente('PRUEBA', 'R3', self.operacion()).status_code, 201)
+        self.assertEqual(self.llamadas, 2)
+
+    def test_clave_vencida(self):
+        ejecutar_idempotente('PRUEBA', 'R4', self.operacion(402))
+        ClaveIdempotencia.objects.filter(clave='R4').update(expira=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(ejecutar_idempotente('PRUEBA', 'R4', self.operacion()).status_code, 201)
+        self.assertEqual(self.llamadas, 2)
+
+    def test_carrera_repetida(self):
+        # Otro proceso reserva y libera la clave justo antes de cada INSERT, tres veces seguidas
+        crear = ClaveIdempotencia.objects.create
+        choques = iter([IntegrityError(), IntegrityError(), IntegrityError()])
+
+        def crear_con_carrera(**campos):
+            choque = next(choques, None)
+            if choque is not None:
+                raise choque
+            return crear(**campos)
+
+        with mock.patch.object(ClaveIdempotencia.objects, 'create', side_effect=crear_con_carrera):
+            registro, ya_existia = reservar('PRUEBA', 'R5')
+        self.assertFalse(ya_existia)
+        self.assertEqual(registro.pk, ClaveIdempotencia.objects.get(clave='R5').pk)
+
+
+class OutboxTest(TestCase):
+    """ Reserva, reintento con backoff y descarte de las autorizaciones hacia bancos aliados. """
+
+    @classmethod
+    def setUpTestData(cls):
+        tienda = Cliente.objects.create(
+            user=User.objects.create_user(username='tienda_externa', password='x'), rif='J-8', telefono='0', tipo_persona='JURIDICO'
+        )
+        cls.cuenta = Cuenta.objects.create(cliente=tienda)
+
+    def encolar(self, clave=''):
+        return outbox.encolar_autorizacion(
+            '0009', {'monto_pagado': '7.00'}, self.cuenta.pk, Decimal('7.00'), alcance='COMERCIO:J-8' if clave else '', clave=clave,
+            tipo='PAGO_COMERCIO', banco_emisor_id='0009',
+        )
+
+    def test_reserva(self):
+        mensaje, en_linea = self.encolar()
+        self.assertTrue(en_linea)
+        self.assertFalse(outbox.reservar_mensaje(mensaje)) # Nace reservado para la petición en línea
+        MensajeSaliente.objects.filter(pk=mensaje.pk).update(disponible_desde=timezone.now()) # Vence la reserva
+        self.assertTrue(outbox.reservar_mensaje(mensaje))
+        self.assertFalse(outbox.reservar_mensaje(mensaje))
+        self.assertEqual(MensajeSaliente.objects.get(pk=mensaje.pk).intentos, 2)
+
+        _, en_linea = self.encolar()
+        self.assertTrue(en_linea) # El primero sigue en línea: no hay cola por delante
+        MensajeSaliente.objects.filter(pk=mensaje.pk).update(en_linea=False)
+        self.assertFalse(self.encolar()[1]) # Con cola hacia el banco, el nuevo espera su turno
+
+    def test_reintentos_y_descarte(self):
+        mensaje, _ = self.encolar(clave='E1')
+        ClaveIdempotencia.objects.create(alcance='COMERCIO:J-8', clave='E1', expira=timezone.now() + timedelta(days=1))
+        self.assertIsNone(outbox.registrar_respuesta(mensaje, mock.Mock(status_code=503)))
+        mensaje.refresh_from_db()
+        self.assertEqual((mensaje.estado, mensaje.ultimo_error), ('PENDIENTE', 'HTTP 503'))
+        self.assertGreater(mensaje.disponible_desde, timezone.now()) # Backoff
+
+        MensajeSaliente.objects.filter(pk=mensaje.pk).update(intentos=settings.OUTBOX['MAX_INTENTOS'])
+        outbox.reprogramar(mensaje, 'Timeout')
+        mensaje.refresh_from_db()
+        self.assertEqual(mensaje.estado, 'FALLIDO')
+        pago = Transaccion.objects.get(pk=mensaje.transaccion_id)
+        self.assertEqual((pago.estado, pago.codigo_respuesta), ('RECHAZADO', 'IERROR_1002'))
+        self.assertEqual(ClaveIdempotencia.objects.get(clave='E1').codigo_http, 404) # El reintento del datáfono la recibe
+        self.assertFalse(AbonoPendiente.objects.exists())
+
+    def test_banco_desconocido(self):
+        mensaje, _ = self.encolar()
+        MensajeSaliente.objects.filter(pk=mensaje.pk).update(disponible_desde=timezone.now())
+        invalidar_tabla()
+        self.assertEqual(outbox.drenar_banco('0009', 10), 1)
+        self.assertEqual(MensajeSaliente.objects.get(pk=mensaje.pk).estado, 'FALLIDO')
+
+    def test_entregado(self):
+        mensaje, _ = self.encolar()
+        respuesta = outbox.registrar_respuesta(mensaje, mock.Mock(status_code=201))
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(MensajeSaliente.objects.get(pk=mensaje.pk).estado, 'ENTREGADO')
+        self.assertEqual(Transaccion.objects.get(pk=mensaje.transaccion_id).estado, 'APROBADO')
+        self.assertEqual(list(AbonoPendiente.objects.values_list('cuenta_id', 'monto')), [(self.cuenta.pk, Decimal('7.00'))])
+        outbox.registrar_respuesta(mensaje, mock.Mock(status_code=201)) # Respuesta duplicada: ya estaba resuelto
+        self.assertEqual(AbonoPendiente.objects.count(), 1)
+
+
+class AbonosTest(TestCase):
+    """ Los abonos pendientes se suman al saldo una sola vez, y solo los que ya existían al consolidar. """
+
+    @classmethod
+    def setUpTestData(cls):
+        tienda = Cliente.objects.create(
+            user=User.objects.create_user(username='tienda_abonos', password='x'), rif='J-9', telefono='0', tipo_persona='JURIDICO'
+        )
+        cls.cuenta = Cuenta.objects.create(cliente=tienda)
+        cls.otra = Cuenta.objects.create(cliente=tienda)
+
+    def saldo(self, cuenta):
+        return Cuenta.objects.values_list('saldo', flat=True).get(pk=cuenta.pk)
+
+    def test_consolidar_cuenta(self):
+        registrar_abono(self.cuenta.pk, Decimal('10.00'))
+        hasta = AbonoPendiente.objects.get().pk
+        registrar_abono(self.cuenta.pk, Decimal('5.00')) # Llega después del corte
+        self.assertEqual(consolidar_cuenta(self.cuenta.pk, hasta), Decimal('10.00'))
+        self.assertEqual(self.saldo(self.cuenta), Decimal('10.00'))
+        self.assertEqual(list(AbonoPendiente.objects.values_list('monto', flat=True)), [Decimal('5.00')])
+
+        self.assertEqual(consolidar_cuenta(self.cuenta.pk), Decimal('5.00'))
+        self.assertEqual(consolidar_cuenta(self.cuenta.pk), Decimal('0'))
+        self.assertEqual(self.saldo(self.cuenta), Decimal('15.00'))
+
+    def test_consolidar_pendientes(self):
+        registrar_abonos({self.cuenta.pk: Decimal('3.00'), self.otra.pk: Decimal('4.00')})
+        registrar_abono(self.cuenta.pk, Decimal('2.00'))
+        self.assertEqual(consolidar_pendientes(), (2, Decimal('9.00')))
+        self.assertEqual((self.saldo(self.cuenta), self.saldo(self.otra)), (Decimal('5.00'), Decimal('4.00')))
+        self.assertFalse(AbonoPendiente.objects.exists())
+        self.assertEqual(consolidar_pendientes(), (0, Decimal('0')))
+
+    def test_consolidar_cuentas(self):
+        registrar_abonos({self.cuenta.pk: Decimal('3.00'), self.otra.pk: Decimal('4.00')})
+        consolidar_cuentas([self.cuenta.pk])
+        self.assertEqual((self.saldo(self.cuenta), self.saldo(self.otra)), (Decimal('3.00'), Decimal('0.00')))
+        self.assertEqual(list(AbonoPendiente.objects.values_list('cuenta_id', flat=True)), [self.otra.pk])
+
+
+class LibroMayorTest(TestCase):
+    """ Cada asiento suma cero y verificar_libro detecta (y repara) los saldos que se apartan del libro. """
+
+    @classmethod
+    def setUpTestData(cls):
+        cliente = Cliente.objects.create(user=User.objects.create_user(username='libro', password='x'), cedula='10', rif='V-10', telefono='0')
+        cls.cuenta = Cuenta.objects.create(cliente=cliente)
+        cls.tarjeta = Tarjeta.objects.create(cuenta=cls.cuenta)
+        tienda = Cliente.objects.create(
+            user=User.objects.create_user(username='tienda_libro', password='x'), rif='J-10', telefono='0', tipo_persona='JURIDICO'
+        )
+        cls.cuenta_tienda = Cuenta.objects.create(cliente=tienda)
+
+    def limpio(self):
+        return {"asientos_descuadrados": [], "cuentas": [], "tarjetas": []}
+
+    def test_asiento_descuadrado(self):
+        transaccion = Transaccion.objects.create(tipo='TRANSFERENCIA', monto=Decimal('10.00'), estado='APROBADO', codigo_respuesta='00')
+        with self.assertRaises(AsientoDescuadrado):
+            asentar(transaccion.pk, pierna_cuenta(self.cuenta.pk, Decimal('10.00')), pierna_externa(SISTEMA_BONOS, Decimal('-9.99')))
+        self.assertFalse(Partida.objects.filter(transaccion=transaccion).exists())
+
+    def test_pago_cuadra(self):
+        pago = autorizar_debito_tarjeta(
+            self.tarjeta.numero, self.tarjeta.cvv, Decimal('25.00'), mensaje_fondos='Sin fondos.', comercio='J-10',
+            cuenta_destino_id=self.cuenta_tienda.pk, tipo='PAGO_COMERCIO', banco_emisor_id='0001',
+        )
+        piernas = Partida.objects.filter(transaccion=pago)
+        self.assertEqual(piernas.count(), 2)
+        self.assertEqual(piernas.aggregate(total=Sum('monto'))['total'], 0)
+        self.assertEqual(verificar_libro(), self.limpio()) # El abono pendiente cuenta como saldo de la tienda
+
+    def test_detecta_y_reconstruye(self):
+        Tarjeta.objects.filter(pk=self.tarjeta.pk).update(saldo_disponible=F('saldo_disponible') + 50)
+        Cuenta.objects.filter(pk=self.cuenta_tienda.pk).update(saldo=Decimal('80.00'))
+        suelta = Transaccion.objects.create(tipo='TRANSFERENCIA', monto=Decimal('1.00'), estado='APROBADO', codigo_respuesta='00')
+        Partida.objects.create(transaccion=suelta, externa=SISTEMA_BONOS, monto=Decimal('1.00')) # Sin su contrapartida
+
+        informe = verificar_libro()
+        self.assertEqual(informe['asientos_descuadrados'], [suelta.pk])
+        self.assertEqual(informe['tarjetas'], [(self.tarjeta.pk, Decimal('10050.00'), Decimal('10000.00'))])
+        self.assertEqual(informe['cuentas'], [(self.cuenta_tienda.pk, Decimal('80.00'), Decimal('0'))])
+
+        verificar_libro(reconstruir=True)
+        Partida.objects.filter(transaccion=suelta).delete()
+        self.assertEqual(verificar_libro(), self.limpio())
+        self.assertEqual(Tarjeta.objects.values_list('saldo_disponible', flat=True).get(pk=self.tarjeta.pk), Decimal('10000.00'))
+
+    def test_historial_protege_titulares(self):
+        for titular in (self.tarjeta, self.cuenta, self.cuenta.cliente):
+            with self.assertRaises(ProtectedError):
+                type(titular).objects.get(pk=titular.pk).delete()
+        self.assertTrue(Partida.objects.filter(tarjeta=self.tarjeta).exists())
+        self.assertEqual(verificar_libro(), self.limpio())
+
+    def test_limpiar_datos(self):
+        autorizar_debito_tarjeta(
+            self.tarjeta.numero, self.tarjeta.cvv, Decimal('25.00'), mensaje_fondos='Sin fondos.', comercio='J-10',
+            cuenta_destino_id=self.cuenta_tienda.pk, tipo='PAGO_COMERCIO', banco_emisor_id='0001',
+        )
+        call_command('limpiar_datos', stdout=StringIO())
+        self.assertFalse(Cuenta.objects.exists())
+        self.assertFalse(Partida.objects.exists())
+        self.assertEqual(verificar_libro(), self.limpio())
+
+
+@override_settings(ESTADO_CUENTA_BLOQUE=2)
+class EstadoCuentaAsgiTest(TransactionTestCase):
+    """ Bajo ASGI el estado de cuenta sale por bloques, sin cargar todo el rango en memoria. """
+
+    def test_streaming_por_bloques(self):
+        user = User.objects.create_user(username='extracto', password='x')
+        cuenta = Cuenta.objects.create(cliente=Cliente.objects.create(user=user, cedula='11', rif='V-11', telefono='0'))
+        for _ in range(5):
+            transaccion = Transaccion.objects.create(tipo='TRANSFERENCIA', monto=Decimal('2.00'), estado='APROBADO', codigo_respuesta='00')
+            asentar(transaccion.pk, pierna_cuenta(cuenta.pk, Decimal('2.00')), pierna_externa(SISTEMA_BONOS, Decimal('-2.00')))
+        token = RefreshToken.for_user(user).access_token
+
+        async def descargar():
+            respuesta = await AsyncClient().get(
+                '/api/estado-cuenta/', {'formato': 'ndjson'}, headers={'Authorization': f"Bearer {token}"}
+            )
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertTrue(respuesta.is_async)
+            return [trozo async for trozo in respuesta.streaming_content]
+
+        trozos = asyncio.run(descargar())
+        self.assertEqual(len(trozos), 3) # Saldo inicial + 5 movimientos, de a 2 filas
+        filas = b''.join(trozos).decode().splitlines()
+        self.assertEqual(len(filas), 6)
+        self.assertEqual(json.loads(filas[-1])['saldo'], '10.00')
+
+
+class NumeracionTest(TestCase):
+    """ Números de cuenta y tarjeta válidos, únicos entre bloques y sin consultas de colisión. """
+
+    def test_digito_luhn(self):
+        for parcial, digito in (('7992739871', '3'), ('411111111111111', '1'), ('37828224631000', '5'), ('601111111111111', '7')):
+            self.assertEqual(numeracion.digito_luhn(parcial), digito)
+            self.assertTrue(numeracion.es_luhn_valido(parcial + digito))
+        self.assertFalse(numeracion.es_luhn_valido('4111111111111112'))
+
+    def test_digitos_control(self):
+        # Calculados a mano: módulo 11 con pesos 3, 2, 7, 6, 5, 4, 3, 2 (resto 11 -> 0, resto 10 -> 1)
+        self.assertEqual(numeracion.digitos_control('0102', '0001', '0000000001'), '61')
+        self.assertEqual(numeracion.digitos_control('0000', '0000', '0000000000'), '00')
+        self.assertEqual(numeracion.digitos_control('0000', '0002', '0000000000'), '71')
+        self.assertTrue(numeracion.cuenta_valida('01020001610000000001'))
+        self.assertFalse(numeracion.cuenta_valida('01020001160000000001'))
+
+    def test_numeros_validos(self):
+        for numero in numeracion.numeros_cuenta(50):
+            self.assertTrue(numeracion.cuenta_valida(numero), numero)
+        for numero in numeracion.numeros_tarjeta(50):
+            self.assertEqual(len(numero), numeracion.LARGO_TARJETA)
+            self.assertTrue(numero.startswith(settings.MI_BIN_TARJETA))
+            self.assertTrue(numeracion.es_luhn_valido(numero), numero)
+
+    def test_unicos_entre_bloques(self):
+        # Secuencia de PostgreSQL simulada: cada proceso reserva NUMERACION['BLOQUE'] valores por viaje
+        for mezclar in (False, True):
+            siguiente = iter(range(1, 10 ** 6))
+            reservar = mock.Mock(side_effect=lambda nombre, cantidad: [next(siguiente) for _ in range(cantidad)])
+            asignadores = {numeracion.CUENTA: numeracion.Asignador(numeracion.CUENTA), numeracion.TARJETA: numeracion.Asignador(numeracion.TARJETA)}
+            with mock.patch.object(numeracion, 'connection', mock.Mock(vendor='postgresql')), \
+                    mock.patch.object(numeracion, '_reservar', reservar), \
+                    mock.patch.object(numeracion, '_asignadores', asignadores), \
+                    self.settings(NUMERACION={**settings.NUMERACION, 'BLOQUE': 7, 'MEZCLAR': mezclar}):
+                cuentas = [numero for cantidad in (1, 5, 3, 10, 1, 7) for numero in numeracion.numeros_cuenta(cantidad)]
+                tarjetas = [numero for cantidad in (2, 9, 1, 6) for numero in numeracion.numeros_tarjeta(cantidad)]
+            self.assertEqual(len(set(cuentas)), len(cuentas))
+            self.assertEqual(len(set(tarjetas)), len(tarjetas))
+            self.assertEqual(reservar.call_count, 7) # 27 cuentas y 18 tarjetas en bloques de 7 (o más)
+            self.assertEqual(cuentas[0] != f"{settings.MI_CODIGO_BANCO}{settings.MI_CODIGO_AGENCIA}{cuentas[0][8:10]}0000000001", mezclar)
+
+    def test_alta_sin_consultas_de_colision(self):
+        cliente = Cliente.objects.create(user=User.objects.create_user(username='numeracion', password='x'), cedula='12', rif='V-12', telefono='0')
+        with CaptureQueriesContext(connection) as consultas:
+            cuenta = Cuenta.objects.create(cliente=cliente)
+            tarjeta = Tarjeta.objects.create(cuenta=cuenta)
+        lecturas = [
+            consulta['sql'] for consulta in consultas.captured_queries
+            if consulta['sql'].startswith('SELECT') and ('"core_bancario_cuenta"' in consulta['sql'] or '"core_bancario_tarjeta"' in consulta['sql'])
+        ]
+        self.assertEqual(lecturas, [])
+        self.assertTrue(numeracion.cuenta_valida(cuenta.numero_cuenta))
+        self.assertTrue(numeracion.es_luhn_valido(tarjeta.numero))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class DashboardCacheTest(TestCase):
+    """ El dashboard sale de la caché sin consultas, responde 304 con su ETag y se invalida al cambiar saldos o tarjetas. """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='tablero', password='x')
+        cls.cuenta = Cuenta.objects.create(cliente=Cliente.objects.create(user=cls.user, cedula='13', rif='V-13', telefono='0'))
+        cls.tarjeta = Tarjeta.objects.create(cuenta=cls.cuenta)
+
+    def setUp(self):
+        cache.clear()
+        self.client.defaults['HTTP_AUTHORIZATION'] = f"Bearer {RefreshToken.for_user(self.user).access_token}"
+
+    def cargar(self, **cabeceras):
+        return self.client.get('/api/dashboard/', **cabeceras)
+
+    def test_etag_y_304(self):
+        respuesta = self.cargar()
+        self.assertEqual(respuesta.status_code, 200)
+        etag = respuesta['ETag']
+        no_modificado = self.cargar(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(no_modificado.status_code, 304)
+        self.assertEqual((no_modificado['ETag'], no_modificado.content), (etag, b''))
+        self.assertEqual(self.cargar(HTTP_IF_NONE_MATCH='"otro"').status_code, 200)
+
+    def test_acierto_sin_consultas(self):
+        primera = self.cargar()
+        with self.assertNumQueries(0):
+            segunda = self.cargar()
+        self.assertEqual((segunda.content, segunda['ETag']), (primera.content, primera['ETag']))
+
+    def test_pago_invalida(self):
+        etag = self.cargar()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            autorizar_debito_tarjeta(
+                self.tarjeta.numero, self.tarjeta.cvv, Decimal('25.00'), mensaje_fondos='Sin fondos.', comercio='J-13',
+                contrapartida_externa='BANCO:0002', tipo='PAGO_COMERCIO', banco_emisor_id='0001',
+            )
+        respuesta = self.cargar(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+        self.assertIn('9975.00', respuesta.content.decode())
+
+    def test_cambio_de_tarjeta_invalida(self):
+        etag = self.cargar()['ETag']
+        tarjeta = Tarjeta.objects.get(pk=self.tarjeta.pk)
+        tarjeta.estado = False # Bloqueada
+        with self.captureOnCommitCallbacks(execute=True):
+            tarjeta.save()
+        respuesta = self.cargar(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.cargar(HTTP_IF_NONE_MATCH=respuesta['ETag']).status_code, 304)
+
+
+@override_settings(ENRUTAMIENTO_TTL=3600)
+class EnrutamientoTest(TestCase):
+    """ Los BIN se resuelven por el prefijo más largo y la tabla se recompila al cambiar el Directorio. """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.banco_2 = Directorio.objects.create(codigo='0002', nombre='BANCO_2', tipo='BANCO', api_url='http://banco2/api/', bins='45,4589')
+        Directorio.objects.create(codigo='0003', nombre='BANCO_3', tipo='BANCO', api_url='http://banco3/api/', bins='458912', alias='B3')
+
+    def setUp(self):
+        invalidar_tabla()
+        self.addCleanup(invalidar_tabla)
+
+    def banco(self, numero_tarjeta):
+        ruta = obtener_tabla().por_tarjeta(numero_tarjeta)
+        return ruta and ruta.codigo
+
+    def test_prefijo_mas_largo(self):
+        self.assertEqual(self.banco('4589120000000001'), '0003')
+        self.assertEqual(self.banco('4589130000000001'), '0002')
+        self.assertEqual(self.banco('4500000000000001'), '0002')
+        self.assertEqual(self.banco(f"{settings.MI_BIN_TARJETA}000000000001"), formas_codigo(settings.MI_CODIGO_BANCO)[0])
+        self.assertEqual(obtener_tabla().por_codigo('b3').codigo, '0003')
+        self.assertEqual(obtener_tabla().nombre_externo('0002'), 'BANCO_2')
+
+    def test_prefijo_desconocido(self):
+        self.assertIsNone(self.banco('9999000000000001'))
+        self.assertIsNone(self.banco('4'))
+        self.assertIsNone(obtener_tabla().por_codigo('0099'))
+
+    def test_invalidar_recoge_cambios(self):
+        tabla = obtener_tabla()
+        Directorio.objects.filter(codigo='0003').update(bins='458912,458913') # Sin señales: la tabla sigue vigente
+        self.assertIs(obtener_tabla(), tabla)
+        self.assertEqual(self.banco('4589130000000001'), '0002')
+
+        invalidar_tabla()
+        self.assertEqual(self.banco('4589130000000001'), '0003')
+
+        banco_2 = Directorio.objects.get(pk=self.banco_2.pk)
+        banco_2.bins = '45'
+        banco_2.api_url = 'http://banco2-nuevo/api/'
+        banco_2.save() # La señal invalida la tabla
+        self.assertEqual(self.banco('4589990000000001'), '0002')
+        self.assertEqual(obtener_tabla().por_codigo('0002').api_url, 'http://banco2-nuevo/api/')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CacheComerciosTest(TestCase):
+    """ Un cambio de comercio llega a la caché de los demás workers por la versión compartida, sin esperar el TTL. """
+
+    @classmethod
+    def setUpTestData(cls):
+        tienda = Cliente.objects.create(
+            user=User.objects.create_user(username='tienda_cache', password='x'), rif='J-14', telefono='0', tipo_persona='JURIDICO'
+        )
+        cls.comercio = Comercio.objects.create(codigo_identificador='J-14', nombre='Kiosco', cuenta=Cuenta.objects.create(cliente=tienda))
+
+    def setUp(self):
+        cache.clear()
+        self.otro_worker = CacheComercios(capacidad=10, ttl_segundos=3600, revision_segundos=0)
+
+    def test_desactivar_llega_a_otro_worker(self):
+        self.assertTrue(self.otro_worker.obtener('J-14').activo)
+        with self.assertNumQueries(0):
+            self.assertTrue(self.otro_worker.obtener('J-14').activo)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            desactivar_comercios([self.comercio.pk])
+        self.assertFalse(self.otro_worker.obtener('J-14').activo)
+
+    def test_guardar_llega_a_otro_worker(self):
+        self.otro_worker.obtener('J-14')
+        comercio = Comercio.objects.get(pk=self.comercio.pk)
+        comercio.nombre = 'Kiosco Nuevo'
+        with self.captureOnCommitCallbacks(execute=False) as pendientes:
+            comercio.save()
+        self.assertEqual(self.otro_worker.obtener('J-14').nombre, 'Kiosco') # Sin confirmar, nada cambia
+        for pendiente in pendientes:
+            pendiente()
+        self.assertEqual(self.otro_worker.obtener('J-14').nombre, 'Kiosco Nuevo')
@@ -4,10 +4,14 @@ from .views import (
     DashboardView, 
     RegistroClienteView, 
     ProcesarPagoComercioView, 
+    ProcesarLotePagosComercioView,
     AutorizarPagoBancoView,
     AdminDashboardView,
+    AdminClientesView,
+    VolumenTransaccionesView,
     RegistroBancoAliadoView,
     TransaccionListView,
+    EstadoCuentaView,
     ClaimBonusView
 )
 
@@ -20,14 +24,18 @@ urlpatterns = [
 
     # 3. Pagos y Transferencias (Sprint 2)
     path('procesar_pago_comercio/', ProcesarPagoComercioView.as_view(), name='procesar_pago_comercio'),
+    path('procesar_pago_comercio/lote/', ProcesarLotePagosComercioView.as_view(), name='procesar_pago_comercio_lote'),
     path('autorizar_pago/', AutorizarPagoBancoView.as_view(), name='autorizar_pago'),
 
     # 4. Historial de Transacciones
     path('transacciones/', TransaccionListView.as_view(), name='transacciones'),
+    path('estado-cuenta/', EstadoCuentaView.as_view(), name='estado_cuenta'),
 
     # 5. Reclamo de Bono (CAMPAÑA)
     path('reclamar-bono/', ClaimBonusView.as_view(), name='reclamar-bono'),
 
     path('admin-panel/', AdminDashboardView.as_view(), name='admin_panel'),
+    path('admin-panel/clientes/', AdminClientesView.as_view(), name='admin_panel_clientes'),
+    path('admin-panel/volumen/', VolumenTransaccionesView.as_view(), name='admin_panel_volumen'),
     path('admin/registrar-banco/', RegistroBancoAliadoView.as_view(), name='registrar_banco'),
 ]
@@ -0,0 +1,198 @@
+# backend/core_bancario/velocidad.py
+
+"""
+Controles de velocidad para las autorizaciones con tarjeta propia (pagos
+On-Us de datáfonos y autorizaciones pedidas por bancos aliados).
+
+Cada regla de VELOCIDAD['REGLAS'] mide, por tarjeta o por comercio y en una
+ventana deslizante, una de estas medidas:
+
+- CANTIDAD: transacciones aprobadas.
+- MONTO: suma de los montos aprobados.
+- COMERCIOS: comercios distintos en los que pagó la tarjeta.
+- CVV_FALLIDOS: intentos con CVV inválido (IERROR_1005). Al llegar al límite
+  la tarjeta se rechaza aunque el CVV sea correcto (corta la adivinanza).
+
+autorizacion.py verifica después del débito, con la fila de la tarjeta
+bloqueada, y registra el pago al confirmarse la transacción. Los lotes de
+datáfonos pasan por los mismos controles: cada pago aprobado se registra al
+decidirse, así lo ven los pagos siguientes del mismo lote.
+
+El límite de cada regla es el parámetro VELOCIDAD_<NOMBRE> (parametros.py),
+editable desde el admin; 0 desactiva la regla.
+
+Los contadores no salen de Transaccion: viven en un SQLite local que
+comparten los workers de la máquina (almacen_local.py), o en memoria del
+proceso si VELOCIDAD['ARCHIVO'] está vacío. Cada ventana se divide en
+VELOCIDAD['CUBETAS'] cubetas de tiempo: la ventana avanza de a una cubeta.
+Verificar cuesta una lectura indexada por regla y registrar un UPSERT por
+regla, en el orden de decenas de microsegundos cada uno.
+
+Verificar y registrar no son atómicos entre sí: los pagos de una tarjeta se
+serializan por su bloqueo, pero los de un comercio no, y pueden pasar varios
+a la vez con su contador en el límite. Los contadores se pierden si se borra
+el archivo; no hay nada que reconstruir desde la BD.
+"""
+
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+from . import parametros
+from .almacen_local import AlmacenLocal
+
+TARJETA = 'TARJETA'
+COMERCIO = 'COMERCIO'
+CANTIDAD = 'CANTIDAD'
+MONTO = 'MONTO'
+COMERCIOS = 'COMERCIOS'
+CVV_FALLIDOS = 'CVV_FALLIDOS'
+
+Regla = namedtuple('Regla', ['nombre', 'entidad', 'medida', 'ventana_s'])
+
+REGLAS = [
+    Regla(regla['NOMBRE'], regla['ENTIDAD'], regla['MEDIDA'], regla['VENTANA_S'])
+    for regla in settings.VELOCIDAD['REGLAS']
+]
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS contadores (
+    clave TEXT NOT NULL, cubeta INTEGER NOT NULL, cantidad INTEGER NOT NULL, centimos INTEGER NOT NULL,
+    expira REAL NOT NULL, PRIMARY KEY (clave, cubeta)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS distintos (
+    clave TEXT NOT NULL, cubeta INTEGER NOT NULL, valor TEXT NOT NULL, expira REAL NOT NULL,
+    PRIMARY KEY (clave, cubeta, valor)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS contadores_expira ON contadores (expira);
+CREATE INDEX IF NOT EXISTS distintos_expira ON distintos (expira);
+"""
+
+
+class AlmacenVelocidad(AlmacenLocal):
+    """ Contadores por cubeta de tiempo (ver almacen_local.py). """
+
+    def __init__(self, archivo, cubetas, purga_cada):
+        super().__init__(archivo, ESQUEMA)
+        self.cubetas = cubetas
+        self.purga_cada = purga_cada
+        self._escrituras = 0
+
+    def _cubeta(self, regla, ahora):
+        """ (cubeta actual, primera cubeta dentro de la ventana, cuándo sale de la ventana). """
+        ancho = regla.ventana_s / self.cubetas
+        actual = int(ahora // ancho)
+        return actual, actual - self.cubetas + 1, (actual + 1) * ancho + regla.ventana_s
+
+    def medir(self, regla, clave, valor=None, ahora=None):
+        """ Valor de la regla en su ventana. COMERCIOS: (distintos, ¿`valor` ya está entre ellos?). """
+        _, desde, _ = self._cubeta(regla, ahora or time.time())
+        with self.leer() as conexion:
+            if regla.medida == COMERCIOS:
+                return conexion.execute(
+                    "SELECT COUNT(DISTINCT valor), COALESCE(MAX(valor = ?), 0) FROM distintos WHERE clave = ? AND cubeta >= ?",
+                    (valor, clave, desde),
+                ).fetchone()
+            columna = 'centimos' if regla.medida == MONTO else 'cantidad'
+            return conexion.execute(
+                f"SELECT COALESCE(SUM({columna}), 0) FROM contadores WHERE clave = ? AND cubeta >= ?", (clave, desde)
+            ).fetchone()[0]
+
+    def sumar(self, eventos, ahora=None):
+        """ eventos: [(regla, clave, centimos o valor distinto)]. Una transacción SQLite. """
+        ahora = ahora or time.time()
+        with self.escribir() as conexion:
+            for regla, clave, dato in eventos:
+                cubeta, _, expira = self._cubeta(regla, ahora)
+                if regla.medida == COMERCIOS:
+                    conexion.execute(
+                        "INSERT OR IGNORE INTO distintos VALUES (?, ?, ?, ?)", (clave, cubeta, dato, expira)
+                    )
+                else:
+                    conexion.execute(
+                        "INSERT INTO contadores VALUES (?, ?, 1, ?, ?) ON CONFLICT (clave, cubeta) DO UPDATE "
+                        "SET cantidad = cantidad + 1, centimos = centimos + excluded.centimos",
+                        (clave, cubeta, dato, expira),
+                    )
+            self._escrituras += 1
+            if self._escrituras % self.purga_cada == 0: # Borra las cubetas que ya salieron de su ventana
+                conexion.execute("DELETE FROM contadores WHERE expira < ?", (ahora,))
+                conexion.execute("DELETE FROM distintos WHERE expira < ?", (ahora,))
+
+    def limpiar(self):
+        with self.escribir() as conexion:
+            conexion.execute("DELETE FROM contadores")
+            conexion.execute("DELETE FROM distintos")
+
+
+_almacen = AlmacenVelocidad(
+    settings.VELOCIDAD['ARCHIVO'], settings.VELOCIDAD['CUBETAS'], settings.VELOCIDAD['PURGA_CADA']
+)
+
+
+def _centimos(monto):
+    return int(monto * 100)
+
+
+def _reglas(entidad):
+    """ Reglas activas de una entidad con su límite vigente. """
+    for regla in REGLAS:
+        if regla.entidad == entidad:
+            limite = parametros.obtener(f"VELOCIDAD_{regla.nombre}")
+            if limite:
+                yield regla, limite
+
+
+def _clave(regla, identificador):
+    return f"{regla.nombre}:{identificador}"
+
+
+def verificar(tarjeta_id, comercio, monto):
+    """
+    Nombre de la primera regla de la tarjeta o del comercio que el pago excedería,
+    o None. El pago en curso todavía no está en los contadores.
+    """
+    if not settings.VELOCIDAD['ACTIVA']:
+        return None
+    ahora = time.time()
+    for entidad, identificador in ((TARJETA, tarjeta_id), (COMERCIO, comercio)):
+        for regla, limite in _reglas(entidad):
+            clave = _clave(regla, identificador)
+            if regla.medida == COMERCIOS:
+                distintos, ya_visto = _almacen.medir(regla, clave, comercio, ahora)
+                excede = distintos + (0 if ya_visto else 1) > limite
+            elif regla.medida == MONTO:
+                excede = _almacen.medir(regla, clave, ahora=ahora) + _centimos(monto) > _centimos(limite)
+            elif regla.medida == CVV_FALLIDOS:
+                excede = _almacen.medir(regla, clave, ahora=ahora) >= limite
+            else:
+                excede = _almacen.medir(regla, clave, ahora=ahora) + 1 > limite
+            if excede:
+                return regla.nombre
+    return None
+
+
+def registrar_aprobada(tarjeta_id, comercio, monto):
+    """ Suma un pago aprobado a los contadores de la tarjeta y del comercio. """
+    if not settings.VELOCIDAD['ACTIVA']:
+        return
+    eventos = []
+    for entidad, identificador in ((TARJETA, tarjeta_id), (COMERCIO, comercio)):
+        for regla, _ in _reglas(entidad):
+            if regla.medida == COMERCIOS:
+                eventos.append((regla, _clave(regla, identificador), comercio))
+            elif regla.medida != CVV_FALLIDOS:
+                eventos.append((regla, _clave(regla, identificador), _centimos(monto)))
+    if eventos:
+        _almacen.sumar(eventos)
+
+
+def registrar_cvv_fallido(tarjeta_id):
+    if not settings.VELOCIDAD['ACTIVA']:
+        return
+    eventos = [
+        (regla, _clave(regla, tarjeta_id), 0) for regla, _ in _reglas(TARJETA) if regla.medida == CVV_FALLIDOS
+    ]
+    if eventos:
+        _almacen.sumar(eventos)
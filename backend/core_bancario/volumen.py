@@ -0,0 +1,187 @@
+# backend/core_bancario/volumen.py
+
+"""
+Volumen de transacciones por minuto y por hora (reportes de operaciones).
+
+`manage.py acumular_volumen` recorre la bitácora de Transaccion en orden de id
+a partir de la marca 'VOLUMEN' (MarcaProceso) y suma cada lote a
+VolumenTransacciones: cantidad y monto por intervalo, tipo, estado, banco
+emisor y código de respuesta. Cada lote cuesta una consulta agregada por
+minuto (las horas se derivan de los minutos en Python), una lectura de las
+filas de agregado afectadas y sus INSERT / UPDATE masivos. Los reportes leen
+unos cientos de filas de agregado en lugar de recorrer la bitácora.
+
+- Un id puede confirmarse después que otros mayores (lo tomó antes y su
+  transacción tardó más). Los ids que faltan dentro de un lote quedan en
+  marca.huecos y cada pase agrega los que ya se confirmaron. Un hueco que no
+  aparece en VOLUMEN['HUECO_MAX_S'] segundos se descarta: es un ROLLBACK.
+- Un pago externo nace PENDIENTE y la cola de salida lo cierra después
+  (outbox._cerrar). reclasificar() solo inserta una ReclasificacionVolumen en la
+  transacción del cambio: el cierre no bloquea la marca ni el agregado. Cada
+  pase aplica las reclasificaciones de transacciones agregadas en pases
+  anteriores y descarta las demás (el lote ya lee el estado final). El pase
+  ve una sola foto de la BD, así una reclasificación y el estado que produjo
+  se ven siempre juntos.
+"""
+
+import time
+from collections import defaultdict
+from datetime import timezone as tz
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMinute
+
+from .libro import _lectura_consistente
+from .models import MarcaProceso, ReclasificacionVolumen, Transaccion, VolumenTransacciones
+
+MARCA = 'VOLUMEN'
+CAMPOS = ('tipo', 'estado', 'banco_emisor_id', 'codigo_respuesta')
+
+
+def _aplicar(deltas):
+    """
+    {(granularidad, inicio, tipo, estado, banco, codigo): [cantidad, monto]} -> suma los
+    deltas a VolumenTransacciones. Lo llama solo el agregado, con la marca bloqueada: nadie más lo escribe.
+    """
+    if not deltas:
+        return
+    filtro = Q()
+    for granularidad, inicio in {clave[:2] for clave in deltas}:
+        filtro |= Q(granularidad=granularidad, inicio=inicio)
+    existentes = {
+        (fila.granularidad, fila.inicio, fila.tipo, fila.estado, fila.banco_emisor_id, fila.codigo_respuesta): fila
+        for fila in VolumenTransacciones.objects.filter(filtro)
+    }
+    nuevas, cambiadas = [], []
+    for clave, (cantidad, monto) in deltas.items():
+        fila = existentes.get(clave)
+        if fila is None:
+            granularidad, inicio, tipo, estado, banco, codigo = clave
+            nuevas.append(VolumenTransacciones(
+                granularidad=granularidad, inicio=inicio, tipo=tipo, estado=estado, banco_emisor_id=banco,
+                codigo_respuesta=codigo, cantidad=cantidad, monto_total=monto,
+            ))
+        else:
+            fila.cantidad += cantidad
+            fila.monto_total += monto
+            cambiadas.append(fila)
+    VolumenTransacciones.objects.bulk_create(nuevas)
+    VolumenTransacciones.objects.bulk_update(cambiadas, ['cantidad', 'monto_total'])
+
+
+def _sumar(deltas, minuto, clave, cantidad, monto):
+    """ Suma al intervalo del minuto y al de su hora. """
+    for granularidad, inicio in (('MINUTO', minuto), ('HORA', minuto.replace(minute=0))):
+        acumulado = deltas[(granularidad, inicio) + clave]
+        acumulado[0] += cantidad
+        acumulado[1] += monto
+
+
+def _reclasificar(deltas, reclasificaciones):
+    """ Mueve cada transacción del estado anterior de su reclasificación al nuevo. """
+    if not reclasificaciones:
+        return
+    datos = {
+        fila['pk']: fila for fila in Transaccion.objects.filter(pk__in={fila[1] for fila in reclasificaciones})
+        .values('pk', 'fecha', 'monto', 'tipo', 'banco_emisor_id')
+    }
+    for _, transaccion_id, estado_anterior, codigo_anterior, estado, codigo_respuesta in reclasificaciones:
+        actual = datos[transaccion_id]
+        minuto = actual['fecha'].astimezone(tz.utc).replace(second=0, microsecond=0)
+        _sumar(deltas, minuto, (actual['tipo'], estado_anterior, actual['banco_emisor_id'], codigo_anterior), -1, -actual['monto'])
+        _sumar(deltas, minuto, (actual['tipo'], estado, actual['banco_emisor_id'], codigo_respuesta), 1, actual['monto'])
+
+
+def acumular_lote(tamano=None):
+    """
+    Agrega el siguiente lote de transacciones, los huecos ya confirmados y las
+    reclasificaciones pendientes. Devuelve cuántas transacciones se agregaron
+    (0 = al día, u otro proceso está agregando).
+    """
+    tamano = tamano or settings.VOLUMEN['TRANSACCIONES_POR_LOTE']
+    MarcaProceso.objects.get_or_create(nombre=MARCA)
+    with transaction.atomic():
+        _lectura_consistente()
+        marca = MarcaProceso.objects.select_for_update(skip_locked=True).filter(nombre=MARCA).first()
+        if marca is None:
+            return 0
+        reclasificaciones = list(ReclasificacionVolumen.objects.order_by('pk').values_list(
+            'pk', 'transaccion_id', 'estado_anterior', 'codigo_anterior', 'estado', 'codigo_respuesta'
+        ))
+        lote = list(Transaccion.objects.filter(pk__gt=marca.ultimo_id).order_by('pk').values_list('pk', flat=True)[:tamano])
+        huecos = {int(pk): desde for pk, desde in marca.huecos.items()}
+        confirmados = set(Transaccion.objects.filter(pk__in=huecos).values_list('pk', flat=True)) if huecos else set()
+
+        deltas = defaultdict(lambda: [0, Decimal('0')])
+        if lote or confirmados:
+            filtro = Q(pk__in=confirmados)
+            if lote:
+                filtro |= Q(pk__gt=marca.ultimo_id, pk__lte=lote[-1])
+            grupos = (
+                Transaccion.objects.filter(filtro)
+                .annotate(minuto=TruncMinute('fecha', tzinfo=tz.utc))
+                .values('minuto', *CAMPOS).annotate(cantidad=Count('pk'), monto=Sum('monto')).order_by()
+            )
+            for grupo in grupos:
+                _sumar(deltas, grupo['minuto'], tuple(grupo[campo] for campo in CAMPOS), grupo['cantidad'], grupo['monto'])
+        # Las de transacciones que este pase agrega (o aún no) ya se ven en su estado final
+        _reclasificar(deltas, [
+            fila for fila in reclasificaciones if fila[1] <= marca.ultimo_id and fila[1] not in huecos
+        ])
+        _aplicar(deltas)
+        ReclasificacionVolumen.objects.filter(pk__in=[fila[0] for fila in reclasificaciones]).delete()
+
+        ahora = time.time()
+        huecos = {
+            pk: desde for pk, desde in huecos.items()
+            if pk not in confirmados and ahora - desde < settings.VOLUMEN['HUECO_MAX_S']
+        }
+        if lote:
+            # En el primer pase los ids anteriores al primero no son huecos
+            vistos, desde = set(lote), marca.ultimo_id + 1 if marca.ultimo_id else lote[0]
+            huecos.update((pk, ahora) for pk in range(desde, lote[-1]) if pk not in vistos)
+            marca.ultimo_id = lote[-1]
+        marca.huecos = huecos
+        marca.save(update_fields=['ultimo_id', 'huecos', 'actualizado'])
+    return len(lote) + len(confirmados)
+
+
+def acumular(tamano=None):
+    """ Agrega lotes hasta ponerse al día. Devuelve el total de transacciones agregadas. """
+    total = 0
+    while True:
+        agregadas = acumular_lote(tamano)
+        if not agregadas:
+            return total
+        total += agregadas
+
+
+def reclasificar(transaccion_id, estado, codigo_respuesta):
+    """
+    Llamar ANTES de cambiar el estado de una Transaccion ya registrada y dentro de la
+    misma transacción. Registra el cambio para el siguiente pase del agregado.
+    """
+    estado_anterior, codigo_anterior = Transaccion.objects.values_list('estado', 'codigo_respuesta').get(pk=transaccion_id)
+    ReclasificacionVolumen.objects.create(
+        transaccion_id=transaccion_id, estado_anterior=estado_anterior, codigo_anterior=codigo_anterior,
+        estado=estado, codigo_respuesta=codigo_respuesta,
+    )
+
+
+def consultar(granularidad, desde, hasta, **filtros):
+    """ Filas de agregado con inicio en [desde, hasta), en orden cronológico. """
+    return (
+        VolumenTransacciones.objects.filter(granularidad=granularidad, inicio__gte=desde, inicio__lt=hasta, **filtros)
+        .order_by('inicio', *CAMPOS).values('inicio', *CAMPOS, 'cantidad', 'monto_total')
+    )
+
+
+def actualizado_hasta():
+    """ Fecha de la última transacción agregada (None si aún no corre el agregado). """
+    ultimo_id = MarcaProceso.objects.filter(nombre=MARCA).values_list('ultimo_id', flat=True).first()
+    if not ultimo_id:
+        return None
+    return Transaccion.objects.filter(pk__lte=ultimo_id).order_by('-pk').values_list('fecha', flat=True).first()
@@ -26,8 +26,14 @@ echo "Asegurando la existencia del superusuario..."
 python manage.py create_superuser
 
 # Inicia el servidor Gunicorn en segundo plano para permitir la ejecución del warmup.
+# Con SERVIDOR_ASGI=1 los workers son de Uvicorn: las vistas de pago asíncronas esperan
+# a los bancos aliados sin ocupar un hilo por autorización.
 echo "Iniciando servidor Gunicorn en segundo plano..."
-gunicorn config.wsgi:application --bind 0.0.0.0:8000 --workers 2 --timeout 600 --log-level=info &
+if [ "$SERVIDOR_ASGI" = "1" ]; then
+    gunicorn config.asgi:application -k uvicorn.workers.UvicornWorker --bind 0.0.0.0:8000 --workers 2 --timeout 600 --log-level=info &
+else
+    gunicorn config.wsgi:application --bind 0.0.0.0:8000 --workers 2 --timeout 600 --log-level=info &
+fi
 
 # Guarda el PID de Gunicorn para poder esperar por él más tarde.
 GUNICORN_PID=$!
@@ -11,8 +11,9 @@ const TransactionHistory = () => {
     useEffect(() => {
         const fetchTransactions = async () => {
             try {
-                const response = await api.get('transacciones/');
-                setTransactions(response.data);
+                // Solo la primera página: el historial completo está en /movimientos
+                const response = await api.get('transacciones/', { params: { limite: 10 } });
+                setTransactions(response.data.resultados);
             } catch (err) {
                 setError('No se pudieron cargar los movimientos.');
                 console.error(err);
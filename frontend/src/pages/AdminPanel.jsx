@@ -1,17 +1,43 @@
 // frontend/src/pages/AdminPanel.jsx
-import { useEffect, useState } from 'react';
+import { useCallback, useEffect, useState } from 'react';
 import api from '../api/axiosConfig';
 import { useNavigate } from 'react-router-dom';
 import { 
     LayoutDashboard, Server, Users, DollarSign, 
-    ArrowLeft, ShieldCheck, Globe, Building 
+    ArrowLeft, ShieldCheck, Globe, Building, Search 
 } from 'lucide-react';
 
 const AdminPanel = () => {
     const [data, setData] = useState(null);
     const [loading, setLoading] = useState(true);
+    // Clientes: paginados y filtrados en el servidor (admin-panel/clientes/)
+    const [clientes, setClientes] = useState([]);
+    const [siguiente, setSiguiente] = useState(null);
+    const [busqueda, setBusqueda] = useState('');
+    const [cargandoClientes, setCargandoClientes] = useState(false);
     const navigate = useNavigate();
 
+    const fetchClientes = useCallback(async (q, cursor) => {
+        setCargandoClientes(true);
+        try {
+            const params = { q };
+            if (cursor) params.cursor = cursor;
+            const response = await api.get('admin-panel/clientes/', { params });
+            setClientes(prev => cursor ? [...prev, ...response.data.resultados] : response.data.resultados);
+            setSiguiente(response.data.siguiente);
+        } catch (error) {
+            console.error("Error cargando clientes", error);
+        } finally {
+            setCargandoClientes(false);
+        }
+    }, []);
+
+    // Nueva búsqueda tras una pausa al escribir
+    useEffect(() => {
+        const espera = setTimeout(() => fetchClientes(busqueda.trim(), null), 300);
+        return () => clearTimeout(espera);
+    }, [busqueda, fetchClientes]);
+
     useEffect(() => {
         const fetchAdminData = async () => {
             try {
@@ -106,9 +132,7 @@ const AdminPanel = () => {
                                             {nodo.api_url}
                                         </td>
                                         <td className="px-6 py-4">
-                                            <span className="flex items-center gap-1 text-green-600 text-xs font-bold">
-                                                <span className="w-2 h-2 rounded-full bg-green-500 animate-pulse"></span> Activo
-                                            </span>
+                                            <EstadoCircuito estado={nodo.circuito} />
                                         </td>
                                     </tr>
                                 ))}
@@ -126,10 +150,20 @@ const AdminPanel = () => {
 
                 {/* SECCIÓN 2: Clientes Registrados */}
                 <div className="bg-white rounded-xl shadow-sm border border-gray-200 overflow-hidden">
-                    <div className="px-6 py-4 border-b border-gray-100 bg-gray-50">
+                    <div className="px-6 py-4 border-b border-gray-100 bg-gray-50 flex justify-between items-center">
                         <h2 className="font-bold text-gray-800 flex items-center gap-2">
                             <Users size={20} className="text-blue-900"/> Clientes Whola
                         </h2>
+                        <div className="relative">
+                            <Search size={14} className="absolute left-3 top-1/2 -translate-y-1/2 text-gray-400" />
+                            <input
+                                type="text"
+                                value={busqueda}
+                                onChange={(e) => setBusqueda(e.target.value)}
+                                placeholder="RIF, cédula, nombre o N° de cuenta"
+                                className="pl-8 pr-3 py-2 text-sm border border-gray-200 rounded-lg w-72 focus:outline-none focus:ring-2 focus:ring-blue-900/20"
+                            />
+                        </div>
                     </div>
                     <div className="overflow-x-auto">
                         <table className="w-full text-left text-sm">
@@ -143,7 +177,7 @@ const AdminPanel = () => {
                                 </tr>
                             </thead>
                             <tbody className="divide-y divide-gray-100">
-                                {data.clientes.map((cte) => (
+                                {clientes.map((cte) => (
                                     <tr key={cte.id} className="hover:bg-gray-50">
                                         <td className="px-6 py-4 font-mono text-gray-600">{cte.identidad}</td>
                                         <td className="px-6 py-4 font-bold text-gray-800">{cte.nombre}</td>
@@ -163,9 +197,27 @@ const AdminPanel = () => {
                                         </td>
                                     </tr>
                                 ))}
+                                {!cargandoClientes && clientes.length === 0 && (
+                                    <tr>
+                                        <td colSpan="5" className="px-6 py-8 text-center text-gray-400 italic">
+                                            No se encontraron clientes.
+                                        </td>
+                                    </tr>
+                                )}
                             </tbody>
                         </table>
                     </div>
+                    {siguiente && (
+                        <div className="px-6 py-4 border-t border-gray-100 text-center">
+                            <button
+                                onClick={() => fetchClientes(busqueda.trim(), siguiente)}
+                                disabled={cargandoClientes}
+                                className="px-6 py-2 rounded-lg text-sm font-semibold bg-white border border-gray-200 text-blue-900 hover:bg-blue-50 disabled:opacity-50 transition-all"
+                            >
+                                {cargandoClientes ? 'Cargando...' : 'Cargar más clientes'}
+                            </button>
+                        </div>
+                    )}
                 </div>
 
             </main>
@@ -173,6 +225,22 @@ const AdminPanel = () => {
     );
 };
 
+// Estado del cortacircuitos del banco aliado (CERRADO = opera normal)
+const ESTADOS_CIRCUITO = {
+    CERRADO: { texto: 'Activo', color: 'text-green-600', punto: 'bg-green-500 animate-pulse' },
+    SEMIABIERTO: { texto: 'En prueba', color: 'text-amber-600', punto: 'bg-amber-500' },
+    ABIERTO: { texto: 'Circuito abierto', color: 'text-red-600', punto: 'bg-red-500' },
+};
+
+const EstadoCircuito = ({ estado }) => {
+    const info = ESTADOS_CIRCUITO[estado] || ESTADOS_CIRCUITO.CERRADO;
+    return (
+        <span className={`flex items-center gap-1 text-xs font-bold ${info.color}`}>
+            <span className={`w-2 h-2 rounded-full ${info.punto}`}></span> {info.texto}
+        </span>
+    );
+};
+
 const KpiCard = ({ icon, title, value, color }) => (
     <div className="bg-white p-6 rounded-xl shadow-sm border border-gray-200 flex items-center gap-4">
         <div className={`p-4 rounded-full text-white ${color} shadow-lg`}>
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
-import { ArrowLeft, ArrowDownRight, ArrowUpRight, Calendar } from 'lucide-react';
+import { ArrowLeft, ArrowDownRight, ArrowUpRight, Calendar, Download } from 'lucide-react';
 import api from '../api/axiosConfig';
 
 export default function Movimientos() {
@@ -8,6 +8,15 @@ export default function Movimientos() {
   const [transacciones, setTransacciones] = useState([]);
   const [loading, setLoading] = useState(true);
   const [filtro, setFiltro] = useState('TODOS');
+  const [siguiente, setSiguiente] = useState(null); // Cursor de la próxima página (null = no hay más)
+  const [cargandoMas, setCargandoMas] = useState(false);
+
+  // El API devuelve el historial por páginas: { resultados, siguiente }
+  const fetchPagina = async (cursor) => {
+    const response = await api.get('transacciones/', { params: cursor ? { cursor } : {} });
+    setTransacciones(prev => cursor ? [...prev, ...response.data.resultados] : response.data.resultados);
+    setSiguiente(response.data.siguiente);
+  };
 
   useEffect(() => {
     const fetchMovimientos = async () => {
@@ -20,8 +29,7 @@ export default function Movimientos() {
         }
 
         // Petición a tu API usando tu instancia configurada (ya inyecta el token automáticamente)
-        const response = await api.get('transacciones/');
-        setTransacciones(response.data);
+        await fetchPagina(null);
       } catch (error) {
         console.error("Error al obtener movimientos:", error);
       } finally {
@@ -31,6 +39,32 @@ export default function Movimientos() {
     fetchMovimientos();
   }, [navigate]);
 
+  const cargarMas = async () => {
+    setCargandoMas(true);
+    try {
+      await fetchPagina(siguiente);
+    } catch (error) {
+      console.error("Error al obtener movimientos:", error);
+    } finally {
+      setCargandoMas(false);
+    }
+  };
+
+  // Estado de cuenta completo (CSV generado en streaming por el backend)
+  const descargarEstadoCuenta = async () => {
+    try {
+      const response = await api.get('estado-cuenta/', { params: { formato: 'csv' }, responseType: 'blob' });
+      const url = window.URL.createObjectURL(response.data);
+      const enlace = document.createElement('a');
+      enlace.href = url;
+      enlace.download = 'estado_cuenta.csv';
+      enlace.click();
+      window.URL.revokeObjectURL(url);
+    } catch (error) {
+      console.error("Error al descargar el estado de cuenta:", error);
+    }
+  };
+
   // Lógica para los botones de filtros (Todos, Ingresos, Egresos)
   const transaccionesFiltradas = transacciones.filter(t => 
     filtro === 'TODOS' ? true : t.direccion === filtro
@@ -51,6 +85,9 @@ export default function Movimientos() {
             <ArrowLeft size={24} />
           </button>
           <h1 className="text-2xl font-bold">Mis Movimientos</h1>
+          <button onClick={descargarEstadoCuenta} className="ml-auto flex items-center gap-2 px-4 py-2 text-sm font-semibold bg-blue-800 hover:bg-blue-700 rounded-lg transition-colors">
+            <Download size={16} /> Estado de cuenta
+          </button>
         </div>
       </div>
 
@@ -111,6 +148,19 @@ export default function Movimientos() {
             ))}
           </div>
         )}
+
+        {/* --- PAGINACIÓN --- */}
+        {!loading && siguiente && (
+          <div className="text-center mt-6">
+            <button
+              onClick={cargarMas}
+              disabled={cargandoMas}
+              className="px-6 py-2.5 rounded-lg text-sm font-semibold bg-white border border-gray-200 text-blue-900 hover:bg-blue-50 disabled:opacity-50 transition-all"
+            >
+              {cargandoMas ? 'Cargando...' : 'Cargar más movimientos'}
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );